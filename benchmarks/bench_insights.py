@@ -0,0 +1,75 @@
+"""Compare the per-column outlier loop with the vectorised insights kernel.
+
+Run from the repository root::
+
+    python benchmarks/bench_insights.py --rows 50000
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "data-agent"))
+
+from app.core.analysis import detect_outliers, numeric_column_stats  # noqa: E402
+
+
+def loop_insights(df: pd.DataFrame, method: str = "iqr") -> dict:
+    """The pre-kernel implementation of ``basic_insights``."""
+    missing_pct = (df.isna().mean() * 100).round(2).to_dict()
+    outlier_counts = {}
+    for col in df.select_dtypes(include=["number"]).columns:
+        mask = detect_outliers(df[col].dropna(), method=method)
+        outlier_counts[col] = int(mask.sum())
+    return {"missing_pct": missing_pct, "outlier_counts": outlier_counts}
+
+
+def kernel_insights(df: pd.DataFrame, method: str = "iqr") -> dict:
+    missing_pct = (df.isna().mean() * 100).round(2).to_dict()
+    stats = numeric_column_stats(df, method=method)
+    return {
+        "missing_pct": missing_pct,
+        "outlier_counts": {c: int(n) for c, n in stats["outliers"].items()},
+    }
+
+
+def make_frame(rows: int, cols: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((rows, cols))
+    data[rng.random((rows, cols)) < 0.05] = np.nan
+    return pd.DataFrame(data, columns=[f"c{i}" for i in range(cols)])
+
+
+def best_of(fn, *args, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--cols", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--method", choices=["iqr", "zscore"], default="iqr")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'cols':>6} {'loop s':>10} {'kernel s':>10} {'speedup':>8}")
+    for cols in args.cols:
+        df = make_frame(args.rows, cols)
+        assert loop_insights(df, args.method) == kernel_insights(df, args.method)
+        loop = best_of(loop_insights, df, args.method, repeat=args.repeat)
+        kernel = best_of(kernel_insights, df, args.method, repeat=args.repeat)
+        print(f"{cols:>6} {loop:>10.4f} {kernel:>10.4f} {loop / kernel:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,92 @@
 from __future__ import annotations
 
 import base64
+import dataclasses
+import hashlib
 import io
+import itertools
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any
 import uuid
+import zipfile
 
 import matplotlib.pyplot as plt
 import pandas as pd
+import pyarrow as pa
 from fastapi import FastAPI, File, UploadFile, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pyarrow import feather
 from pydantic import BaseModel
 
-from .core.analysis import basic_summary, basic_insights
-from .core.charts import (
-    bar_plot,
-    box_plot,
-    facet_bar,
-    facet_hist,
-    facet_line,
-    hist_plot,
-    line_plot,
-    scatter_plot,
+from .core import answer_cache
+from .core.analysis import density_heatmap, missing_density
+from .core.charts import CHARTS
+from .core.compare import compare_datasets
+from .core.columnar import (
+    SchemaMismatch,
+    append_columnar,
+    columnar_path_for,
+    dataset_table,
+    discard_columnar,
+    ingest_dataset,
+    ingest_sample,
+    load_dataset,
+    sample_path_for,
+    load_sample,
 )
+from .core.excel import list_sheets
 from .core.file_loader import load_any
+from .core.join import JoinError, JoinSpec, csv_to_arrow, join_tables
 from .core.config import settings
-from .core.llm_driver import ask_llm
+from .core.dataset_manager import DatasetManager
+from .core.llm_client import ClientBusy, timing_summary
+from .core.llm_driver import CLIENT as LLM, ask_llm, stream_llm
+from .core.sampling import Reservoir, append_sample
+from .core.stats import DatasetStats
+from .core.sketches import get_or_build_sketches, rank_join_keys
+from .core.versions import create_version
+from .core.workers import LaneFull, WorkerLane
+from .core.render_cache import RenderCache
+from .core.render_pool import (
+    RenderPool,
+    dataset_chart_data,
+    render_batch,
+    render_dataset_chart,
+)
+from .core.profile import (
+    build_file_stats,
+    build_profile,
+    get_or_build_profile,
+    get_or_build_stats,
+    needs_chunked_profile,
+    profile_insights,
+    profile_summary,
+)
 from .services.postprocess import extract_outputs, figure_to_png
 from .services.safe_exec import run as safe_run
-from .core.storage import add_dataset, get_dataset_path, init_db
+from .core.storage import (
+    add_dataset,
+    find_dataset_by_hash,
+    get_columnar_path,
+    get_content_hash,
+    get_dataset_path,
+    get_dataset_sheet,
+    get_dtype_report,
+    get_lineage,
+    get_sample_path,
+    get_sheet_datasets,
+    init_db,
+    record_append,
+    save_profile,
+    save_stats,
+    set_dtype_report,
+    set_sample_path,
+)
 from .core.error_utils import logger
 from .services.report import create_pdf_report, create_pptx_report
 import traceback
@@ -37,6 +95,7 @@ import traceback
 class UploadResponse(BaseModel):
     dataset_id: str
     rows: int
+    sheets: dict[str, str] | None = None
 
 
 class SummaryResponse(BaseModel):
@@ -49,15 +108,65 @@ class SummaryResponse(BaseModel):
 class ChartSpec(BaseModel):
     type: str
     params: dict[str, Any] | None = None
+    sample: bool = False
+    # "png" renders on the server; "vega" returns the aggregated data and a
+    # Vega-Lite spec for the browser to draw.
+    format: str = "png"
+
+
+class ChartBatch(BaseModel):
+    charts: list[ChartSpec]
+
+
+class Coercion(BaseModel):
+    column: str
+    kind: str
+
+
+class TransformRequest(BaseModel):
+    coercions: list[Coercion]
+
+
+class TransformResponse(BaseModel):
+    dataset_id: str
+    parent_id: str
+    version: int
+    changed: list[str]
+
+
+class JoinRequest(BaseModel):
+    left_id: str
+    right_id: str
+    on: list[str] | None = None
+    left_on: list[str] | None = None
+    right_on: list[str] | None = None
+    how: str = "inner"
+
+
+class JoinResponse(BaseModel):
+    dataset_id: str
+    rows: int
+    left_on: list[str]
+    right_on: list[str]
+    partitions: int
+
+
+class CompareRequest(BaseModel):
+    dataset_ids: list[str]
+    columns: list[str] | None = None
 
 
 class NL2CodeRequest(BaseModel):
     question: str
+    sample: bool = False
 
 
 class NL2CodeResponse(BaseModel):
     intent: str
     code: str
+    sampled: bool = False
+    # Seconds spent per phase of the LLM calls; None for a cached answer.
+    latency: dict[str, float] | None = None
 
 
 class RunCodeRequest(BaseModel):
@@ -75,11 +184,50 @@ class InsightsResponse(BaseModel):
     missing_pct: dict[str, float]
     outlier_counts: dict[str, int]
 
-app = FastAPI(title="Data Agent API")
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    RENDERERS.warm()
+    threading.Thread(target=LLM.warm, daemon=True).start()
+    yield
+    RENDERERS.shutdown()
 
-DATASETS: Dict[str, pd.DataFrame] = {}
+
+app = FastAPI(title="Data Agent API", lifespan=_lifespan)
+
+DATASETS = DatasetManager(load_dataset, max_bytes=settings.dataset_cache_bytes)
+RENDERERS = RenderPool(settings.render_workers)
+RENDERS = RenderCache(
+    settings.render_cache_bytes,
+    spill_dir=settings.render_cache_dir,
+    max_disk_bytes=settings.render_cache_disk_bytes,
+)
 init_db()
 
+# Blocking pandas/matplotlib/LLM/sandbox work runs on per-endpoint lanes so a
+# slow chart never stalls the event loop or starves the other endpoints.
+LANES = {
+    name: WorkerLane(name, limit, max_queue=settings.worker_queue_limit)
+    for name, limit in {
+        "upload": settings.upload_concurrency,
+        "heavy": settings.heavy_concurrency,
+        "chart": settings.chart_concurrency,
+        "nl2code": settings.nl2code_concurrency,
+        "run_code": settings.run_code_concurrency,
+        "explain_chart": settings.explain_chart_concurrency,
+    }.items()
+}
+
+
+def _not_found() -> JSONResponse:
+    return JSONResponse(status_code=404, content={"error": "dataset not found"})
+
+
+def _get_dataset(ds_id: str) -> pd.DataFrame | None:
+    try:
+        return DATASETS.get(ds_id)
+    except Exception:
+        return None
+
 
 @app.exception_handler(Exception)
 async def _unhandled(request: Request, exc: Exception):
@@ -88,69 +236,512 @@ async def _unhandled(request: Request, exc: Exception):
     return JSONResponse(status_code=500, content={"error": "internal server error"})
 
 
+@app.exception_handler(LaneFull)
+@app.exception_handler(ClientBusy)
+async def _busy(request: Request, exc: Exception):
+    return JSONResponse(status_code=503, content={"error": "server busy, retry later"})
+
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "datasets": DATASETS.stats(),
+        "renders": RENDERS.stats(),
+        "llm": LLM.stats(),
+        "answers": answer_cache.stats(),
+        "workers": {name: lane.stats() for name, lane in LANES.items()},
+    }
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def _receive(file: UploadFile, dest: Path) -> str | None:
+    """Stream an upload to ``dest`` while hashing it; ``None`` if it is too large.
+
+    The body never sits in memory at once.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.max_file_size:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    if size > settings.max_file_size:
+        dest.unlink()
+        return None
+    return digest.hexdigest()
+
+
 @app.post("/upload")
-async def upload(file: UploadFile = File(...)) -> UploadResponse:
-    data = await file.read()
-    if len(data) > settings.max_file_size:
-        return JSONResponse(status_code=400, content={"error": "file too large"})
+async def upload(
+    file: UploadFile = File(...), sample_by: str | None = None
+) -> UploadResponse:
     ext = Path(file.filename).suffix.lstrip(".")
     if ext not in settings.allowed_file_types:
         return JSONResponse(status_code=400, content={"error": "file type not allowed"})
     ds_path = Path(settings.data_dir)
     ds_path.mkdir(exist_ok=True)
     ds_id = str(uuid.uuid4())
+
+    tmp_path = ds_path / f"{ds_id}.part"
+    content_hash = await _receive(file, tmp_path)
+    if content_hash is None:
+        return JSONResponse(status_code=400, content={"error": "file too large"})
+
+    existing = find_dataset_by_hash(content_hash)
+    if existing is not None:
+        tmp_path.unlink()
+        add_dataset(
+            existing["path"],
+            ds_id,
+            columnar_path=existing["columnar_path"],
+            content_hash=content_hash,
+            rows=existing["rows"],
+            sheet=existing["sheet"],
+        )
+        set_dtype_report(ds_id, existing["dtype_report"])
+        set_sample_path(ds_id, existing["sample_path"])
+        sheets = None
+        if existing["sheet"] is not None:
+            sheets = {existing["sheet"]: ds_id}
+            for child in get_sheet_datasets(existing["id"])[1:]:
+                sheets[child["sheet"]] = add_dataset(
+                    existing["path"],
+                    columnar_path=child["columnar_path"],
+                    content_hash=child["content_hash"],
+                    sheet=child["sheet"],
+                    parent_id=ds_id,
+                )
+        return UploadResponse(dataset_id=ds_id, rows=existing["rows"], sheets=sheets)
+
     path = ds_path / f"{ds_id}_{Path(file.filename).name}"
-    add_dataset(str(path), ds_id)
-    with open(path, "wb") as f:
-        f.write(data)
-    buf = io.BytesIO(data)
-    buf.name = file.filename
-    df = load_any(buf)
-    DATASETS[ds_id] = df
-    return UploadResponse(dataset_id=ds_id, rows=len(df))
+    tmp_path.replace(path)
+    return await LANES["upload"].run(
+        _ingest_upload, ds_id, path, content_hash, sample_by
+    )
+
+
+def _sheet_hash(content_hash: str, sheet: str) -> str:
+    return hashlib.sha256(f"{content_hash}:{sheet}".encode()).hexdigest()
+
+
+def _ingest_upload(
+    ds_id: str, path: Path, content_hash: str, sample_by: str | None = None
+) -> UploadResponse:
+    if needs_chunked_profile(path):
+        # Too big to parse eagerly: profile it out of core and parse on demand.
+        reservoir = Reservoir(settings.sample_rows)
+        stats = build_file_stats(path, reservoir)
+        profile = stats.profile()
+        add_dataset(str(path), ds_id, content_hash=content_hash, rows=profile["rows"])
+        save_profile(content_hash, profile)
+        save_stats(content_hash, stats.to_dict())
+        if reservoir.seen > settings.sample_rows:
+            ingest_sample(ds_id, path, reservoir.result())
+        return UploadResponse(dataset_id=ds_id, rows=profile["rows"])
+    # Workbooks: parse the first sheet now, register the others for lazy loading.
+    sheet_names = list_sheets(path) if path.suffix.lower() == ".xlsx" else []
+    first_sheet = sheet_names[0] if sheet_names else None
+    try:
+        df = load_any(path, sheet=first_sheet)
+    except Exception:
+        path.unlink()
+        raise
+    add_dataset(
+        str(path), ds_id, content_hash=content_hash, rows=len(df), sheet=first_sheet
+    )
+    df = ingest_dataset(ds_id, path, df, first_sheet, sample_by=sample_by)
+    save_profile(content_hash, build_profile(df))
+    DATASETS.put(ds_id, df)
+    sheets = None
+    if first_sheet is not None:
+        sheets = {first_sheet: ds_id}
+        for name in sheet_names[1:]:
+            sheets[name] = add_dataset(
+                str(path),
+                content_hash=_sheet_hash(content_hash, name),
+                sheet=name,
+                parent_id=ds_id,
+            )
+    return UploadResponse(dataset_id=ds_id, rows=len(df), sheets=sheets)
+
+
+@app.get("/sheets/{ds_id}")
+def sheets(ds_id: str):
+    """List the sheets of an uploaded workbook and the dataset id of each."""
+    try:
+        records = get_sheet_datasets(ds_id)
+    except KeyError:
+        return _not_found()
+    return {
+        "sheets": [
+            {
+                "sheet": r["sheet"],
+                "dataset_id": r["id"],
+                "loaded": r["columnar_path"] is not None,
+            }
+            for r in records
+        ]
+    }
+
+
+# Appends to one dataset must not interleave; different datasets run in parallel.
+_APPEND_LOCKS: dict[str, threading.Lock] = {}
+_APPEND_LOCKS_GUARD = threading.Lock()
+
+
+def _append_lock(ds_id: str) -> threading.Lock:
+    with _APPEND_LOCKS_GUARD:
+        return _APPEND_LOCKS.setdefault(ds_id, threading.Lock())
+
+
+@app.post("/append/{ds_id}")
+async def append(ds_id: str, file: UploadFile = File(...)) -> UploadResponse:
+    """Append the rows of a CSV/XLSX delta to an existing dataset."""
+    ext = Path(file.filename).suffix.lstrip(".")
+    if ext not in settings.allowed_file_types:
+        return JSONResponse(status_code=400, content={"error": "file type not allowed"})
+    try:
+        get_content_hash(ds_id)
+    except KeyError:
+        return _not_found()
+    tmp_path = Path(settings.data_dir) / f"{uuid.uuid4()}.delta.{ext}"
+    delta_hash = await _receive(file, tmp_path)
+    if delta_hash is None:
+        return JSONResponse(status_code=400, content={"error": "file too large"})
+    try:
+        return await LANES["heavy"].run(_append_upload, ds_id, tmp_path, delta_hash)
+    except SchemaMismatch as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _append_upload(ds_id: str, delta_path: Path, delta_hash: str) -> UploadResponse:
+    delta = load_any(delta_path)
+    scratch = tempfile.TemporaryDirectory(dir=settings.data_dir)
+    with _append_lock(ds_id), scratch:
+        # Statistics of the old rows come from stored partial aggregates.
+        stats = get_or_build_stats(ds_id, DATASETS.get)
+        old_rows = stats.rows
+        old_path = get_columnar_path(ds_id)
+        old_sample_path = get_sample_path(ds_id)
+        content_hash = hashlib.sha256(
+            f"{get_content_hash(ds_id)}:{delta_hash}".encode()
+        ).hexdigest()
+        tag = content_hash[:16]
+        stored = None
+        if old_path is None or not old_path.exists():
+            # Profiled out of core: never parse the old rows whole.
+            stored = _csv_table(ds_id, Path(scratch.name))
+        path, delta = append_columnar(ds_id, delta, tag, stored)
+        stats.update(delta)
+        save_stats(content_hash, stats.to_dict())
+        save_profile(content_hash, stats.profile())
+
+        raw_path, sheet = get_dataset_path(ds_id), get_dataset_sheet(ds_id)
+        sample_path = None
+        if stats.rows > settings.sample_rows:
+            old_sample = _get_sample(ds_id)
+            if old_sample is None:
+                # The old rows fit in one sample; use all of them.
+                old_sample = load_dataset(ds_id)
+            sample = append_sample(old_sample, old_rows, delta, settings.sample_rows)
+            sample_path = ingest_sample(ds_id, raw_path, sample, sheet, tag)
+        record_append(
+            ds_id,
+            str(path),
+            content_hash,
+            stats.rows,
+            str(sample_path) if sample_path is not None else None,
+        )
+        DATASETS.invalidate(ds_id)
+        keep = (columnar_path_for(raw_path, sheet), sample_path_for(raw_path, sheet))
+        discard_columnar(old_path, keep)
+        discard_columnar(old_sample_path, keep)
+    return UploadResponse(dataset_id=ds_id, rows=stats.rows)
+
+
+@app.post("/transform/{ds_id}", response_model=TransformResponse)
+async def transform(ds_id: str, payload: TransformRequest):
+    """Apply type coercions and return the id of the resulting dataset version.
+
+    The original dataset is left unchanged and keeps its id.
+    """
+    if not payload.coercions:
+        return JSONResponse(status_code=400, content={"error": "no coercions given"})
+    try:
+        get_content_hash(ds_id)
+    except KeyError:
+        return _not_found()
+    return await LANES["heavy"].run(_transform, ds_id, payload)
+
+
+def _transform(ds_id: str, payload: TransformRequest):
+    coercions = [c.dict() for c in payload.coercions]
+    try:
+        version_id, df, changed = create_version(ds_id, coercions, DATASETS.get)
+    except KeyError as e:
+        return JSONResponse(status_code=400, content={"error": f"unknown column {e}"})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if df is not None:
+        DATASETS.put(version_id, df)
+    lineage = get_lineage(version_id)
+    return TransformResponse(
+        dataset_id=version_id,
+        parent_id=ds_id,
+        version=lineage[-1]["version"],
+        changed=changed,
+    )
+
+
+@app.get("/versions/{ds_id}")
+def versions(ds_id: str):
+    """List the versions leading to ``ds_id`` with the transforms of each."""
+    try:
+        return {"versions": get_lineage(ds_id)}
+    except KeyError:
+        return _not_found()
+
+
+@app.get("/join_keys/{left_id}/{right_id}")
+async def join_keys(
+    left_id: str, right_id: str, same_name: bool = True, limit: int = 10
+):
+    """Rank candidate join keys between two datasets from stored sketches."""
+    return await LANES["heavy"].run(_join_keys, left_id, right_id, same_name, limit)
+
+
+def _join_keys(left_id: str, right_id: str, same_name: bool, limit: int):
+    try:
+        left = get_or_build_sketches(left_id, DATASETS.get)
+        right = get_or_build_sketches(right_id, DATASETS.get)
+    except KeyError:
+        return _not_found()
+    return {"candidates": rank_join_keys(left, right, same_name=same_name)[:limit]}
+
+
+@app.post("/join", response_model=JoinResponse)
+async def join(payload: JoinRequest):
+    """Join two datasets into a new dataset without loading either in full.
+
+    Keys default to ``on`` for both sides, then to the best candidate from
+    ``/join_keys``.
+    """
+    for ds_id in (payload.left_id, payload.right_id):
+        try:
+            get_content_hash(ds_id)
+        except KeyError:
+            return _not_found()
+    return await LANES["heavy"].run(_join, payload)
+
+
+def _join_spec(payload: JoinRequest) -> JoinSpec:
+    left_on = payload.left_on or payload.on
+    right_on = payload.right_on or payload.on
+    if left_on is None and right_on is None:
+        left = get_or_build_sketches(payload.left_id, DATASETS.get)
+        right = get_or_build_sketches(payload.right_id, DATASETS.get)
+        candidates = rank_join_keys(left, right, same_name=False)
+        if not candidates:
+            raise JoinError("no join key given and no overlapping columns found")
+        left_on, right_on = [candidates[0]["left"]], [candidates[0]["right"]]
+    if left_on is None or right_on is None:
+        raise JoinError("give both left_on and right_on, or on")
+    return JoinSpec(list(left_on), list(right_on), payload.how)
+
+
+def _csv_table(ds_id: str, scratch: Path):
+    """Convert a dataset's raw CSV to Arrow in ``scratch``, block by block.
+
+    Returns ``None`` for workbooks, which are never profiled out of core.
+    """
+    raw_path = get_dataset_path(ds_id)
+    if raw_path.suffix.lower() != ".csv" or get_dataset_sheet(ds_id) is not None:
+        return None
+    path = csv_to_arrow(raw_path, scratch / f"{uuid.uuid4()}.arrow")
+    return feather.read_table(path, memory_map=True)
+
+
+def _join_input(ds_id: str, scratch: Path):
+    """Return a dataset as a memory-mapped Arrow table.
+
+    Large CSVs that were profiled out of core are converted block by block.
+    """
+    table = dataset_table(ds_id)
+    if table is None:
+        table = _csv_table(ds_id, scratch)
+    if table is None:
+        table = pa.Table.from_pandas(DATASETS.get(ds_id), preserve_index=False)
+    return table
+
+
+def _join(payload: JoinRequest):
+    try:
+        spec = _join_spec(payload)
+    except JoinError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    # Joins are deterministic, so the same inputs and spec give the same data.
+    join_hash = hashlib.sha256(
+        ":".join(
+            [
+                get_content_hash(payload.left_id),
+                get_content_hash(payload.right_id),
+                json.dumps(dataclasses.asdict(spec), sort_keys=True),
+            ]
+        ).encode()
+    ).hexdigest()
+    existing = find_dataset_by_hash(join_hash)
+    if existing is not None:
+        return JoinResponse(
+            dataset_id=existing["id"],
+            rows=existing["rows"],
+            left_on=spec.left_on,
+            right_on=spec.right_on,
+            partitions=0,
+        )
+
+    data_dir = Path(settings.data_dir)
+    data_dir.mkdir(exist_ok=True)
+    ds_id = str(uuid.uuid4())
+    raw_path = data_dir / f"{ds_id}_join"
+    out = columnar_path_for(raw_path)
+    stats = DatasetStats()
+    reservoir = Reservoir(settings.sample_rows)
+    with tempfile.TemporaryDirectory(dir=data_dir) as scratch:
+        left = _join_input(payload.left_id, Path(scratch))
+        right = _join_input(payload.right_id, Path(scratch))
+        try:
+            rows, partitions = join_tables(
+                left,
+                right,
+                spec,
+                out,
+                budget=settings.join_memory_budget,
+                partitions=settings.join_partitions,
+                observers=(stats.update, reservoir.update),
+                spill_root=Path(scratch),
+            )
+        except JoinError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        del left, right
+    add_dataset(
+        str(raw_path),
+        ds_id,
+        columnar_path=str(out),
+        content_hash=join_hash,
+        rows=rows,
+    )
+    save_stats(join_hash, stats.to_dict())
+    save_profile(join_hash, stats.profile())
+    if rows > settings.sample_rows:
+        ingest_sample(ds_id, raw_path, reservoir.result())
+    return JoinResponse(
+        dataset_id=ds_id,
+        rows=rows,
+        left_on=spec.left_on,
+        right_on=spec.right_on,
+        partitions=partitions,
+    )
+
+
+@app.post("/compare")
+async def compare(payload: CompareRequest):
+    """Compare per-column count, mean, std, quartiles and null rate of datasets.
+
+    Stored profiles are reused; missing ones are built in parallel.
+    """
+    if len(payload.dataset_ids) < 2:
+        return JSONResponse(
+            status_code=400, content={"error": "give at least two datasets"}
+        )
+    try:
+        return await LANES["heavy"].run(
+            compare_datasets, payload.dataset_ids, payload.columns
+        )
+    except KeyError:
+        return _not_found()
+
+
+def _get_sample(ds_id: str, columns: list[str] | None = None) -> pd.DataFrame | None:
+    try:
+        return load_sample(ds_id, columns)
+    except Exception:
+        return None
+
+
+def _get_profile(ds_id: str) -> dict | None:
+    try:
+        return get_or_build_profile(ds_id, DATASETS.get)
+    except Exception:
+        return None
 
 
 @app.get("/summary/{ds_id}", response_model=SummaryResponse)
 def summary(ds_id: str):
-    df = DATASETS.get(ds_id)
-    if df is None:
-        try:
-            df = load_any(get_dataset_path(ds_id))
-        except Exception:
-            return JSONResponse(status_code=404, content={"error": "dataset not found"})
-        DATASETS[ds_id] = df
-    return SummaryResponse(**basic_summary(df))
+    profile = _get_profile(ds_id)
+    if profile is None:
+        return _not_found()
+    return SummaryResponse(**profile_summary(profile))
+
+
+@app.get("/optimization/{ds_id}")
+def optimization(ds_id: str):
+    """Return the dtype changes and bytes saved when the dataset was ingested."""
+    try:
+        report = get_dtype_report(ds_id)
+    except KeyError:
+        return _not_found()
+    if report is None:
+        return JSONResponse(
+            status_code=404, content={"error": "no optimisation report"}
+        )
+    return report
 
 
 @app.get("/insights/{ds_id}", response_model=InsightsResponse)
 def insights(ds_id: str):
-    df = DATASETS.get(ds_id)
-    if df is None:
-        try:
-            df = load_any(get_dataset_path(ds_id))
-        except Exception:
-            return JSONResponse(status_code=404, content={"error": "dataset not found"})
-        DATASETS[ds_id] = df
-    return InsightsResponse(**basic_insights(df))
+    profile = _get_profile(ds_id)
+    if profile is None:
+        return _not_found()
+    return InsightsResponse(**profile_insights(profile))
 
 
 @app.get("/report/{ds_id}")
-def report(ds_id: str, format: str = "pdf"):
-    df = DATASETS.get(ds_id)
+def report(ds_id: str, format: str = "pdf", sample: bool = False):
+    df = _get_sample(ds_id) if sample else None
+    sampled = df is not None
     if df is None:
-        try:
-            df = load_any(get_dataset_path(ds_id))
-        except Exception:
-            return JSONResponse(status_code=404, content={"error": "dataset not found"})
-        DATASETS[ds_id] = df
+        df = _get_dataset(ds_id)
+    profile = _get_profile(ds_id)
+    if df is None or profile is None:
+        return _not_found()
+    # Summary and insights always describe the full dataset via its profile.
+    stats = {
+        "summary": profile_summary(profile),
+        "insights": profile_insights(profile),
+        "sample_rows": len(df) if sampled else None,
+    }
+    sampled_header = {"X-Sampled": str(sampled).lower()}
 
     if format == "pdf":
-        buf = create_pdf_report(df)
-        headers = {"Content-Disposition": "attachment; filename=report.pdf"}
+        buf = create_pdf_report(df, **stats)
+        headers = {
+            "Content-Disposition": "attachment; filename=report.pdf",
+            **sampled_header,
+        }
         return StreamingResponse(buf, media_type="application/pdf", headers=headers)
     if format == "pptx":
-        buf = create_pptx_report(df)
-        headers = {"Content-Disposition": "attachment; filename=report.pptx"}
+        buf = create_pptx_report(df, **stats)
+        headers = {
+            "Content-Disposition": "attachment; filename=report.pptx",
+            **sampled_header,
+        }
         return StreamingResponse(
             buf,
             media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
@@ -159,63 +750,302 @@ def report(ds_id: str, format: str = "pdf"):
     return JSONResponse(status_code=400, content={"error": "unknown format"})
 
 
-@app.post("/chart/{ds_id}")
-async def chart(ds_id: str, spec: ChartSpec):
-    df = DATASETS.get(ds_id)
+# Density maps are tiny and a content hash always maps to the same data, so
+# they are kept per (content hash, bins) and shared by deduplicated uploads.
+_MISSING_CACHE: OrderedDict[tuple[str, int], dict] = OrderedDict()
+_MISSING_LOCK = threading.Lock()
+
+
+def _missing_density(ds_id: str, bins: int) -> dict | None:
+    try:
+        key = (get_content_hash(ds_id) or ds_id, bins)
+    except KeyError:
+        return None
+    with _MISSING_LOCK:
+        if key in _MISSING_CACHE:
+            _MISSING_CACHE.move_to_end(key)
+            return _MISSING_CACHE[key]
+    df = _get_dataset(ds_id)
     if df is None:
-        try:
-            df = load_any(get_dataset_path(ds_id))
-        except Exception:
-            return JSONResponse(status_code=404, content={"error": "dataset not found"})
-        DATASETS[ds_id] = df
+        return None
+    density = missing_density(df, bins)
+    with _MISSING_LOCK:
+        _MISSING_CACHE[key] = density
+        while len(_MISSING_CACHE) > settings.missing_cache_entries:
+            _MISSING_CACHE.popitem(last=False)
+    return density
 
-    chart_type = spec.type
-    params = spec.params or {}
 
-    if chart_type == "line":
-        png = line_plot(df, **params)
-    elif chart_type == "bar":
-        png = bar_plot(df, **params)
-    elif chart_type == "hist":
-        png = hist_plot(df, **params)
-    elif chart_type == "box":
-        png = box_plot(df, **params)
-    elif chart_type == "scatter":
-        png = scatter_plot(df, **params)
-    elif chart_type == "facet_line":
-        png = facet_line(df, **params)
-    elif chart_type == "facet_bar":
-        png = facet_bar(df, **params)
-    elif chart_type == "facet_hist":
-        png = facet_hist(df, **params)
-    else:
-        return JSONResponse(status_code=400, content={"error": "unknown chart type"})
+@app.get("/missing/{ds_id}")
+async def missing(ds_id: str, format: str = "png", bins: int | None = None):
+    """Missing-value density per column over fixed row blocks, as PNG or JSON."""
+    return await LANES["chart"].run(_missing, ds_id, format, bins)
+
 
+def _missing(ds_id: str, format: str, bins: int | None):
+    if format not in ("png", "json"):
+        return JSONResponse(status_code=400, content={"error": "unknown format"})
+    bins = settings.missing_density_bins if bins is None else bins
+    if bins < 1:
+        return JSONResponse(status_code=400, content={"error": "bins must be positive"})
+    density = _missing_density(ds_id, bins)
+    if density is None:
+        return _not_found()
+    if format == "json":
+        return density
+    png = RENDERERS.run(density_heatmap, density)
     return StreamingResponse(png, media_type="image/png")
 
 
+def _render_key(ds_id: str, spec: ChartSpec) -> str:
+    """Key a chart by the dataset's content and the normalised spec.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    params = {k: v for k, v in (spec.params or {}).items() if v is not None}
+    normalised = json.dumps(
+        {
+            "data": get_content_hash(ds_id) or ds_id,
+            "type": spec.type,
+            "params": params,
+            "sample": spec.sample,
+            "format": spec.format,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(normalised.encode()).hexdigest()
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if header is None:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _chart_response(body: bytes, etag: str, meta: dict) -> Response:
+    return Response(
+        body,
+        media_type=meta.get("media_type", "image/png"),
+        headers={
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "X-Sampled": str(meta["sampled"]).lower(),
+        },
+    )
+
+
+@app.post("/chart/{ds_id}")
+async def chart(ds_id: str, spec: ChartSpec, request: Request):
+    """Render a chart as PNG, or as data plus a Vega-Lite spec (``format="vega"``).
+
+    Results are cached by dataset content and spec, and carry a strong ETag;
+    a matching ``If-None-Match`` gets 304 without touching the data.
+    """
+    if spec.format not in ("png", "vega"):
+        return JSONResponse(status_code=400, content={"error": "unknown format"})
+    try:
+        key = _render_key(ds_id, spec)
+    except KeyError:
+        return _not_found()
+    etag = f'"{key}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    cached = RENDERS.get(key)
+    if cached is not None:
+        return _chart_response(cached[0], etag, cached[1])
+    resp = await LANES["chart"].run(_chart, ds_id, spec)
+    if isinstance(resp, tuple):
+        body, meta = resp
+        RENDERS.put(key, body, meta)
+        return _chart_response(body, etag, meta)
+    return resp
+
+
+def _chart(ds_id: str, spec: ChartSpec):
+    """Return the chart body and its cache metadata (media type, sampled)."""
+    if spec.type not in CHARTS:
+        return JSONResponse(status_code=400, content={"error": "unknown chart type"})
+    params = spec.params or {}
+    if spec.format == "vega":
+        data, sampled = dataset_chart_data(ds_id, spec.type, params, spec.sample)
+        body = json.dumps({"spec": data, "sampled": sampled}).encode()
+        return body, {"sampled": sampled, "media_type": "application/json"}
+    png, sampled = RENDERERS.run(
+        render_dataset_chart, ds_id, spec.type, params, spec.sample
+    )
+    return png, {"sampled": sampled}
+
+
+@app.post("/charts/{ds_id}")
+async def charts(ds_id: str, batch: ChartBatch):
+    """Render many charts of one dataset into a single zip archive.
+
+    Entry ``i`` holds chart ``i`` (``{i}.png`` or ``{i}.json``) and
+    ``manifest.json`` lists every chart with its file, whether it came from
+    the render cache or a sample, and its error if it failed. Charts that
+    miss the cache share one load of their columns and one aggregation
+    plan, so repeated groupbys are computed once per batch.
+    """
+    if not batch.charts:
+        return JSONResponse(status_code=400, content={"error": "no charts"})
+    if any(spec.format not in ("png", "vega") for spec in batch.charts):
+        return JSONResponse(status_code=400, content={"error": "unknown format"})
+    try:
+        keys = [_render_key(ds_id, spec) for spec in batch.charts]
+    except KeyError:
+        return _not_found()
+    body = await LANES["chart"].run(_charts, ds_id, batch.charts, keys)
+    if body is None:
+        return _not_found()
+    return Response(
+        body,
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=charts.zip"},
+    )
+
+
+def _charts(ds_id: str, specs: list[ChartSpec], keys: list[str]) -> bytes | None:
+    """Build the zip archive of a chart batch; ``None`` if the dataset is gone."""
+    entries: dict[int, tuple[bytes, dict]] = {}
+    errors: dict[int, str] = {}
+    misses = []
+    for i, (spec, key) in enumerate(zip(specs, keys, strict=True)):
+        cached = RENDERS.get(key)
+        if cached is not None:
+            entries[i] = cached
+        elif spec.type not in CHARTS:
+            errors[i] = "unknown chart type"
+        else:
+            misses.append(i)
+    plan = {"computed": 0, "reused": 0}
+    if misses:
+        jobs = [
+            (specs[i].type, specs[i].params or {}, specs[i].format, specs[i].sample)
+            for i in misses
+        ]
+        try:
+            results, plan = render_batch(RENDERERS, ds_id, jobs)
+        except KeyError:
+            return None
+        for i, result in zip(misses, results, strict=True):
+            if isinstance(result, Exception):
+                errors[i] = f"{type(result).__name__}: {result}"
+                continue
+            data, sampled = result
+            if specs[i].format == "vega":
+                data = json.dumps({"spec": data, "sampled": sampled}).encode()
+                meta = {"sampled": sampled, "media_type": "application/json"}
+            else:
+                meta = {"sampled": sampled}
+            RENDERS.put(keys[i], data, meta)
+            entries[i] = (data, meta)
+
+    manifest = []
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for i, spec in enumerate(specs):
+            item = {"type": spec.type, "format": spec.format}
+            if i in errors:
+                manifest.append({**item, "error": errors[i]})
+                continue
+            data, meta = entries[i]
+            # PNGs are already compressed; only the JSON specs are deflated.
+            if spec.format == "vega":
+                name, method = f"{i}.json", zipfile.ZIP_DEFLATED
+            else:
+                name, method = f"{i}.png", zipfile.ZIP_STORED
+            zf.writestr(name, data, compress_type=method)
+            cached = i not in misses
+            manifest.append(
+                {**item, "file": name, "sampled": meta["sampled"], "cached": cached}
+            )
+        zf.writestr(
+            "manifest.json",
+            json.dumps({"charts": manifest, "plan": plan}),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+    return buf.getvalue()
+
+
 @app.post("/nl2code/{ds_id}", response_model=NL2CodeResponse)
 async def nl2code(ds_id: str, payload: NL2CodeRequest):
-    df = DATASETS.get(ds_id)
+    return await LANES["nl2code"].run(_nl2code, ds_id, payload)
+
+
+def _nl2code_frame(ds_id: str, sample: bool) -> tuple[pd.DataFrame, bool] | None:
+    df = _get_sample(ds_id) if sample else None
+    sampled = df is not None
     if df is None:
-        try:
-            df = load_any(get_dataset_path(ds_id))
-        except Exception:
-            return JSONResponse(status_code=404, content={"error": "dataset not found"})
-        DATASETS[ds_id] = df
-    intent, code = ask_llm(payload.question, df)
-    return NL2CodeResponse(intent=intent, code=code)
+        df = _get_dataset(ds_id)
+    return None if df is None else (df, sampled)
+
+
+def _nl2code(ds_id: str, payload: NL2CodeRequest):
+    frame = _nl2code_frame(ds_id, payload.sample)
+    if frame is None:
+        return _not_found()
+    df, sampled = frame
+    timings = []
+    intent, code = ask_llm(
+        payload.question, df, cache_key=get_content_hash(ds_id), timings=timings
+    )
+    latency = timing_summary(timings) if timings else None
+    return NL2CodeResponse(intent=intent, code=code, sampled=sampled, latency=latency)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _nl2code_events(ds_id: str, payload: NL2CodeRequest):
+    frame = _nl2code_frame(ds_id, payload.sample)
+    if frame is None:
+        return None
+    df, sampled = frame
+    events = stream_llm(
+        payload.question, df, cache_key=get_content_hash(ds_id), wait=False
+    )
+    first = next(events)
+    return itertools.chain([first], events), sampled
+
+
+@app.post("/nl2code/{ds_id}/stream")
+async def nl2code_stream(ds_id: str, payload: NL2CodeRequest):
+    """Stream the answer of ``/nl2code`` as server-sent events.
+
+    ``intent`` and ``code`` events carry text deltas as the model writes
+    them; the final ``done`` event has the full answer, the sandbox check
+    and the latency. The first event is awaited on the nl2code lane, which
+    takes an LLM client slot; when none is free the request gets a 503
+    rather than a Starlette thread blocked waiting for one.
+    """
+    started = await LANES["nl2code"].run(_nl2code_events, ds_id, payload)
+    if started is None:
+        return _not_found()
+    events, sampled = started
+    body = (
+        _sse(name, {**data, "sampled": sampled} if name == "done" else data)
+        for name, data in events
+    )
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/run_code/{ds_id}", response_model=RunCodeResponse)
 async def run_code(ds_id: str, payload: RunCodeRequest) -> RunCodeResponse:
-    df = DATASETS.get(ds_id)
+    return await LANES["run_code"].run(_run_code, ds_id, payload)
+
+
+def _run_code(ds_id: str, payload: RunCodeRequest):
+    df = _get_dataset(ds_id)
     if df is None:
-        try:
-            df = load_any(get_dataset_path(ds_id))
-        except Exception:
-            return JSONResponse(status_code=404, content={"error": "dataset not found"})
-        DATASETS[ds_id] = df
+        return _not_found()
     code = payload.code
     locals_out, stdout = safe_run(code, {"df": df, "pd": pd, "plt": plt})
     dfs, pngs, figs, texts = extract_outputs(locals_out)
@@ -232,13 +1062,13 @@ class ExplainChartRequest(BaseModel):
 
 @app.post("/explain_chart/{ds_id}")
 async def explain_chart(ds_id: str, payload: ExplainChartRequest):
-    df = DATASETS.get(ds_id)
+    return await LANES["explain_chart"].run(_explain_chart, ds_id, payload)
+
+
+def _explain_chart(ds_id: str, payload: ExplainChartRequest):
+    df = _get_dataset(ds_id)
     if df is None:
-        try:
-            df = load_any(get_dataset_path(ds_id))
-        except Exception:
-            return JSONResponse(status_code=404, content={"error": "dataset not found"})
-        DATASETS[ds_id] = df
+        return _not_found()
     question = f"Explain this chart: spec={payload.spec}"
     _, summary_code = ask_llm(question, df)
     return {"summary": summary_code.strip()}
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -10,43 +11,165 @@ def basic_summary(df: pd.DataFrame) -> dict:
     }
 
 
+def _infer_datetime_format(values: pd.Index, probe: int = 20) -> str | None:
+    """Return the strftime format most of the first ``probe`` strings follow."""
+    from collections import Counter
+
+    from pandas.tseries.api import guess_datetime_format
+
+    guesses = Counter(
+        guess_datetime_format(v) for v in values[:probe] if isinstance(v, str)
+    )
+    guesses.pop(None, None)
+    return guesses.most_common(1)[0][0] if guesses else None
+
+
+def parse_datetimes(series: pd.Series) -> pd.Series:
+    """Parse a column to datetimes, unparseable values becoming ``NaT``.
+
+    Each distinct value is parsed once and the results are broadcast back,
+    so repeated timestamps cost nothing extra. Strings are parsed with one
+    inferred format; only values that do not match it fall back to
+    per-element parsing.
+    """
+    if not (
+        pd.api.types.is_object_dtype(series)
+        or pd.api.types.is_string_dtype(series)
+        or isinstance(series.dtype, pd.CategoricalDtype)
+    ):
+        return pd.to_datetime(series, errors="coerce")
+    codes, uniques = pd.factorize(series)
+    fmt = _infer_datetime_format(uniques)
+    parsed = pd.Series(
+        pd.to_datetime(uniques, errors="coerce", format=fmt or "mixed")
+    )
+    bad = parsed.isna().to_numpy()
+    if fmt is not None and bad.any():
+        parsed[bad] = pd.to_datetime(uniques[bad], errors="coerce", format="mixed")
+    return pd.Series(
+        parsed.array.take(codes, allow_fill=True), index=series.index, name=series.name
+    )
+
+
 def coerce_datetime(df: pd.DataFrame, col: str) -> pd.DataFrame:
-    try:
-        df[col] = pd.to_datetime(df[col], errors="raise")
-    except Exception:
-        pass
+    """Return ``df`` with ``col`` parsed to datetimes if every value parses.
+
+    The input frame is never modified; unchanged columns are shared with it.
+    """
+    parsed = parse_datetimes(df[col])
+    if (parsed.isna() & df[col].notna()).any():
+        return df
+    df = df.copy(deep=False)
+    df[col] = parsed
     return df
 
 
 def coerce_column(df: pd.DataFrame, col: str, kind: str) -> pd.DataFrame:
-    """Coerce a column to int, float or datetime."""
+    """Coerce a column to int, float or datetime.
+
+    Returns a new frame sharing the other columns' data with ``df``, which
+    is left untouched so cached frames never change under their readers.
+    """
     if col not in df.columns:
         return df
     if kind == "int":
-        df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        values = pd.to_numeric(df[col], errors="coerce").astype("Int64")
     elif kind == "float":
-        df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+        values = pd.to_numeric(df[col], errors="coerce").astype(float)
     elif kind in {"date", "datetime"}:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
+        values = parse_datetimes(df[col])
+    else:
+        return df
+    df = df.copy(deep=False)
+    df[col] = values
     return df
 
 
-def missing_heatmap(df: pd.DataFrame):
-    """Return a matplotlib heatmap of missing values as BytesIO."""
-    from io import BytesIO
+COERCE_KINDS = ("int", "float", "date", "datetime")
+
+
+def apply_coercions(
+    df: pd.DataFrame, coercions: list[dict]
+) -> tuple[pd.DataFrame, list[str]]:
+    """Apply ``[{"column": ..., "kind": ...}, ...]`` in order.
+
+    Returns the new frame and the columns that were replaced; all other
+    columns share their buffers with ``df``.
+
+    Raises:
+        KeyError: if a column does not exist.
+        ValueError: if a kind is not one of ``COERCE_KINDS``.
+    """
+    changed: list[str] = []
+    for step in coercions:
+        col, kind = step["column"], step["kind"]
+        if col not in df.columns:
+            raise KeyError(col)
+        if kind not in COERCE_KINDS:
+            raise ValueError(f"unknown kind {kind!r}")
+        df = coerce_column(df, col, kind)
+        if col not in changed:
+            changed.append(col)
+    return df, changed
 
-    import matplotlib.pyplot as plt
 
-    fig, ax = plt.subplots()
-    ax.imshow(df.isna(), aspect="auto", cmap="viridis")
+def missing_density(df: pd.DataFrame, bins: int = 200) -> dict:
+    """Return the fraction of missing values per column in ``bins`` row blocks.
+
+    Rows are split into at most ``bins`` contiguous blocks and the null mask
+    is summed per block with a single ``np.add.reduceat``, so the result has
+    a fixed resolution however long the frame is. ``row_starts`` holds the
+    first row of each block.
+    """
+    n = len(df)
+    nbins = max(1, min(bins, n))
+    starts = (np.arange(nbins, dtype=np.int64) * n) // nbins
+    if n:
+        mask = df.isna().to_numpy(dtype=np.uint8)
+        sizes = np.diff(np.append(starts, n))
+        density = np.add.reduceat(mask, starts, axis=0) / sizes[:, None]
+    else:
+        density = np.zeros((0, df.shape[1]))
+        starts = starts[:0]
+    return {
+        "rows": n,
+        "columns": [str(c) for c in df.columns],
+        "row_starts": starts.tolist(),
+        "density": density.round(4).tolist(),
+    }
+
+
+def density_heatmap(density: dict):
+    """Render a ``missing_density`` result as a PNG in a BytesIO."""
+    from .figures import figure_png, new_figure
+
+    fig = new_figure()
+    ax = fig.subplots()
+    matrix = np.asarray(density["density"], dtype=float).reshape(
+        -1, len(density["columns"])
+    )
+    ax.imshow(
+        matrix,
+        aspect="auto",
+        cmap="viridis",
+        vmin=0.0,
+        vmax=1.0,
+        interpolation="nearest",
+        extent=(-0.5, matrix.shape[1] - 0.5, max(density["rows"], 1), 0),
+    )
     ax.set_title("Missing values")
     ax.set_xlabel("columns")
     ax.set_ylabel("rows")
-    buf = BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+    return figure_png(fig)
+
+
+def missing_heatmap(df: pd.DataFrame, bins: int = 200):
+    """Return a matplotlib heatmap of missing values as BytesIO.
+
+    Long frames are binned with ``missing_density`` first so the image
+    never has more than ``bins`` rows.
+    """
+    return density_heatmap(missing_density(df, bins))
 
 
 def detect_outliers(
@@ -65,11 +188,73 @@ def detect_outliers(
     return (series < lower) | (series > upper)
 
 
-def basic_insights(df: pd.DataFrame) -> dict:
+def _sorted_quantile(srt: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Linear-interpolated quantile per column of a NaN-last, column-sorted array."""
+    pos = (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64).clip(min=0)
+    hi = np.ceil(pos).astype(np.int64).clip(min=0)
+    lo_vals = np.take_along_axis(srt, lo[None, :], axis=0)[0]
+    hi_vals = np.take_along_axis(srt, hi[None, :], axis=0)[0]
+    out = lo_vals + (hi_vals - lo_vals) * (pos - lo)
+    return np.where(counts > 0, out, np.nan)
+
+
+def numeric_column_stats(
+    df: pd.DataFrame, method: str = "iqr", threshold: float = 3.0
+) -> pd.DataFrame:
+    """Vectorised per-column stats and outlier counts for all numeric columns.
+
+    The numeric block is converted to one float matrix and sorted once along
+    the rows, so every column's quartiles come out of a single NumPy pass
+    instead of a ``dropna``/``quantile`` round trip per column. Outliers
+    follow ``detect_outliers`` for both ``iqr`` and ``zscore`` methods.
+    """
+    num = df.select_dtypes(include=["number"])
+    arr = num.to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(arr)
+    counts = valid.sum(axis=0)
+    srt = np.sort(arr, axis=0)  # NaN sorts last
+    if not len(srt):
+        srt = np.full((1, arr.shape[1]), np.nan)
+    q1 = _sorted_quantile(srt, counts, 0.25)
+    median = _sorted_quantile(srt, counts, 0.5)
+    q3 = _sorted_quantile(srt, counts, 0.75)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sums = np.where(valid, arr, 0.0).sum(axis=0)
+        mean = np.where(counts > 0, sums / counts, np.nan)
+        sq = np.where(valid, (arr - mean) ** 2, 0.0).sum(axis=0)
+        if method == "zscore":
+            std0 = np.sqrt(sq / counts)
+            outliers = (np.abs(arr - mean) / std0 > threshold).sum(axis=0)
+        else:
+            iqr = q3 - q1
+            lower = q1 - 1.5 * iqr
+            upper = q3 + 1.5 * iqr
+            outliers = ((arr < lower) | (arr > upper)).sum(axis=0)
+        std = np.where(counts > 1, np.sqrt(sq / (counts - 1)), np.nan)
+    last = (counts - 1).clip(min=0)
+    maximum = np.take_along_axis(srt, last[None, :], axis=0)[0]
+    return pd.DataFrame(
+        {
+            "count": counts,
+            "mean": mean,
+            "std": std,
+            "min": np.where(counts > 0, srt[0], np.nan),
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "max": np.where(counts > 0, maximum, np.nan),
+            "outliers": outliers,
+        },
+        index=num.columns,
+    )
+
+
+def basic_insights(
+    df: pd.DataFrame, method: str = "iqr", threshold: float = 3.0
+) -> dict:
     """Return missing value percentage and outlier counts per column."""
     missing_pct = (df.isna().mean() * 100).round(2).to_dict()
-    outlier_counts: dict[str, int] = {}
-    for col in df.select_dtypes(include=["number"]).columns:
-        mask = detect_outliers(df[col].dropna())
-        outlier_counts[col] = int(mask.sum())
+    stats = numeric_column_stats(df, method=method, threshold=threshold)
+    outlier_counts = {col: int(n) for col, n in stats["outliers"].items()}
     return {"missing_pct": missing_pct, "outlier_counts": outlier_counts}
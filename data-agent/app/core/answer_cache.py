@@ -0,0 +1,146 @@
+"""Persistent cache of NL-to-code answers, shared by every worker process.
+
+Answers live in the ``answers`` table of the app database, keyed by the
+normalised question and a hash of the dataset signature, so they survive
+restarts and are seen by all uvicorn workers. Entries expire after
+``ANSWER_CACHE_MAX_AGE`` seconds and the least recently used ones are
+dropped beyond ``ANSWER_CACHE_ENTRIES``.
+
+With ``ANSWER_SIMILARITY`` set, a question that misses exactly is compared
+with the stored questions of the same dataset by TF-IDF weighted
+character n-grams, and the closest answer is reused above that cosine
+similarity. Everything runs locally.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from .config import settings
+from .storage import (
+    count_answers,
+    evict_answers,
+    get_answer,
+    list_answers,
+    save_answer,
+    touch_answer,
+)
+
+Answer = Tuple[str, str]
+
+NGRAM = 3
+# Questions compared per similarity lookup, most recently used first.
+SIMILARITY_CANDIDATES = 500
+# Evict once per this many stores rather than on every write.
+EVICT_EVERY = 50
+
+# Punctuation that does not change what is asked; a dot is kept between
+# digits so "1.5" and "15" stay different questions.
+_PUNCT = re.compile(r"[?!,;:\"'`]|\.(?!\d)")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0}
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace.
+
+    "Total Sales by Region?" and "total sales by region" normalise alike;
+    comparison operators and numbers are kept.
+    """
+    text = unicodedata.normalize("NFKC", question).casefold()
+    return " ".join(_PUNCT.sub(" ", text).split())
+
+
+def _signature_key(signature: str) -> str:
+    return hashlib.sha256(signature.encode()).hexdigest()
+
+
+def _ngrams(text: str) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i : i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+
+
+def similarity_scores(query: str, questions: Sequence[str]) -> List[float]:
+    """Cosine similarity of ``query`` to each of ``questions``.
+
+    Character n-grams are weighted by smoothed IDF over ``questions`` plus
+    the query, so words every stored question shares count for little.
+    """
+    docs = [_ngrams(q) for q in questions]
+    target = _ngrams(query)
+    n = len(docs) + 1
+    df: Counter = Counter(target.keys())
+    for doc in docs:
+        df.update(doc.keys())
+    idf = {g: math.log((1 + n) / (1 + c)) + 1 for g, c in df.items()}
+
+    def weigh(counts: Counter) -> Dict[str, float]:
+        vec = {g: c * idf[g] for g, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {g: v / norm for g, v in vec.items()}
+
+    q_vec = weigh(target)
+    return [
+        sum(w * q_vec.get(g, 0.0) for g, w in weigh(doc).items()) for doc in docs
+    ]
+
+
+def lookup(question: str, signature: str) -> Answer | None:
+    """Return a stored answer for ``question`` on a dataset with ``signature``."""
+    key = _signature_key(signature)
+    norm = normalize_question(question)
+    since = time.time() - settings.answer_cache_max_age
+    row = get_answer(key, norm, since)
+    if row is None and settings.answer_similarity > 0:
+        row = _similar(key, norm, since)
+    with _lock:
+        if row is None:
+            _stats["misses"] += 1
+        else:
+            _stats["hits"] += 1
+    return None if row is None else (row[0], row[1])
+
+
+def _similar(key: str, norm: str, since: float) -> Answer | None:
+    rows = list_answers(key, since, SIMILARITY_CANDIDATES)
+    if not rows:
+        return None
+    numbers = _NUMBER.findall(norm)
+    scores = similarity_scores(norm, [r[0] for r in rows])
+    best = max(range(len(rows)), key=scores.__getitem__)
+    stored, intent, code = rows[best]
+    # "top 5" and "top 10" look alike but must not share code.
+    if scores[best] < settings.answer_similarity or _NUMBER.findall(stored) != numbers:
+        return None
+    touch_answer(key, stored)
+    with _lock:
+        _stats["similar_hits"] += 1
+    return intent, code
+
+
+def store(question: str, signature: str, intent: str, code: str) -> None:
+    """Save an answer and now and then trim the cache to its bounds."""
+    save_answer(_signature_key(signature), normalize_question(question), intent, code)
+    with _lock:
+        _stats["stores"] += 1
+        evict = _stats["stores"] % EVICT_EVERY == 1
+    if evict:
+        evict_answers(
+            settings.answer_cache_entries,
+            time.time() - settings.answer_cache_max_age,
+        )
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        out = dict(_stats)
+    out["entries"] = count_answers()
+    return out
@@ -0,0 +1,552 @@
+"""Chart aggregations shared by the PNG charts and the data-only chart mode.
+
+Every chart type reduces the frame to a small table first (bar totals,
+histogram bins, five-number summaries, decimated series). The PNG charts
+draw that table with matplotlib; the data mode returns it inside a
+Vega-Lite spec so the browser draws it and the server skips rasterising.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.cbook import boxplot_stats
+
+from .decimate import decimate_line
+from .facets import FACET_LIMIT, facet_aggregate, facet_levels, partition
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+# Outliers kept per box; the extremes are always among them.
+FLIER_LIMIT = 100
+LINE_MAX_POINTS = 4_000
+SCATTER_MAX_POINTS = 20_000
+HEXBIN_GRIDSIZE = 80
+
+Spec = Dict[str, Any]
+HistTable = Tuple[np.ndarray, Dict[str, np.ndarray]]
+
+
+# --- aggregations -----------------------------------------------------------
+
+
+def bar_table(
+    df: pd.DataFrame,
+    x: str,
+    y: Optional[str],
+    agg: str = "sum",
+    hue: Optional[str] = None,
+) -> pd.Series | pd.DataFrame:
+    """``agg(y)`` (or the row count) per ``x``; one column per ``hue`` level."""
+    if hue:
+        keys = df.groupby([x, hue], observed=True)
+        table = keys.size() if y is None else getattr(keys[y], agg)()
+        return table.unstack(hue)
+    if y:
+        return getattr(df.groupby(x, observed=True)[y], agg)()
+    return df[x].value_counts()
+
+
+def _finite(series: pd.Series) -> np.ndarray:
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def hist_table(df: pd.DataFrame, cols: Sequence[str], bins: int = 30) -> HistTable:
+    """Counts of every column in ``cols`` over one set of shared bin edges."""
+    values = {col: _finite(df[col]) for col in cols}
+    present = [v for v in values.values() if len(v)]
+    lo = min((v.min() for v in present), default=0.0)
+    hi = max((v.max() for v in present), default=1.0)
+    edges = np.histogram_bin_edges(np.empty(0), bins, range=(lo, hi))
+    return edges, {col: np.histogram(v, edges)[0] for col, v in values.items()}
+
+
+def _thin(fliers: np.ndarray, limit: int) -> np.ndarray:
+    if len(fliers) <= limit:
+        return fliers
+    fliers = np.sort(fliers)
+    return fliers[np.linspace(0, len(fliers) - 1, limit).round().astype(int)]
+
+
+def box_table(
+    df: pd.DataFrame, cols: Sequence[str], by: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Five-number summaries (1.5 IQR whiskers) per column, and per ``by`` level.
+
+    Each entry is in the form ``Axes.bxp`` takes, plus ``column`` and
+    ``group``; at most :data:`FLIER_LIMIT` outliers are kept per box.
+    """
+    groups: List[Tuple[Optional[str], pd.DataFrame]]
+    if by and by in df.columns:
+        groups = [(str(k), g) for k, g in df.groupby(by, observed=True)]
+    else:
+        groups = [(None, df)]
+    out = []
+    for group, frame in groups:
+        for col in cols:
+            values = _finite(frame[col])
+            if not len(values):
+                continue
+            stats = boxplot_stats(values)[0]
+            stats["fliers"] = _thin(stats["fliers"], FLIER_LIMIT)
+            stats["label"] = col if group is None else f"{col}\n{group}"
+            stats.update(column=col, group=group)
+            out.append(stats)
+    return out
+
+
+# --- Vega-Lite specs --------------------------------------------------------
+
+
+def _field(name: Any) -> str:
+    # Vega-Lite reads dots and brackets in field names as nested access.
+    return str(name).replace(".", "\\.").replace("[", "\\[").replace("]", "\\]")
+
+
+def _vl_type(series: pd.Series) -> str:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "temporal"
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(
+        series
+    ):
+        return "quantitative"
+    return "nominal"
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    frame = frame.rename(columns=str)
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+
+def _spec(values: List[Dict[str, Any]], title: str, **body: Any) -> Spec:
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "title": title,
+        "data": {"values": values},
+        **body,
+    }
+
+
+def _facet(
+    values: List[Dict[str, Any]],
+    title: str,
+    facet_by: str,
+    levels: Sequence[Any],
+    ncols: int,
+    inner: Spec,
+) -> Spec:
+    return _spec(
+        values,
+        title,
+        facet={
+            "field": "facet",
+            "type": "nominal",
+            "title": facet_by,
+            "sort": [str(lvl) for lvl in levels],
+        },
+        columns=ncols,
+        spec=inner,
+        resolve={"scale": {"x": "independent"}},
+    )
+
+
+def _log(enc: Dict[str, Any], log: bool) -> Dict[str, Any]:
+    if log:
+        enc["scale"] = {"type": "log"}
+    return enc
+
+
+def line_data(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    log_y: bool = False,
+    decimate: str = "lttb",
+    max_points: int = LINE_MAX_POINTS,
+) -> Spec:
+    frame = df[[x, y]]
+    if decimate != "none":
+        frame = decimate_line(frame, x, y, max_points, decimate)
+    return _spec(
+        _records(frame),
+        f"{y} vs {x}",
+        mark="line",
+        encoding={
+            "x": {"field": _field(x), "type": _vl_type(df[x])},
+            "y": _log({"field": _field(y), "type": "quantitative"}, log_y),
+        },
+    )
+
+
+def _bar_records(table: pd.Series | pd.DataFrame, x: str, hue: Optional[str]):
+    if isinstance(table, pd.DataFrame):
+        long = table.stack().rename("value").reset_index()
+        long.columns = [x, hue, "value"]
+    else:
+        long = table.rename("value").rename_axis(x).reset_index()
+    return _records(long)
+
+
+def bar_data(
+    df: pd.DataFrame,
+    x: str,
+    y: Optional[str],
+    agg: str = "sum",
+    stacked: bool = False,
+    hue: Optional[str] = None,
+) -> Spec:
+    return bar_spec(bar_table(df, x, y, agg, hue), x, y, agg, stacked, hue)
+
+
+def bar_spec(
+    table: pd.Series | pd.DataFrame,
+    x: str,
+    y: Optional[str],
+    agg: str = "sum",
+    stacked: bool = False,
+    hue: Optional[str] = None,
+    **_: Any,
+) -> Spec:
+    """Wrap a ``bar_table`` in a Vega-Lite spec."""
+    encoding: Dict[str, Any] = {
+        "x": {"field": _field(x), "type": "nominal", "sort": None},
+        "y": {
+            "field": "value",
+            "type": "quantitative",
+            "title": f"{agg}({y})" if y else "count",
+        },
+    }
+    if hue:
+        encoding["color"] = {"field": _field(hue), "type": "nominal"}
+        if not stacked:
+            encoding["xOffset"] = {"field": _field(hue)}
+    return _spec(
+        _bar_records(table, x, hue), "Bar chart", mark="bar", encoding=encoding
+    )
+
+
+def _hist_records(edges: np.ndarray, counts: Dict[str, np.ndarray]):
+    return [
+        {"column": col, "bin_start": lo, "bin_end": hi, "count": int(n)}
+        for col, col_counts in counts.items()
+        for lo, hi, n in zip(
+            edges[:-1].tolist(), edges[1:].tolist(), col_counts, strict=True
+        )
+    ]
+
+
+def _hist_encoding(log_y: bool, multi: bool) -> Dict[str, Any]:
+    encoding: Dict[str, Any] = {
+        "x": {"field": "bin_start", "bin": {"binned": True}, "title": "value"},
+        "x2": {"field": "bin_end"},
+        "y": {"field": "count", "type": "quantitative", "title": "frequency"},
+    }
+    if log_y:
+        encoding["y"]["scale"] = {"type": "symlog"}
+    if multi:
+        encoding["color"] = {"field": "column", "type": "nominal"}
+        encoding["opacity"] = {"value": 0.6}
+    return encoding
+
+
+def hist_data(
+    df: pd.DataFrame, cols: Sequence[str], bins: int = 30, log_y: bool = False
+) -> Spec:
+    return hist_spec(hist_table(df, cols, bins), cols, log_y=log_y)
+
+
+def hist_spec(
+    table: HistTable, cols: Sequence[str], log_y: bool = False, **_: Any
+) -> Spec:
+    """Wrap a ``hist_table`` in a Vega-Lite spec."""
+    edges, counts = table
+    return _spec(
+        _hist_records(edges, counts),
+        f"Histogram ({', '.join(cols)})",
+        mark="bar",
+        encoding=_hist_encoding(log_y, len(cols) > 1),
+    )
+
+
+def box_data(df: pd.DataFrame, cols: Sequence[str], by: Optional[str] = None) -> Spec:
+    return box_spec(box_table(df, cols, by), cols, by)
+
+
+def box_spec(
+    boxes: List[Dict[str, Any]],
+    cols: Sequence[str],
+    by: Optional[str] = None,
+    **_: Any,
+) -> Spec:
+    """Wrap a ``box_table`` in a layered Vega-Lite spec."""
+    keys = ("whislo", "q1", "med", "q3", "whishi", "mean")
+    summary = [
+        {"column": b["column"], "group": b["group"], **{k: float(b[k]) for k in keys}}
+        for b in boxes
+    ]
+    fliers = [
+        {"column": b["column"], "group": b["group"], "value": float(v)}
+        for b in boxes
+        for v in b["fliers"]
+    ]
+    grouped = any(b["group"] is not None for b in boxes)
+    x: Dict[str, Any] = {"field": "group" if grouped else "column", "type": "nominal"}
+    if grouped:
+        x["title"] = by
+    offset = {"xOffset": {"field": "column"}} if grouped and len(cols) > 1 else {}
+    color = {"color": {"field": "column", "type": "nominal"}}
+    y_title = ", ".join(cols)
+    whiskers = {"field": "whislo", "type": "quantitative", "title": y_title}
+    return _spec(
+        summary,
+        f"Box plot grouped by {by}" if grouped else f"Box plot ({y_title})",
+        layer=[
+            {
+                "mark": "rule",
+                "encoding": {
+                    "x": x,
+                    **offset,
+                    "y": whiskers,
+                    "y2": {"field": "whishi"},
+                },
+            },
+            {
+                "mark": {"type": "bar", "size": 14},
+                "encoding": {
+                    "x": x,
+                    **offset,
+                    **color,
+                    "y": {"field": "q1", "type": "quantitative"},
+                    "y2": {"field": "q3"},
+                },
+            },
+            {
+                "mark": {"type": "tick", "color": "white", "size": 14},
+                "encoding": {
+                    "x": x,
+                    **offset,
+                    "y": {"field": "med", "type": "quantitative"},
+                },
+            },
+            {
+                "data": {"values": fliers},
+                "mark": {"type": "point", "filled": True, "size": 12},
+                "encoding": {
+                    "x": x,
+                    **offset,
+                    **color,
+                    "y": {"field": "value", "type": "quantitative"},
+                },
+            },
+        ],
+    )
+
+
+def _edges(values: np.ndarray, bins: int, log: bool) -> np.ndarray:
+    if log:
+        values = np.log10(values[values > 0])
+    edges = np.histogram_bin_edges(values, bins)
+    return 10**edges if log else edges
+
+
+def scatter_data(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    hue: Optional[str] = None,
+    log_x: bool = False,
+    log_y: bool = False,
+    decimate: str = "hexbin",
+    max_points: int = SCATTER_MAX_POINTS,
+    gridsize: int = HEXBIN_GRIDSIZE,
+) -> Spec:
+    """Points, or above ``max_points`` rows a binned 2-D density.
+
+    Vega-Lite has no hexagonal mark, so the density uses square cells.
+    """
+    if decimate not in ("hexbin", "sample", "none"):
+        raise ValueError(f"unknown decimation method: {decimate}")
+    title = f"Scatter: {y} vs {x}"
+    use_hue = bool(hue and hue in df.columns)
+    frame = df[[x, y, hue] if use_hue else [x, y]]
+    if decimate != "none" and len(frame) > max_points:
+        if decimate == "hexbin" and not use_hue:
+            return _density_data(frame.dropna(), x, y, gridsize, log_x, log_y, title)
+        frame = frame.sample(max_points, random_state=0).sort_index()
+    encoding = {
+        "x": _log({"field": _field(x), "type": "quantitative"}, log_x),
+        "y": _log({"field": _field(y), "type": "quantitative"}, log_y),
+    }
+    if use_hue:
+        encoding["color"] = {"field": _field(hue), "type": "nominal"}
+    return _spec(_records(frame), title, mark="point", encoding=encoding)
+
+
+def _density_data(frame, x, y, gridsize, log_x, log_y, title) -> Spec:
+    xs, ys = frame[x].to_numpy(dtype=float), frame[y].to_numpy(dtype=float)
+    # Infinities survive dropna() but break the automatic bin range.
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    xs, ys = xs[finite], ys[finite]
+    x_edges = _edges(xs, gridsize, log_x)
+    y_edges = _edges(ys, gridsize, log_y)
+    counts, _, _ = np.histogram2d(xs, ys, [x_edges, y_edges])
+    i, j = np.nonzero(counts)
+    values = [
+        {"x": a, "x2": b, "y": c, "y2": d, "count": int(n)}
+        for a, b, c, d, n in zip(
+            x_edges[i].tolist(),
+            x_edges[i + 1].tolist(),
+            y_edges[j].tolist(),
+            y_edges[j + 1].tolist(),
+            counts[i, j],
+            strict=True,
+        )
+    ]
+    return _spec(
+        values,
+        title,
+        mark="rect",
+        encoding={
+            "x": _log({"field": "x", "type": "quantitative", "title": x}, log_x),
+            "x2": {"field": "x2"},
+            "y": _log({"field": "y", "type": "quantitative", "title": y}, log_y),
+            "y2": {"field": "y2"},
+            "color": {
+                "field": "count",
+                "type": "quantitative",
+                "title": "rows",
+                "scale": {"type": "log"},
+            },
+        },
+    )
+
+
+def facet_line_data(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    facet_by: str,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+    ncols: int = 2,
+) -> Spec:
+    facets = partition(df, facet_by, [x, y], limit, order)
+    values = [
+        {"facet": str(lvl), **row}
+        for lvl, sub in facets
+        for row in _records(decimate_line(sub, x, y, LINE_MAX_POINTS))
+    ]
+    inner = {
+        "mark": "line",
+        "encoding": {
+            "x": {"field": _field(x), "type": _vl_type(df[x])},
+            "y": {"field": _field(y), "type": "quantitative"},
+        },
+    }
+    levels = [lvl for lvl, _ in facets]
+    title = f"{y} vs {x} faceted by {facet_by}"
+    return _facet(values, title, facet_by, levels, ncols, inner)
+
+
+def facet_bar_data(
+    df: pd.DataFrame,
+    x: str,
+    y: Optional[str],
+    facet_by: str,
+    agg: str = "sum",
+    stacked: bool = False,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+    ncols: int = 2,
+) -> Spec:
+    levels = facet_levels(df, facet_by, limit, order)
+    facets = facet_aggregate(df, facet_by, x, y, agg, levels)
+    return facet_bar_spec(facets, x, y, facet_by, agg, ncols=ncols)
+
+
+def facet_bar_spec(
+    facets: List[Tuple[Any, pd.Series]],
+    x: str,
+    y: Optional[str],
+    facet_by: str,
+    agg: str = "sum",
+    ncols: int = 2,
+    **_: Any,
+) -> Spec:
+    """Wrap the output of ``facet_aggregate`` in a faceted Vega-Lite spec."""
+    values = [
+        {"facet": str(lvl), **row}
+        for lvl, grp in facets
+        for row in _bar_records(grp, x, None)
+    ]
+    inner = {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": _field(x), "type": "nominal", "sort": None},
+            "y": {
+                "field": "value",
+                "type": "quantitative",
+                "title": f"{agg}({y})" if y else "count",
+            },
+        },
+    }
+    levels = [lvl for lvl, _ in facets]
+    return _facet(values, f"Facet bar by {facet_by}", facet_by, levels, ncols, inner)
+
+
+def facet_hist_data(
+    df: pd.DataFrame,
+    col: str,
+    facet_by: str,
+    bins: int = 30,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+    ncols: int = 2,
+) -> Spec:
+    facets = partition(df, facet_by, [col], limit, order)
+    tables = [(lvl, hist_table(sub, [col], bins)) for lvl, sub in facets]
+    return facet_hist_spec(tables, col, facet_by, ncols=ncols)
+
+
+def facet_hist_spec(
+    facets: List[Tuple[Any, HistTable]],
+    col: str,
+    facet_by: str,
+    ncols: int = 2,
+    **_: Any,
+) -> Spec:
+    """Wrap one ``hist_table`` per facet in a faceted Vega-Lite spec."""
+    values = [
+        {"facet": str(lvl), **row}
+        for lvl, table in facets
+        for row in _hist_records(*table)
+    ]
+    inner = {"mark": "bar", "encoding": _hist_encoding(False, False)}
+    levels = [lvl for lvl, _ in facets]
+    title = f"{col} distribution by {facet_by}"
+    return _facet(values, title, facet_by, levels, ncols, inner)
+
+
+CHART_DATA: Dict[str, Callable[..., Spec]] = {
+    "line": line_data,
+    "bar": bar_data,
+    "hist": hist_data,
+    "box": box_data,
+    "scatter": scatter_data,
+    "facet_line": facet_line_data,
+    "facet_bar": facet_bar_data,
+    "facet_hist": facet_hist_data,
+}
+
+
+def chart_data(chart_type: str, df: pd.DataFrame, params: Dict[str, Any]) -> Spec:
+    """Return the aggregated data of a chart as an inline-data Vega-Lite spec.
+
+    Takes the same ``params`` as the PNG chart of the same type.
+
+    Raises:
+        KeyError: for an unknown ``chart_type``.
+    """
+    return CHART_DATA[chart_type](df, **params)
@@ -0,0 +1,173 @@
+"""Shared aggregation plan for rendering many charts of one dataset at once.
+
+A dashboard asks for several charts of the same frame, and they tend to
+group it by the same keys: a bar chart and its PNG/Vega twin, a faceted
+bar and a faceted histogram split by the same column. The plan memoises
+every table by its normalised arguments so each groupby, value count and
+facet partition is computed once per batch, then hands the small tables
+to the drawers.
+"""
+from __future__ import annotations
+
+import inspect
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+import pandas as pd
+
+from .chart_data import (
+    CHART_DATA,
+    bar_spec,
+    bar_table,
+    box_spec,
+    box_table,
+    facet_bar_spec,
+    facet_hist_spec,
+    hist_spec,
+    hist_table,
+)
+from .charts import (
+    CHARTS,
+    chart_columns,
+    draw_bar,
+    draw_box,
+    draw_facet_bar,
+    draw_facet_hist,
+    draw_hist,
+)
+from .facets import facet_split, facet_table, pick_levels
+
+
+def _key(value: Any) -> Hashable:
+    return tuple(value) if isinstance(value, list) else value
+
+
+class ChartPlan:
+    """Memoised aggregations over one frame.
+
+    ``computed`` counts the tables actually built and ``reused`` the
+    requests answered from an earlier one.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._tables: Dict[Hashable, Any] = {}
+        self.computed = 0
+        self.reused = 0
+
+    def _memo(self, key: Tuple[Any, ...], build: Callable[[], Any]) -> Any:
+        key = tuple(_key(k) for k in key)
+        if key in self._tables:
+            self.reused += 1
+            return self._tables[key]
+        table = self._tables[key] = build()
+        self.computed += 1
+        return table
+
+    def groups(self, facet_by: str) -> Dict[Any, Any]:
+        """Row positions of every level of ``facet_by``, in order of appearance."""
+        return self._memo(
+            ("groups", facet_by),
+            lambda: self.df.groupby(facet_by, sort=False, observed=True).indices,
+        )
+
+    def bar(self, x, y, agg, hue, **_):
+        return self._memo(
+            ("bar", x, y, agg, hue), lambda: bar_table(self.df, x, y, agg, hue)
+        )
+
+    def hist(self, cols, bins, **_):
+        return self._memo(
+            ("hist", cols, bins), lambda: hist_table(self.df, cols, bins)
+        )
+
+    def box(self, cols, by, **_):
+        return self._memo(("box", cols, by), lambda: box_table(self.df, cols, by))
+
+    def facet_bar(self, x, y, facet_by, agg, limit, order, **_):
+        levels = pick_levels(self.groups(facet_by), order, limit)
+        table = self._memo(
+            ("facet_table", facet_by, x, y, agg),
+            lambda: facet_table(self.df, facet_by, x, y, agg),
+        )
+        return facet_split(table, levels, counts=y is None)
+
+    def facet_hist(self, col, facet_by, bins, limit, order, **_):
+        groups = self.groups(facet_by)
+        frame = self.df[[col]]
+
+        def level_table(lvl: Any) -> Any:
+            return self._memo(
+                ("facet_hist", col, facet_by, lvl, bins),
+                lambda: hist_table(frame.take(groups[lvl]), [col], bins),
+            )
+
+        return [(lvl, level_table(lvl)) for lvl in pick_levels(groups, order, limit)]
+
+    def stats(self) -> Dict[str, int]:
+        return {"computed": self.computed, "reused": self.reused}
+
+
+# Chart types drawn from a small table: (plan method, PNG drawer, Vega builder).
+# The others (line, scatter, facet_line) decimate raw rows while drawing.
+AGGREGATED: Dict[str, Tuple[Callable, Callable, Callable]] = {
+    "bar": (ChartPlan.bar, draw_bar, bar_spec),
+    "hist": (ChartPlan.hist, draw_hist, hist_spec),
+    "box": (ChartPlan.box, draw_box, box_spec),
+    "facet_bar": (ChartPlan.facet_bar, draw_facet_bar, facet_bar_spec),
+    "facet_hist": (ChartPlan.facet_hist, draw_facet_hist, facet_hist_spec),
+}
+
+
+def bind_params(chart_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``params`` with the chart's defaults filled in.
+
+    Two specs that differ only by spelling out a default bind to the same
+    arguments, and so share their tables.
+
+    Raises:
+        KeyError: for an unknown ``chart_type``.
+        TypeError: if ``params`` do not fit the chart.
+    """
+    bound = inspect.signature(CHARTS[chart_type]).bind(None, **params)
+    bound.apply_defaults()
+    args = dict(bound.arguments)
+    args.pop("df")
+    return args
+
+
+def draw_table(chart_type: str, table: Any, args: Dict[str, Any]) -> bytes:
+    """Rasterise a table from :class:`ChartPlan`; runs on a render worker."""
+    return AGGREGATED[chart_type][1](table, **args).getvalue()
+
+
+def plan_chart(
+    plan: ChartPlan, chart_type: str, params: Dict[str, Any], fmt: str
+) -> Tuple[str, Any]:
+    """Prepare one chart of a batch from the shared plan.
+
+    Returns ``("spec", vega_spec)`` when nothing is left to draw,
+    ``("table", (table, args))`` for an aggregated PNG chart and
+    ``("raw", None)`` when the chart has to be drawn from raw rows.
+
+    Raises:
+        KeyError: for an unknown ``chart_type``.
+        TypeError: if ``params`` do not fit the chart.
+    """
+    args = bind_params(chart_type, params)
+    if chart_type not in AGGREGATED:
+        if fmt == "vega":
+            return "spec", CHART_DATA[chart_type](plan.df, **args)
+        return "raw", None
+    aggregate, _, build_spec = AGGREGATED[chart_type]
+    table = aggregate(plan, **args)
+    if fmt == "vega":
+        return "spec", build_spec(table, **args)
+    return "table", (table, args)
+
+
+def batch_columns(charts: List[Dict[str, Any]]) -> List[str]:
+    """Every column the ``params`` of ``charts`` refer to, in first-use order."""
+    cols: List[str] = []
+    for params in charts:
+        cols.extend(chart_columns(params))
+    return list(dict.fromkeys(cols))
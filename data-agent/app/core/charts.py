@@ -1,25 +1,51 @@
 from io import BytesIO
-from typing import Optional, Sequence
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
+from .chart_data import (
+    HEXBIN_GRIDSIZE,
+    LINE_MAX_POINTS,
+    SCATTER_MAX_POINTS,
+    HistTable,
+    bar_table,
+    box_table,
+    hist_table,
+)
+from .decimate import decimate_line
+from .figures import figure_png, new_figure
+from .facets import (
+    FACET_LIMIT,
+    facet_aggregate,
+    facet_figure,
+    facet_levels,
+    partition,
+)
 
-def _fig_to_png(fig) -> BytesIO:
-    buf = BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    plt.close(fig)
-    return buf
 
+def line_plot(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    log_y: bool = False,
+    decimate: str = "lttb",
+    max_points: int = LINE_MAX_POINTS,
+):
+    """Line chart of ``y`` over ``x``.
 
-def line_plot(df: pd.DataFrame, x: str, y: str, log_y: bool = False):
-    fig, ax = plt.subplots()
+    Longer series are reduced to ``max_points`` with ``decimate`` ("lttb"
+    or "minmax"; "none" draws every row).
+    """
+    if decimate != "none":
+        df = decimate_line(df[[x, y]], x, y, max_points, decimate)
+    fig = new_figure()
+    ax = fig.subplots()
     df.plot(x=x, y=y, ax=ax)
     ax.set_title(f"{y} vs {x}")
     if log_y:
         ax.set_yscale("log")
-    return _fig_to_png(fig)
+    return figure_png(fig)
 
 
 def bar_plot(
@@ -30,52 +56,73 @@ def bar_plot(
     stacked: bool = False,
     hue: Optional[str] = None,
 ):
-    fig, ax = plt.subplots()
-
-    if hue:
-        pivot = df.pivot_table(
-            index=x, columns=hue, values=y or x, aggfunc=("count" if y is None else agg)
-        )
-        pivot.plot(kind="bar", stacked=stacked, ax=ax)
-        ax.set_ylabel(("count" if y is None else f"{agg}({y})"))
-    else:
-        if y:
-            grouped = getattr(df.groupby(x)[y], agg)()
-            grouped.plot(kind="bar", ax=ax)
-            ax.set_ylabel(f"{agg}({y})")
-        else:
-            df[x].value_counts().plot(kind="bar", ax=ax)
-            ax.set_ylabel("count")
+    return draw_bar(bar_table(df, x, y, agg, hue), x, y, agg, stacked, hue)
 
+
+def draw_bar(
+    table: pd.Series | pd.DataFrame,
+    x: str,
+    y: Optional[str],
+    agg: str = "sum",
+    stacked: bool = False,
+    hue: Optional[str] = None,
+    **_: Any,
+) -> BytesIO:
+    """Draw a ``bar_table``."""
+    fig = new_figure()
+    ax = fig.subplots()
+    table.plot(kind="bar", stacked=bool(hue) and stacked, ax=ax)
+    ax.set_ylabel("count" if y is None else f"{agg}({y})")
     ax.set_xlabel(x)
     ax.set_title("Bar chart")
-    return _fig_to_png(fig)
+    return figure_png(fig)
 
 
 def hist_plot(
     df: pd.DataFrame, cols: Sequence[str], bins: int = 30, log_y: bool = False
 ):
-    fig, ax = plt.subplots()
-    df[list(cols)].plot(kind="hist", bins=bins, alpha=0.6, ax=ax)
+    return draw_hist(hist_table(df, cols, bins), cols, log_y=log_y)
+
+
+def draw_hist(
+    table: HistTable, cols: Sequence[str], log_y: bool = False, **_: Any
+) -> BytesIO:
+    """Draw a ``hist_table``."""
+    fig = new_figure()
+    ax = fig.subplots()
+    edges, counts = table
+    for col, col_counts in counts.items():
+        ax.hist(edges[:-1], edges.tolist(), weights=col_counts, alpha=0.6, label=col)
+    ax.legend()
     ax.set_title(f"Histogram ({', '.join(cols)})")
     ax.set_xlabel("value")
     ax.set_ylabel("frequency")
     if log_y:
         ax.set_yscale("log")
-    return _fig_to_png(fig)
+    return figure_png(fig)
 
 
 def box_plot(df: pd.DataFrame, cols: Sequence[str], by: Optional[str] = None):
-    fig, ax = plt.subplots()
-    if by and by in df.columns:
-        df.boxplot(column=list(cols), by=by, ax=ax)
+    return draw_box(box_table(df, cols, by), cols, by)
+
+
+def draw_box(
+    boxes: List[Dict[str, Any]],
+    cols: Sequence[str],
+    by: Optional[str] = None,
+    **_: Any,
+) -> BytesIO:
+    """Draw a ``box_table``."""
+    fig = new_figure()
+    ax = fig.subplots()
+    if boxes:
+        ax.bxp(boxes)
+    if any(b["group"] is not None for b in boxes):
         ax.set_title(f"Box plot grouped by {by}")
-        plt.suptitle("")
-        ax.set_xlabel(by)
+        ax.set_xlabel(by or "")
     else:
-        df[list(cols)].plot(kind="box", ax=ax)
         ax.set_title(f"Box plot ({', '.join(cols)})")
-    return _fig_to_png(fig)
+    return figure_png(fig)
 
 
 def scatter_plot(
@@ -85,14 +132,59 @@ def scatter_plot(
     hue: Optional[str] = None,
     log_x: bool = False,
     log_y: bool = False,
+    decimate: str = "hexbin",
+    max_points: int = SCATTER_MAX_POINTS,
+    gridsize: int = HEXBIN_GRIDSIZE,
 ):
-    fig, ax = plt.subplots()
-    if hue and hue in df.columns:
-        for val, chunk in df.groupby(hue):
+    """Scatter chart of ``y`` against ``x``.
+
+    Above ``max_points`` rows it draws a hexbin density (``decimate="hexbin"``)
+    or a uniform random subsample of ``max_points`` rows (``"sample"``, kept
+    for ``hue`` charts since density cannot show groups); "none" draws every
+    row.
+    """
+    if decimate not in ("hexbin", "sample", "none"):
+        raise ValueError(f"unknown decimation method: {decimate}")
+    fig = new_figure()
+    ax = fig.subplots()
+    use_hue = bool(hue and hue in df.columns)
+    if decimate != "none" and len(df) > max_points:
+        if decimate == "hexbin" and not use_hue:
+            _hexbin(ax, df, x, y, gridsize, log_x, log_y)
+            return figure_png(fig)
+        df = df.sample(max_points, random_state=0).sort_index()
+    if use_hue:
+        for val, chunk in df.groupby(hue, observed=True):
             ax.scatter(chunk[x], chunk[y], label=str(val), alpha=0.7)
         ax.legend(title=hue)
     else:
         ax.scatter(df[x], df[y], alpha=0.7)
+    _scatter_labels(ax, x, y, log_x, log_y)
+    return figure_png(fig)
+
+
+def _hexbin(ax, df: pd.DataFrame, x: str, y: str, gridsize, log_x, log_y) -> None:
+    xs, ys = df[x].to_numpy(dtype=float), df[y].to_numpy(dtype=float)
+    # A log axis cannot place values <= 0; the point scatter just leaves them out.
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    if log_x:
+        keep &= xs > 0
+    if log_y:
+        keep &= ys > 0
+    art = ax.hexbin(
+        xs[keep],
+        ys[keep],
+        gridsize=gridsize,
+        bins="log",
+        mincnt=1,
+        xscale="log" if log_x else "linear",
+        yscale="log" if log_y else "linear",
+    )
+    ax.figure.colorbar(art, ax=ax, label="rows")
+    _scatter_labels(ax, x, y, log_x, log_y)
+
+
+def _scatter_labels(ax, x: str, y: str, log_x: bool, log_y: bool) -> None:
     ax.set_xlabel(x)
     ax.set_ylabel(y)
     ax.set_title(f"Scatter: {y} vs {x}")
@@ -100,23 +192,24 @@ def scatter_plot(
         ax.set_xscale("log")
     if log_y:
         ax.set_yscale("log")
-    return _fig_to_png(fig)
 
 
-def facet_line(df: pd.DataFrame, x: str, y: str, facet_by: str):
-    levels = df[facet_by].dropna().unique()[:8]
-    n = len(levels)
-    cols = 2
-    rows = (n + 1) // cols
-    fig, axes = plt.subplots(rows, cols, figsize=(10, 4 * rows), squeeze=False)
-    for ax, lvl in zip(axes.ravel(), levels):
-        sub = df[df[facet_by] == lvl]
-        sub.plot(x=x, y=y, ax=ax, title=str(lvl))
-    for ax in axes.ravel()[n:]:
-        ax.axis("off")
-    fig.suptitle(f"{y} vs {x} faceted by {facet_by}")
-    fig.tight_layout()
-    return _fig_to_png(fig)
+def facet_line(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    facet_by: str,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+    ncols: int = 2,
+):
+    facets = partition(df, facet_by, [x, y], limit, order)
+
+    def draw(ax, lvl, sub):
+        sub.plot(x=x, y=y, ax=ax)
+
+    fig = facet_figure(facets, draw, f"{y} vs {x} faceted by {facet_by}", ncols)
+    return figure_png(fig)
 
 
 def facet_bar(
@@ -126,41 +219,94 @@ def facet_bar(
     facet_by: str,
     agg: str = "sum",
     stacked: bool = False,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+    ncols: int = 2,
+) -> BytesIO:
+    levels = facet_levels(df, facet_by, limit, order)
+    facets = facet_aggregate(df, facet_by, x, y, agg, levels)
+    return draw_facet_bar(facets, x, y, facet_by, agg, stacked, ncols=ncols)
+
+
+def draw_facet_bar(
+    facets: List[Tuple[Any, pd.Series]],
+    x: str,
+    y: Optional[str],
+    facet_by: str,
+    agg: str = "sum",
+    stacked: bool = False,
+    ncols: int = 2,
+    **_: Any,
+) -> BytesIO:
+    """Draw the output of ``facet_aggregate``."""
+
+    def draw(ax, lvl, grp):
+        grp.plot(kind="bar", stacked=stacked, ax=ax)
+        ax.set_ylabel(f"{agg}({y})" if y else "count")
+
+    fig = facet_figure(facets, draw, f"Facet bar by {facet_by}", ncols)
+    return figure_png(fig)
+
+
+def facet_hist(
+    df: pd.DataFrame,
+    col: str,
+    facet_by: str,
+    bins: int = 30,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+    ncols: int = 2,
+) -> BytesIO:
+    facets = partition(df, facet_by, [col], limit, order)
+    tables = [(lvl, hist_table(sub, [col], bins)) for lvl, sub in facets]
+    return draw_facet_hist(tables, col, facet_by, ncols=ncols)
+
+
+def draw_facet_hist(
+    facets: List[Tuple[Any, HistTable]],
+    col: str,
+    facet_by: str,
+    ncols: int = 2,
+    **_: Any,
 ) -> BytesIO:
-    levels = df[facet_by].dropna().unique()[:8]
-    n = len(levels)
-    cols = 2
-    rows = (n + 1) // cols
-    fig, axes = plt.subplots(rows, cols, figsize=(10, 4 * rows), squeeze=False)
-    for ax, lvl in zip(axes.ravel(), levels):
-        sub = df[df[facet_by] == lvl]
-        if y:
-            grp = getattr(sub.groupby(x)[y], agg)()
-            grp.plot(kind="bar", stacked=stacked, ax=ax)
-            ax.set_ylabel(f"{agg}({y})")
-        else:
-            sub[x].value_counts().plot(kind="bar", ax=ax)
-            ax.set_ylabel("count")
-        ax.set_title(str(lvl))
-    for ax in axes.ravel()[n:]:
-        ax.axis("off")
-    fig.suptitle(f"Facet bar by {facet_by}")
-    fig.tight_layout()
-    return _fig_to_png(fig)
-
-
-def facet_hist(df: pd.DataFrame, col: str, facet_by: str, bins: int = 30) -> BytesIO:
-    levels = df[facet_by].dropna().unique()[:8]
-    n = len(levels)
-    cols = 2
-    rows = (n + 1) // cols
-    fig, axes = plt.subplots(rows, cols, figsize=(10, 4 * rows), squeeze=False)
-    for ax, lvl in zip(axes.ravel(), levels):
-        sub = df[df[facet_by] == lvl]
-        sub[col].plot(kind="hist", bins=bins, alpha=0.7, ax=ax)
-        ax.set_title(str(lvl))
-    for ax in axes.ravel()[n:]:
-        ax.axis("off")
-    fig.suptitle(f"{col} distribution by {facet_by}")
-    fig.tight_layout()
-    return _fig_to_png(fig)
+    """Draw one ``hist_table`` of ``col`` per facet."""
+
+    def draw(ax, lvl, table):
+        edges, counts = table
+        ax.hist(edges[:-1], edges, weights=counts[col], alpha=0.7)
+
+    fig = facet_figure(facets, draw, f"{col} distribution by {facet_by}", ncols)
+    return figure_png(fig)
+
+
+CHARTS: Dict[str, Callable[..., BytesIO]] = {
+    "line": line_plot,
+    "bar": bar_plot,
+    "hist": hist_plot,
+    "box": box_plot,
+    "scatter": scatter_plot,
+    "facet_line": facet_line,
+    "facet_bar": facet_bar,
+    "facet_hist": facet_hist,
+}
+
+
+def chart_columns(params: Dict[str, Any]) -> List[str]:
+    """Return the dataset columns a chart's ``params`` refer to."""
+    cols: List[str] = []
+    for key in ("x", "y", "hue", "by", "facet_by", "col", "cols"):
+        val = params.get(key)
+        if isinstance(val, str):
+            cols.append(val)
+        elif isinstance(val, (list, tuple)):
+            cols.extend(v for v in val if isinstance(v, str))
+    return list(dict.fromkeys(cols))
+
+
+def render_chart(chart_type: str, df: pd.DataFrame, params: Dict[str, Any]) -> bytes:
+    """Render a chart of ``chart_type`` to PNG bytes.
+
+    Raises:
+        KeyError: for an unknown ``chart_type``.
+    """
+    return CHARTS[chart_type](df, **params).getvalue()
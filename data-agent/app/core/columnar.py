@@ -0,0 +1,472 @@
+"""Columnar (Arrow IPC / Feather v2) copies of uploaded datasets.
+
+Uploads are parsed once and written uncompressed next to the raw file so
+that later loads can memory-map the file instead of re-parsing CSV/XLSX.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import feather
+
+from .config import settings
+from .error_utils import logger
+from .file_loader import load_any
+from .optimize import optimize_dtypes
+from .sampling import build_sample
+from .storage import (
+    file_in_use,
+    get_columnar_path,
+    get_dataset_path,
+    get_dataset_sheet,
+    get_layer_paths,
+    get_sample_path,
+    get_version_of,
+    set_columnar_path,
+    set_dtype_report,
+    set_sample_path,
+)
+
+COLUMNAR_SUFFIX = ".arrow"
+SAMPLE_SUFFIX = ".sample.arrow"
+_ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+
+
+class SchemaMismatch(ValueError):
+    """Raised when appended rows do not fit the columns of the stored dataset."""
+
+
+def columnar_path_for(
+    raw_path: str | Path, sheet: str | None = None, tag: str | None = None
+) -> Path:
+    """Return where the Arrow copy of ``raw_path`` (or one of its sheets) lives.
+
+    ``tag`` names a later version of the data, e.g. after rows were appended.
+    """
+    raw = Path(raw_path)
+    name = raw.name
+    if sheet is not None:
+        # The readable part alone would map "a b" and "a_b" to one file.
+        readable = re.sub(r"[^\w-]", "_", sheet)
+        name += f".{readable}-{hashlib.sha256(sheet.encode()).hexdigest()[:12]}"
+    if tag is not None:
+        name += f".{tag}"
+    return raw.with_name(name + COLUMNAR_SUFFIX)
+
+
+def sample_path_for(
+    raw_path: str | Path, sheet: str | None = None, tag: str | None = None
+) -> Path:
+    path = columnar_path_for(raw_path, sheet, tag)
+    return path.with_name(path.name[: -len(COLUMNAR_SUFFIX)] + SAMPLE_SUFFIX)
+
+
+def write_columnar(df: pd.DataFrame, path: str | Path) -> Path:
+    """Write ``df`` as an uncompressed Arrow IPC file (required for zero-copy mmap)."""
+    return _write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+
+
+def _write_table(table: pa.Table, path: str | Path) -> Path:
+    path = Path(path)
+    # First loads of one dataset may convert it in several threads or render
+    # workers at once; each writes its own temp file and the last rename wins.
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        try:
+            tmp.replace(path)
+        except OSError:
+            # Windows will not replace a file another loader has memory-mapped;
+            # that loader wrote the same data, so losing the race is harmless.
+            if not path.exists():
+                raise
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path
+
+
+def _to_pandas(table: pa.Table | pa.RecordBatch) -> pd.DataFrame:
+    types_mapper = _arrow_string_mapper if settings.arrow_strings else None
+    return table.to_pandas(split_blocks=True, types_mapper=types_mapper)
+
+
+def read_columnar(
+    path: str | Path, columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+    """Memory-map an Arrow file and return only the requested columns."""
+    table = feather.read_table(
+        path, columns=list(columns) if columns else None, memory_map=True
+    )
+    return _to_pandas(table)
+
+
+def iter_columnar(path: str | Path) -> Iterator[pd.DataFrame]:
+    """Yield an Arrow file one record batch at a time."""
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield _to_pandas(reader.get_batch(i))
+
+
+def _arrow_string_mapper(arrow_type: pa.DataType):
+    if arrow_type in (pa.string(), pa.large_string()):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def columnar_schema(path: str | Path) -> pa.Schema:
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def ingest_columnar(
+    ds_id: str, raw_path: str | Path, df: pd.DataFrame, sheet: str | None = None
+) -> Path | None:
+    """Convert a freshly parsed upload and register the Arrow copy."""
+    path = columnar_path_for(raw_path, sheet)
+    try:
+        write_columnar(df, path)
+    except _ARROW_ERRORS as e:
+        # Mixed-type object columns cannot be represented; keep the raw file only.
+        logger.warning("Columnar conversion skipped for %s: %s", ds_id, e)
+        return None
+    set_columnar_path(ds_id, str(path))
+    return path
+
+
+def ingest_sample(
+    ds_id: str,
+    raw_path: str | Path,
+    sample: pd.DataFrame,
+    sheet: str | None = None,
+    tag: str | None = None,
+) -> Path | None:
+    """Store a row sample of a dataset as its own Arrow file."""
+    path = sample_path_for(raw_path, sheet, tag)
+    try:
+        write_columnar(sample, path)
+    except _ARROW_ERRORS as e:
+        logger.warning("Sample not stored for %s: %s", ds_id, e)
+        return None
+    set_sample_path(ds_id, str(path))
+    return path
+
+
+def ingest_dataset(
+    ds_id: str,
+    raw_path: str | Path,
+    df: pd.DataFrame,
+    sheet: str | None = None,
+    sample_by: str | None = None,
+) -> pd.DataFrame:
+    """Optimise dtypes of a freshly parsed dataset and store its Arrow copy.
+
+    Datasets larger than ``settings.sample_rows`` also get a stored sample,
+    stratified on ``sample_by`` when that column exists.
+    """
+    if settings.optimize_dtypes:
+        df, report = optimize_dtypes(
+            df,
+            category_max_ratio=settings.category_max_ratio,
+            arrow_strings=settings.arrow_strings,
+        )
+        set_dtype_report(ds_id, report)
+    ingest_columnar(ds_id, raw_path, df, sheet)
+    if len(df) > settings.sample_rows:
+        sample = build_sample(df, settings.sample_rows, by=sample_by)
+        ingest_sample(ds_id, raw_path, sample, sheet)
+    return df
+
+
+def load_dataset(ds_id: str, columns: Sequence[str] | None = None) -> pd.DataFrame:
+    """Load a registered dataset, preferring the memory-mapped columnar copy.
+
+    Datasets without an Arrow copy (uploaded before the columnar store
+    existed, or workbook sheets not requested yet) are parsed and converted
+    on their first load. Unknown ``columns`` are ignored.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    col_path = get_columnar_path(ds_id)
+    if col_path is not None and col_path.exists():
+        names = dataset_columns(ds_id)
+        if columns:
+            columns = [c for c in columns if c in names] or None
+        if set(columnar_schema(col_path).names) >= set(columns or names):
+            return read_columnar(col_path, columns)
+        # A version holding only the columns it changed: borrow the rest.
+        frames = _read_layers(dataset_layers(ds_id), list(columns or names))
+        return pd.concat(frames, axis=1, copy=False)[list(columns or names)]
+    raw_path = get_dataset_path(ds_id)
+    sheet = get_dataset_sheet(ds_id)
+    col_path = columnar_path_for(raw_path, sheet)
+    if col_path.exists():
+        # Another upload of the same workbook already converted this sheet.
+        set_columnar_path(ds_id, str(col_path))
+        if sample_path_for(raw_path, sheet).exists():
+            set_sample_path(ds_id, str(sample_path_for(raw_path, sheet)))
+        return load_dataset(ds_id, columns)
+    df = ingest_dataset(ds_id, raw_path, load_any(raw_path, sheet=sheet), sheet)
+    if columns:
+        columns = [c for c in columns if c in df.columns]
+        if columns:
+            return df[columns]
+    return df
+
+
+def dataset_layers(ds_id: str) -> List[Path]:
+    """The Arrow files a dataset's columns are read from, its own file first.
+
+    A version lists the files its parent used when the version was made, so
+    appending to the parent later does not change the version's rows.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    own = get_columnar_path(ds_id)
+    if own is None:
+        return []
+    layers = get_layer_paths(ds_id)
+    if layers is None:
+        # Versions made before layers were recorded follow the parent.
+        parent = get_version_of(ds_id)
+        layers = [] if parent is None else dataset_layers(parent)
+    return [own, *layers]
+
+
+def dataset_columns(ds_id: str) -> List[str]:
+    """Column names of a dataset, including those inherited from its parent."""
+    # The last layer is a full copy and keeps the original column order.
+    return columnar_schema(dataset_layers(ds_id)[-1]).names
+
+
+def _read_layers(layers: Sequence[Path], columns: List[str]) -> List[pd.DataFrame]:
+    frames = []
+    for path in layers:
+        if not columns:
+            break
+        own = set(columnar_schema(path).names)
+        mine = [c for c in columns if c in own]
+        if mine:
+            frames.append(read_columnar(path, mine))
+        columns = [c for c in columns if c not in own]
+    return frames
+
+
+def dataset_table(ds_id: str) -> pa.Table | None:
+    """Memory-map a dataset as one Arrow table without converting it to pandas.
+
+    Returns ``None`` for datasets that have no Arrow copy yet.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    layers = dataset_layers(ds_id)
+    if not layers or not layers[0].exists():
+        return None
+    names = dataset_columns(ds_id)
+    columns: dict = {}
+    for path in layers:
+        if len(columns) == len(names):
+            break
+        layer = feather.read_table(path, memory_map=True)
+        for name in layer.schema.names:
+            columns.setdefault(name, layer.column(name))
+    return pa.table({name: columns[name] for name in names})
+
+
+def write_version(
+    parent_id: str, df: pd.DataFrame, changed: Sequence[str], tag: str
+) -> Path:
+    """Write only the ``changed`` columns of a new version of ``parent_id``.
+
+    Unchanged columns stay in the parent's files and are memory-mapped from
+    there, so a version costs disk and page cache only for what it changed.
+    """
+    path = columnar_path_for(
+        get_dataset_path(parent_id), get_dataset_sheet(parent_id), tag
+    )
+    return write_columnar(df[list(changed)], path)
+
+
+def load_sample(
+    ds_id: str, columns: Sequence[str] | None = None
+) -> pd.DataFrame | None:
+    """Return the stored row sample, or ``None`` if the dataset has none.
+
+    Datasets no larger than ``settings.sample_rows`` have no sample; callers
+    then use the full frame.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    path = get_sample_path(ds_id)
+    if path is None or not path.exists():
+        return None
+    if columns:
+        names = set(columnar_schema(path).names)
+        columns = [c for c in columns if c in names] or None
+    return read_columnar(path, columns)
+
+
+def _lossless_cast(
+    values: pa.ChunkedArray, target: pa.DataType
+) -> pa.ChunkedArray | None:
+    try:
+        out = values.cast(target)
+    except _ARROW_ERRORS:
+        return None
+    # Arrow's "safe" cast still rounds floats, so check that nothing changed.
+    if pa.types.is_floating(values.type) or pa.types.is_floating(target):
+        if not out.cast(values.type).equals(values):
+            return None
+    return out
+
+
+def _is_number(arrow_type: pa.DataType) -> bool:
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+
+
+def _widened(stored: pa.DataType, values: pa.ChunkedArray) -> np.dtype:
+    """Smallest NumPy type holding both the stored column and ``values``."""
+    new = values.type.to_pandas_dtype()
+    if pa.types.is_integer(values.type):
+        bounds = pc.min_max(values)
+        lo, hi = bounds["min"].as_py(), bounds["max"].as_py()
+        for candidate in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(candidate)
+            if lo is None or (info.min <= lo and hi <= info.max):
+                new = candidate
+                break
+    return np.result_type(stored.to_pandas_dtype(), new)
+
+
+def _append_type(
+    name: str, stored: pa.DataType, values: pa.ChunkedArray
+) -> Tuple[pa.DataType, pa.ChunkedArray]:
+    """Return the column type after an append and ``values`` converted to it.
+
+    Values are cast to the stored type when that loses nothing; numeric
+    columns are widened (e.g. int8 to int16 or float64) when it would.
+    """
+    if values.type == stored:
+        return stored, values
+    if pa.types.is_null(values.type):
+        return stored, values.cast(stored)
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    if pa.types.is_dictionary(stored):
+        decoded = _lossless_cast(values, stored.value_type)
+        if decoded is not None:
+            return stored, decoded
+    else:
+        cast = _lossless_cast(values, stored)
+        if cast is not None:
+            return stored, cast
+        if _is_number(stored) and _is_number(values.type):
+            target = pa.from_numpy_dtype(_widened(stored, values))
+            return target, values.cast(target)
+    raise SchemaMismatch(f"column {name!r}: expected {stored}, got {values.type}")
+
+
+def _dictionary_type(
+    stored: pa.DictionaryType, old: pa.ChunkedArray, new: pa.ChunkedArray
+) -> pa.DictionaryType:
+    """Widen the index type of a categorical column if new values overflow it."""
+    known = [chunk.dictionary for chunk in old.chunks] + [pc.unique(new)]
+    distinct = len(pc.unique(pa.concat_arrays(known)))
+    for index in (pa.int8(), pa.int16(), pa.int32()):
+        if distinct <= np.iinfo(index.to_pandas_dtype()).max + 1:
+            break
+    if index.bit_width <= stored.index_type.bit_width:
+        return stored
+    return pa.dictionary(index, stored.value_type, stored.ordered)
+
+
+def append_columnar(
+    ds_id: str, delta: pd.DataFrame, tag: str, stored: pa.Table | None = None
+) -> Tuple[Path, pd.DataFrame]:
+    """Write a dataset's rows followed by ``delta`` to a new tagged Arrow file.
+
+    The stored file is memory-mapped and its record batches are written out
+    as they are; only columns widened to fit the new values are converted.
+    The stored file itself is left alone because deduplicated uploads may
+    share it. Returns the new path and ``delta`` as it reads back from it.
+    A dataset without an Arrow copy is converted first, unless its rows are
+    passed as ``stored``.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+        SchemaMismatch: if ``delta`` has other columns or incompatible values.
+    """
+    if stored is None:
+        stored = _stored_table(ds_id)
+    names = stored.schema.names
+    columns = [str(c) for c in delta.columns]
+    missing = [n for n in names if n not in columns]
+    unexpected = [c for c in columns if c not in names]
+    if missing or unexpected:
+        raise SchemaMismatch(
+            f"columns differ: missing {missing}, unexpected {unexpected}"
+        )
+    delta = delta.set_axis(columns, axis=1)[names]
+    new = pa.Table.from_pandas(delta, preserve_index=False)
+
+    fields: List[pa.Field] = []
+    old_cols: List[pa.ChunkedArray] = []
+    new_cols: List[pa.ChunkedArray] = []
+    for field in stored.schema:
+        old = stored.column(field.name)
+        target, values = _append_type(field.name, field.type, new.column(field.name))
+        if pa.types.is_dictionary(target):
+            target = _dictionary_type(target, old, values)
+            values = values.cast(target)
+        if target != field.type:
+            old = old.cast(target)
+        fields.append(field.with_type(target))
+        old_cols.append(old)
+        new_cols.append(values)
+    schema = pa.schema(fields, metadata=stored.schema.metadata)
+    appended = pa.table(new_cols, schema=schema)
+    combined = pa.concat_tables([pa.table(old_cols, schema=schema), appended])
+    if any(pa.types.is_dictionary(f.type) for f in fields):
+        # IPC files allow a single dictionary per column across all batches.
+        combined = combined.unify_dictionaries()
+    out = columnar_path_for(get_dataset_path(ds_id), get_dataset_sheet(ds_id), tag)
+    _write_table(combined, out)
+    return out, _to_pandas(appended)
+
+
+def _stored_table(ds_id: str) -> pa.Table:
+    path = get_columnar_path(ds_id)
+    if path is None or not path.exists():
+        load_dataset(ds_id)  # converts the raw upload
+        path = get_columnar_path(ds_id)
+        if path is None:
+            raise SchemaMismatch("dataset has no columnar copy to append to")
+    stored = feather.read_table(path, memory_map=True)
+    if set(stored.schema.names) != set(dataset_columns(ds_id)):
+        # Versions only store changed columns; the appended file holds them all.
+        stored = pa.Table.from_pandas(load_dataset(ds_id), preserve_index=False)
+    return stored
+
+
+def discard_columnar(path: str | Path | None, keep: Sequence[Path] = ()) -> None:
+    """Delete a superseded Arrow file or sample once no dataset refers to it."""
+    if path is None or Path(path) in keep or file_in_use(path):
+        return
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError as e:
+        # Windows refuses to delete files that are still memory-mapped.
+        logger.warning("Could not remove %s: %s", path, e)
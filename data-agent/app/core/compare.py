@@ -0,0 +1,103 @@
+"""Side-by-side statistics of many datasets at once.
+
+Every dataset is summarised from its stored profile. Profiles that do not
+exist yet are built in parallel on a process pool, one dataset per task,
+so comparing N snapshots costs at most one scan of each instead of one
+scan per pair.
+"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+from .config import settings
+from .profile import NUMERIC_KEYS
+from .storage import get_content_hash, get_profile
+
+METRICS = ("count", *NUMERIC_KEYS, "null_rate")
+
+_POOL: ProcessPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # Spawned, not forked: the API process runs threads.
+            _POOL = ProcessPoolExecutor(
+                max_workers=settings.compare_workers or None,
+                mp_context=mp.get_context("spawn"),
+            )
+        return _POOL
+
+
+def column_metrics(profile: Dict[str, Any]) -> Dict[str, Dict[str, float | None]]:
+    """Return :data:`METRICS` for every column of a stored profile.
+
+    Columns that are not numeric only get ``count`` and ``null_rate``.
+    """
+    rows = profile["rows"]
+    out: Dict[str, Dict[str, float | None]] = {}
+    for col in profile["columns"]:
+        nulls = profile["null_counts"].get(col, 0)
+        numeric = profile["numeric_stats"].get(col)
+        metrics: Dict[str, float | None] = {k: None for k in METRICS}
+        if numeric is not None:
+            metrics.update(numeric)
+        else:
+            metrics["count"] = rows - nulls
+        metrics["null_rate"] = round(nulls / rows, 6) if rows else None
+        out[col] = metrics
+    return out
+
+
+def _build_metrics(ds_id: str) -> Dict[str, Dict[str, float | None]]:
+    # Imported here so only pool workers pay for the loader's imports.
+    from .columnar import load_dataset
+    from .profile import get_or_build_profile
+
+    return column_metrics(get_or_build_profile(ds_id, load_dataset))
+
+
+def compare_datasets(
+    ds_ids: Sequence[str], columns: Sequence[str] | None = None
+) -> Dict[str, Any]:
+    """Compare per-column statistics of ``ds_ids`` in one aligned table.
+
+    ``table[column][metric]`` lists one value per dataset, in the order of
+    ``ds_ids``; it is ``None`` where a dataset lacks the column. Datasets
+    with identical content are summarised once.
+
+    Raises:
+        KeyError: if one of ``ds_ids`` is not registered.
+    """
+    keys = [get_content_hash(ds_id) or ds_id for ds_id in ds_ids]
+    by_hash = dict(zip(reversed(keys), reversed(ds_ids), strict=True))
+    metrics: Dict[str, Dict[str, Dict[str, float | None]]] = {}
+    pending = {}
+    for key, ds_id in by_hash.items():
+        profile = get_profile(ds_id)
+        if profile is not None:
+            metrics[key] = column_metrics(profile)
+        else:
+            pending[key] = _pool().submit(_build_metrics, ds_id)
+    for key, future in pending.items():
+        metrics[key] = future.result()
+
+    per_dataset = [metrics[key] for key in keys]
+    names: List[str] = []
+    for cols in per_dataset:
+        names.extend(c for c in cols if c not in names)
+    if columns is not None:
+        names = [c for c in names if c in columns]
+    table = {
+        col: {
+            metric: [c[col][metric] if col in c else None for c in per_dataset]
+            for metric in METRICS
+        }
+        for col in names
+    }
+    return {"datasets": list(ds_ids), "metrics": list(METRICS), "table": table}
@@ -8,12 +8,48 @@ from pydantic import BaseSettings, Field
 class Settings(BaseSettings):
     """Application configuration loaded from environment variables."""
 
-    max_file_size: int = Field(5 * 1024 * 1024, env="MAX_FILE_SIZE")
+    max_file_size: int = Field(200 * 1024 * 1024, env="MAX_FILE_SIZE")
     allowed_file_types: List[str] = Field(default_factory=lambda: ["csv", "xlsx"], env="ALLOWED_FILE_TYPES")
     log_level: str = Field("INFO", env="LOG_LEVEL")
     safe_exec_mem_mb: int = Field(200, env="SAFE_EXEC_MEM_MB")
     data_dir: str = Field("data", env="DATA_DIR")
     db_file: str = Field("datasets.db", env="DB_FILE")
+    optimize_dtypes: bool = Field(True, env="OPTIMIZE_DTYPES")
+    category_max_ratio: float = Field(0.5, env="CATEGORY_MAX_RATIO")
+    arrow_strings: bool = Field(False, env="ARROW_STRINGS")
+    excel_chunk_rows: int = Field(50_000, env="EXCEL_CHUNK_ROWS")
+    chunked_profile_bytes: int = Field(256 * 1024 * 1024, env="CHUNKED_PROFILE_BYTES")
+    profile_chunk_rows: int = Field(100_000, env="PROFILE_CHUNK_ROWS")
+    sample_rows: int = Field(50_000, env="SAMPLE_ROWS")
+    missing_density_bins: int = Field(200, env="MISSING_DENSITY_BINS")
+    missing_cache_entries: int = Field(128, env="MISSING_CACHE_ENTRIES")
+    join_memory_budget: int = Field(512 * 1024 * 1024, env="JOIN_MEMORY_BUDGET")
+    join_partitions: int = Field(0, env="JOIN_PARTITIONS")
+    compare_workers: int = Field(0, env="COMPARE_WORKERS")
+    render_workers: int = Field(2, env="RENDER_WORKERS")
+    render_cache_bytes: int = Field(64 * 1024 * 1024, env="RENDER_CACHE_BYTES")
+    render_cache_dir: str | None = Field(None, env="RENDER_CACHE_DIR")
+    render_cache_disk_bytes: int = Field(
+        512 * 1024 * 1024, env="RENDER_CACHE_DISK_BYTES"
+    )
+    dataset_cache_bytes: int = Field(1024 * 1024 * 1024, env="DATASET_CACHE_BYTES")
+    upload_concurrency: int = Field(2, env="UPLOAD_CONCURRENCY")
+    # Appends, versions, joins and comparisons: whole-dataset passes.
+    heavy_concurrency: int = Field(1, env="HEAVY_CONCURRENCY")
+    chart_concurrency: int = Field(4, env="CHART_CONCURRENCY")
+    nl2code_concurrency: int = Field(2, env="NL2CODE_CONCURRENCY")
+    run_code_concurrency: int = Field(2, env="RUN_CODE_CONCURRENCY")
+    explain_chart_concurrency: int = Field(1, env="EXPLAIN_CHART_CONCURRENCY")
+    ollama_pool_size: int = Field(4, env="OLLAMA_POOL_SIZE")
+    ollama_concurrency: int = Field(2, env="OLLAMA_CONCURRENCY")
+    ollama_keep_alive: str = Field("30m", env="OLLAMA_KEEP_ALIVE")
+    llm_health_ttl: float = Field(30.0, env="LLM_HEALTH_TTL")
+    answer_cache_entries: int = Field(5_000, env="ANSWER_CACHE_ENTRIES")
+    answer_cache_max_age: float = Field(30 * 24 * 3600, env="ANSWER_CACHE_MAX_AGE")
+    # Cosine similarity above which a rephrased question reuses an answer;
+    # 0 only reuses answers to the same normalised question.
+    answer_similarity: float = Field(0.0, env="ANSWER_SIMILARITY")
+    worker_queue_limit: int = Field(64, env="WORKER_QUEUE_LIMIT")
 
     class Config:
         case_sensitive = False
@@ -0,0 +1,118 @@
+"""In-memory dataset cache with a byte budget and single-flight loading."""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class DatasetManager:
+    """LRU cache of DataFrames bounded by their deep memory usage.
+
+    Concurrent ``get`` calls for the same uncached ``ds_id`` share a single
+    ``loader`` call; the followers block until the leader finishes.
+    """
+
+    def __init__(self, loader: Callable[[str], pd.DataFrame], max_bytes: int):
+        self._loader = loader
+        self.max_bytes = max_bytes
+        self._frames: OrderedDict[str, Tuple[pd.DataFrame, int]] = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get(self, ds_id: str) -> pd.DataFrame:
+        """Return the cached frame, loading it once if needed.
+
+        Raises:
+            Whatever ``loader`` raises (e.g. ``KeyError`` for unknown ids).
+        """
+        with self._lock:
+            entry = self._frames.get(ds_id)
+            if entry is not None:
+                self._frames.move_to_end(ds_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            fut = self._inflight.get(ds_id)
+            leader = fut is None
+            if fut is None:
+                fut = Future()
+                self._inflight[ds_id] = fut
+            else:
+                self.coalesced += 1
+        if not leader:
+            return fut.result()
+        try:
+            df = self._loader(ds_id)
+            self.put(ds_id, df)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(df)
+        finally:
+            # Waiters are resolved either way, and the next caller starts afresh.
+            with self._lock:
+                if self._inflight.get(ds_id) is fut:
+                    del self._inflight[ds_id]
+        return df
+
+    def peek(self, ds_id: str) -> pd.DataFrame | None:
+        """Return the cached frame without loading or counting a hit/miss."""
+        with self._lock:
+            entry = self._frames.get(ds_id)
+        return None if entry is None else entry[0]
+
+    def put(self, ds_id: str, df: pd.DataFrame) -> None:
+        size = frame_nbytes(df)
+        with self._lock:
+            self._inflight.pop(ds_id, None)
+            self._discard(ds_id)
+            if size > self.max_bytes:
+                # Larger than the whole budget: serve it but never keep it.
+                return
+            self._frames[ds_id] = (df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._frames))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, ds_id: str) -> None:
+        with self._lock:
+            self._discard(ds_id)
+
+    def _discard(self, ds_id: str) -> None:
+        entry = self._frames.pop(ds_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def __contains__(self, ds_id: object) -> bool:
+        return ds_id in self._frames
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "datasets": len(self._frames),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,88 @@
+"""Downsampling of long series so chart render time does not grow with rows.
+
+Both methods return row positions to keep, in their original order, so the
+caller can take any columns it needs for the same rows.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float(values: pd.Series) -> np.ndarray:
+    """Numeric coordinates for ``values``; row position for text and categories."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]").view(np.int64).astype(float)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return np.arange(len(values), dtype=float)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: keep the ``n_out`` most visible points.
+
+    The first and last points are always kept; from each bucket in between
+    the point forming the largest triangle with the previously kept point
+    and the mean of the next bucket is chosen.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Keep the minimum and maximum of ``n_out // 2`` equal-width row buckets.
+
+    Cheaper than :func:`lttb` and keeps every spike, at the cost of a
+    jagged look on smooth data.
+    """
+    n = len(y)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(buckets, size)
+    starts = np.arange(buckets) * size
+    lows = starts + np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1)
+    highs = starts + np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1)
+    keep = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    return keep[keep < n]
+
+
+def decimate_line(
+    df: pd.DataFrame, x: str, y: str, max_points: int, method: str = "lttb"
+) -> pd.DataFrame:
+    """Return at most ``max_points`` rows of ``df`` that preserve the shape of ``y``.
+
+    Rows without a ``y`` value are dropped first.
+
+    Raises:
+        ValueError: for an unknown ``method``.
+    """
+    if method not in ("lttb", "minmax"):
+        raise ValueError(f"unknown decimation method: {method}")
+    if len(df) <= max_points:
+        return df
+    df = df[df[y].notna()]
+    ys = _as_float(df[y])
+    if method == "minmax":
+        keep = minmax(ys, max_points)
+    else:
+        keep = lttb(_as_float(df[x]), ys, max_points)
+    return df.iloc[keep]
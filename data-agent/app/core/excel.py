@@ -0,0 +1,83 @@
+"""Streaming ``.xlsx`` reader built on openpyxl's read-only mode.
+
+``pd.read_excel`` loads the whole workbook DOM, which costs many times the
+file size and only returns one sheet. Read-only mode streams rows and lets
+us list sheet names without touching their contents.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import IO, Any, Iterator, List, Sequence, Union
+
+import pandas as pd
+from openpyxl import load_workbook
+
+ExcelSource = Union[str, Path, IO[bytes]]
+
+
+def list_sheets(file: ExcelSource) -> List[str]:
+    wb = load_workbook(file, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _header(raw: Sequence[Any]) -> List[Any]:
+    names: List[Any] = []
+    seen: dict = {}
+    for i, val in enumerate(raw):
+        name = f"Unnamed: {i}" if val is None else val
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_sheet_chunks(
+    file: ExcelSource, sheet: str | None = None, chunksize: int = 50_000
+) -> Iterator[pd.DataFrame]:
+    """Yield ``sheet`` (default: the first) as DataFrames of ``chunksize`` rows.
+
+    The first row is the header; fully empty rows are skipped.
+    """
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        first = next(rows, None)
+        if first is None:
+            return
+        columns = _header(first)
+        width = len(columns)
+        buf: List[tuple] = []
+        emitted = False
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            if len(row) != width:
+                row = (tuple(row) + (None,) * width)[:width]
+            buf.append(row)
+            if len(buf) >= chunksize:
+                yield pd.DataFrame.from_records(buf, columns=columns)
+                buf = []
+                emitted = True
+        if buf or not emitted:
+            yield pd.DataFrame.from_records(buf, columns=columns)
+    finally:
+        wb.close()
+
+
+def read_sheet(
+    file: ExcelSource, sheet: str | None = None, chunksize: int = 50_000
+) -> pd.DataFrame:
+    """Read one sheet through the streaming reader."""
+    chunks = list(iter_sheet_chunks(file, sheet, chunksize))
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0].infer_objects()
+    return pd.concat(chunks, ignore_index=True).infer_objects()
@@ -0,0 +1,133 @@
+"""Shared partitioning, aggregation and grid layout for faceted charts.
+
+The frame is split into facets with one ``groupby`` pass instead of one
+boolean scan per level, and only the columns a chart draws are copied.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, List, Sequence, Tuple
+
+import pandas as pd
+
+from .figures import new_figure
+
+FACET_LIMIT = 8
+FACET_ORDERS = ("appearance", "size", "value")
+
+Facet = Tuple[Any, pd.DataFrame]
+
+
+def pick_levels(groups: dict, order: str, limit: int) -> List[Any]:
+    """Order the keys of ``groupby(...).indices`` and keep the first ``limit``.
+
+    Raises:
+        ValueError: for an unknown ``order``.
+    """
+    if order not in FACET_ORDERS:
+        raise ValueError(f"order must be one of {', '.join(FACET_ORDERS)}")
+    levels = list(groups)
+    if order == "size":
+        levels.sort(key=lambda lvl: -len(groups[lvl]))
+    elif order == "value":
+        try:
+            levels.sort()
+        except TypeError:
+            levels.sort(key=str)
+    return levels[:limit]
+
+
+def facet_levels(
+    df: pd.DataFrame,
+    facet_by: str,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+) -> List[Any]:
+    """Return the facet levels ``partition`` would pick, without copying rows."""
+    groups = df.groupby(facet_by, sort=False, observed=True).indices
+    return pick_levels(groups, order, limit)
+
+
+def partition(
+    df: pd.DataFrame,
+    facet_by: str,
+    columns: Sequence[str] | None = None,
+    limit: int = FACET_LIMIT,
+    order: str = "appearance",
+) -> List[Facet]:
+    """Split ``df`` into ``(level, rows)`` pairs in one pass.
+
+    ``order`` is "appearance" (first row of each level), "size" (largest
+    first) or "value" (sorted levels); the first ``limit`` levels are kept.
+    Missing facet values are dropped. Only ``columns`` are copied when given.
+
+    Raises:
+        ValueError: for an unknown ``order``.
+    """
+    groups = df.groupby(facet_by, sort=False, observed=True).indices
+    frame = df if columns is None else df[list(dict.fromkeys(columns))]
+    return [(lvl, frame.take(groups[lvl])) for lvl in pick_levels(groups, order, limit)]
+
+
+def facet_table(
+    df: pd.DataFrame, facet_by: str, x: str, y: str | None, agg: str
+) -> pd.Series:
+    """``agg(y)`` (or the row count) per ``(facet_by, x)`` in one groupby."""
+    keys = df.groupby([facet_by, x], observed=True)
+    return keys.size() if y is None else getattr(keys[y], agg)()
+
+
+def facet_split(
+    table: pd.Series, levels: Sequence[Any], counts: bool = False
+) -> List[Tuple[Any, pd.Series]]:
+    """Cut a ``facet_table`` into one series per level; ``counts`` sorts them."""
+    out = []
+    for lvl in levels:
+        try:
+            part = table.xs(lvl, level=0)
+        except KeyError:
+            part = table.iloc[:0].droplevel(0)
+        out.append((lvl, part.sort_values(ascending=False) if counts else part))
+    return out
+
+
+def facet_aggregate(
+    df: pd.DataFrame,
+    facet_by: str,
+    x: str,
+    y: str | None,
+    agg: str,
+    levels: Sequence[Any],
+) -> List[Tuple[Any, pd.Series]]:
+    """Aggregate ``y`` by ``x`` within every facet with a single groupby.
+
+    Without ``y`` the rows of each ``x`` value are counted.
+    """
+    table = facet_table(df, facet_by, x, y, agg)
+    return facet_split(table, levels, counts=y is None)
+
+
+def facet_grid(n: int, ncols: int = 2, panel: Tuple[float, float] = (5, 4)):
+    """A figure with ``n`` panels on a grid ``ncols`` wide; spare axes are hidden."""
+    ncols = max(1, min(ncols, n))
+    nrows = max(1, -(-n // ncols))
+    fig = new_figure((panel[0] * ncols, panel[1] * nrows))
+    flat = fig.subplots(nrows, ncols, squeeze=False).ravel()
+    for ax in flat[n:]:
+        ax.axis("off")
+    return fig, flat[:n]
+
+
+def facet_figure(
+    facets: Sequence[Tuple[Any, Any]],
+    draw: Callable[[Any, Any, Any], None],
+    title: str,
+    ncols: int = 2,
+):
+    """Lay ``facets`` out on a grid and call ``draw(ax, level, data)`` for each."""
+    fig, axes = facet_grid(len(facets), ncols)
+    for ax, (lvl, data) in zip(axes, facets, strict=True):
+        draw(ax, lvl, data)
+        ax.set_title(str(lvl))
+    fig.suptitle(title)
+    fig.tight_layout()
+    return fig
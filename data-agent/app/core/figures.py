@@ -0,0 +1,28 @@
+"""Figures built on the object-oriented API with an explicit Agg canvas.
+
+``pyplot`` keeps every figure in one global registry without locking, and a
+figure stays registered until ``plt.close`` runs, so a chart that raises
+half-way leaks it. Figures made here belong to no registry: they are safe
+to draw from several threads at once and are freed like any other object.
+"""
+from __future__ import annotations
+
+from io import BytesIO
+from typing import Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def new_figure(figsize: Tuple[float, float] | None = None) -> Figure:
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def figure_png(fig: Figure) -> BytesIO:
+    """Rasterise ``fig`` to a PNG in a BytesIO positioned at the start."""
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    buf.seek(0)
+    return buf
@@ -1,8 +1,9 @@
 import os
 from pathlib import Path
-from typing import IO, Union
+from typing import IO, Optional, Union
 
 from .config import settings
+from .excel import read_sheet
 
 import pandas as pd
 
@@ -16,7 +17,10 @@ def _maybe_cache(file: IO[bytes], name: str) -> None:
         dest.write_bytes(file.read())
         file.seek(0)
 
-def load_any(file: Union[str, Path, IO[bytes]]) -> pd.DataFrame:
+def load_any(
+    file: Union[str, Path, IO[bytes]], sheet: Optional[str] = None
+) -> pd.DataFrame:
+    """Parse a CSV or Excel file; ``sheet`` selects an Excel sheet (default first)."""
     name = getattr(file, "name", str(file))
     if hasattr(file, "read"):
         _maybe_cache(file, name)
@@ -25,7 +29,9 @@ def load_any(file: Union[str, Path, IO[bytes]]) -> pd.DataFrame:
         raise ValueError(f"Unsupported file type: {name}")
     if ext == "csv":
         return pd.read_csv(file)
-    if ext in {"xls", "xlsx"}:
-        return pd.read_excel(file)
+    if ext == "xlsx":
+        return read_sheet(file, sheet, chunksize=settings.excel_chunk_rows)
+    if ext == "xls":
+        return pd.read_excel(file, sheet_name=sheet or 0)
     raise ValueError(f"Unsupported file type: {name}")
 
@@ -0,0 +1,291 @@
+"""Partitioned (Grace) hash join of two stored datasets.
+
+Inputs are memory-mapped Arrow tables, so reading them costs page cache
+rather than heap. When both sides together exceed the memory budget they
+are hash-partitioned on the join keys into Arrow spill files, and each
+pair of partitions is joined on its own. Partitions that are still too
+big are split again with a different hash. Result chunks are streamed
+straight into an Arrow file, so neither the inputs nor the output are
+ever fully in memory.
+"""
+from __future__ import annotations
+
+import math
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+HOWS = ("inner", "left", "right", "outer")
+SUFFIXES = ("_left", "_right")
+# Deeper recursion cannot help when one key value is larger than the budget.
+MAX_DEPTH = 3
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+class JoinError(ValueError):
+    """Raised for join specifications that cannot be executed."""
+
+
+@dataclass
+class JoinSpec:
+    left_on: List[str]
+    right_on: List[str]
+    how: str = "inner"
+
+
+def key_hash(df: pd.DataFrame, keys: Sequence[str], salt: int = 0) -> np.ndarray:
+    """Hash the ``keys`` of every row so equal keys on either side collide.
+
+    Numbers are hashed as float64, so int8/int64/float keys holding the same
+    value land in the same partition, and all nulls hash alike.
+    """
+    out = np.full(len(df), np.uint64(salt), dtype=np.uint64)
+    for key in keys:
+        col = df[key]
+        null = col.isna().to_numpy()
+        if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            values = col.to_numpy(dtype=float, na_value=0.0)
+        elif pd.api.types.is_datetime64_any_dtype(col):
+            values = col.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        else:
+            values = col.astype(str).to_numpy(dtype=object)
+        hashed = pd.util.hash_array(values)
+        hashed[null] = _NULL_HASH
+        out = out * np.uint64(1_000_003) ^ hashed
+    if salt:
+        out = pd.util.hash_array(out)
+    return out
+
+
+def csv_to_arrow(src: str | Path, dest: Path, block_size: int = 16 << 20) -> Path:
+    """Convert a CSV to an Arrow file block by block.
+
+    Column types are inferred from the first block. If a later block does
+    not fit them the conversion restarts with every column read as text.
+    """
+    try:
+        return _stream_csv(src, dest, block_size, None)
+    except pa.ArrowInvalid:
+        names = pa_csv.open_csv(src).schema.names
+        return _stream_csv(src, dest, block_size, {n: pa.string() for n in names})
+
+
+def _stream_csv(src, dest: Path, block_size: int, column_types) -> Path:
+    reader = pa_csv.open_csv(
+        src,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types),
+    )
+    with pa.ipc.new_file(dest, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+    return dest
+
+
+def _output_schema(left: pa.Schema, right: pa.Schema, spec: JoinSpec) -> pa.Schema:
+    """The Arrow schema of the joined table.
+
+    Column names and order come from merging empty frames; types come from
+    the inputs, since empty text columns round-trip through pandas as null.
+    """
+    empty = pd.merge(
+        left.empty_table().to_pandas(),
+        right.empty_table().to_pandas(),
+        left_on=spec.left_on,
+        right_on=spec.right_on,
+        how=spec.how,
+        suffixes=SUFFIXES,
+    )
+    fields = []
+    for name in map(str, empty.columns):
+        if name in left.names and name in right.names:
+            # A key named alike on both sides comes out as one column.
+            arrow_type = _key_type(left.field(name).type, right.field(name).type)
+        elif name in left.names:
+            arrow_type = left.field(name).type
+        elif name in right.names:
+            arrow_type = right.field(name).type
+        elif name.endswith(SUFFIXES[0]):
+            arrow_type = left.field(name[: -len(SUFFIXES[0])]).type
+        else:
+            arrow_type = right.field(name[: -len(SUFFIXES[1])]).type
+        if pa.types.is_dictionary(arrow_type):
+            # Each result chunk has its own categories; an IPC file needs one.
+            arrow_type = arrow_type.value_type
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _key_type(left: pa.DataType, right: pa.DataType) -> pa.DataType:
+    if _numeric(left) and _numeric(right) and left != right:
+        wide = np.result_type(left.to_pandas_dtype(), right.to_pandas_dtype())
+        return pa.from_numpy_dtype(wide)
+    return left
+
+
+def _numeric(arrow_type: pa.DataType) -> bool:
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+
+
+def _partition(
+    table: pa.Table,
+    keys: Sequence[str],
+    n: int,
+    spill_dir: Path,
+    prefix: str,
+    salt: int,
+) -> List[Path]:
+    """Split ``table`` into ``n`` Arrow stream files by key hash."""
+    paths = [spill_dir / f"{prefix}-{p}.arrows" for p in range(n)]
+    writers = [pa.ipc.new_stream(path, table.schema) for path in paths]
+    try:
+        for batch in table.to_batches():
+            part = key_hash(batch.select(keys).to_pandas(), keys, salt) % np.uint64(n)
+            part = part.astype(np.int64)
+            order = np.argsort(part, kind="stable")
+            bounds = np.searchsorted(part[order], np.arange(n + 1))
+            for p in range(n):
+                rows = order[bounds[p] : bounds[p + 1]]
+                if len(rows):
+                    writers[p].write_batch(batch.take(pa.array(rows)))
+    finally:
+        for writer in writers:
+            writer.close()
+    return paths
+
+
+def _read_spill(path: Path) -> pa.Table:
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_stream(source).read_all()
+
+
+def _merge(left: pa.Table, right: pa.Table, spec: JoinSpec) -> pd.DataFrame:
+    return pd.merge(
+        left.to_pandas(),
+        right.to_pandas(),
+        left_on=spec.left_on,
+        right_on=spec.right_on,
+        how=spec.how,
+        suffixes=SUFFIXES,
+    )
+
+
+def _partition_count(nbytes: int, budget: int, partitions: int) -> int:
+    if partitions > 0:
+        return partitions
+    # Aim for pairs of partitions at half the budget to leave room for skew.
+    return max(2, math.ceil(2 * nbytes / budget))
+
+
+def grace_join(
+    left: pa.Table,
+    right: pa.Table,
+    spec: JoinSpec,
+    emit: Callable[[pd.DataFrame], None],
+    spill_dir: Path,
+    budget: int,
+    partitions: int = 0,
+    depth: int = 0,
+) -> int:
+    """Join ``left`` and ``right``, passing result chunks to ``emit``.
+
+    Returns the number of partitions the inputs were split into at this
+    level (0 when they were joined in memory).
+    """
+    if left.nbytes + right.nbytes <= budget or depth >= MAX_DEPTH:
+        if left.num_rows or right.num_rows:
+            emit(_merge(left, right, spec))
+        return 0
+    n = _partition_count(left.nbytes + right.nbytes, budget, partitions)
+    lparts = _partition(left, spec.left_on, n, spill_dir, f"l{depth}", depth)
+    rparts = _partition(right, spec.right_on, n, spill_dir, f"r{depth}", depth)
+    keep_left = spec.how in ("left", "outer")
+    keep_right = spec.how in ("right", "outer")
+    for lpath, rpath in zip(lparts, rparts, strict=True):
+        lpart, rpart = _read_spill(lpath), _read_spill(rpath)
+        if (lpart.num_rows or keep_right) and (rpart.num_rows or keep_left):
+            grace_join(
+                lpart, rpart, spec, emit, spill_dir, budget, partitions, depth + 1
+            )
+        del lpart, rpart
+        lpath.unlink()
+        rpath.unlink()
+    return n
+
+
+class ArrowSink:
+    """Append joined chunks to an Arrow file under a fixed schema."""
+
+    def __init__(
+        self,
+        path: Path,
+        schema: pa.Schema,
+        observers: Iterable[Callable[[pd.DataFrame], None]] = (),
+    ):
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._observers = list(observers)
+        self._writer = pa.ipc.new_file(path, schema)
+
+    def __call__(self, frame: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.select(self.schema.names).cast(self.schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+        for observe in self._observers:
+            observe(frame)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def join_tables(
+    left: pa.Table,
+    right: pa.Table,
+    spec: JoinSpec,
+    out_path: Path,
+    budget: int,
+    partitions: int = 0,
+    observers: Iterable[Callable[[pd.DataFrame], None]] = (),
+    spill_root: Path | None = None,
+) -> tuple[int, int]:
+    """Join two Arrow tables into the Arrow file ``out_path``.
+
+    ``observers`` see every result chunk (e.g. to collect statistics).
+    Returns the number of result rows and of top-level partitions.
+
+    Raises:
+        JoinError: if ``spec`` names unknown columns or an unknown ``how``.
+    """
+    if spec.how not in HOWS:
+        raise JoinError(f"how must be one of {', '.join(HOWS)}")
+    if not spec.left_on or len(spec.left_on) != len(spec.right_on):
+        raise JoinError("left_on and right_on must name the same number of keys")
+    sides = ((spec.left_on, left, "left"), (spec.right_on, right, "right"))
+    for keys, table, side in sides:
+        missing = [k for k in keys if k not in table.schema.names]
+        if missing:
+            raise JoinError(f"unknown {side} key(s): {', '.join(missing)}")
+    schema = _output_schema(left.schema, right.schema, spec)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    spill_dir = Path(tempfile.mkdtemp(prefix="join-", dir=spill_root))
+    sink = ArrowSink(tmp, schema, observers)
+    try:
+        n = grace_join(left, right, spec, sink, spill_dir, budget, partitions)
+        sink.close()
+        tmp.replace(out_path)
+    except BaseException:
+        sink.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    return sink.rows, n
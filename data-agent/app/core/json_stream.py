@@ -0,0 +1,151 @@
+"""Incremental reading of the string fields of a JSON object as it streams in.
+
+The LLM answers with ``{"intent": ..., "code": ...}`` one token at a time.
+:class:`JsonFieldStream` decodes the top-level string values while they
+are still being written, so the intent can be shown before the code has
+finished generating.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JsonFieldStream:
+    """Feed text in pieces; get back ``(key, fragment)`` for string values.
+
+    Text before the opening brace (prose, a code fence) is skipped, and
+    values that are not strings are stepped over. ``values`` holds every
+    string decoded so far and ``done`` is set once the object closes.
+    Malformed input is not an error: the reader just stops emitting.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, str] = {}
+        self.done = False
+        self._state = "start"
+        self._key = ""
+        self._buf: List[str] = []
+        self._escape = ""
+        self._surrogate = ""
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """Consume ``text`` and return the decoded fragments, one per key."""
+        out: Dict[str, List[str]] = {}
+        for ch in text:
+            if self.done or self._state == "broken":
+                break
+            self._step(ch, out)
+        fragments = [(key, "".join(parts)) for key, parts in out.items()]
+        for key, fragment in fragments:
+            self.values[key] = self.values.get(key, "") + fragment
+        return [(key, fragment) for key, fragment in fragments if fragment]
+
+    def _step(self, ch: str, out: Dict[str, List[str]]) -> None:
+        state = self._state
+        if state == "start":
+            if ch == "{":
+                self._state = "key_wait"
+        elif state == "key_wait":
+            if ch == '"':
+                self._state, self._buf = "key", []
+            elif ch == "}":
+                self.done = True
+            elif not ch.isspace() and ch != ",":
+                self._state = "broken"
+        elif state == "key":
+            char = self._string_char(ch)
+            if char is None:
+                self._key, self._state = "".join(self._buf), "colon"
+            elif char:
+                self._buf.append(char)
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value_wait"
+            elif not ch.isspace():
+                self._state = "broken"
+        elif state == "value_wait":
+            if ch == '"':
+                self._state = "value"
+                out.setdefault(self._key, [])
+            elif not ch.isspace():
+                self._state, self._depth, self._in_string = "other", 0, False
+                self._step(ch, out)
+        elif state == "value":
+            char = self._string_char(ch)
+            if char is None:
+                self._state = "after"
+            elif char:
+                out.setdefault(self._key, []).append(char)
+        elif state == "other":
+            self._skip(ch)
+        elif state == "after":
+            if ch == ",":
+                self._state = "key_wait"
+            elif ch == "}":
+                self.done = True
+            elif not ch.isspace():
+                self._state = "broken"
+
+    def _string_char(self, ch: str) -> str | None:
+        """Decode one character inside a string; ``None`` at the closing quote.
+
+        Returns "" while an escape sequence is still incomplete.
+        """
+        if self._escape:
+            self._escape += ch
+            if self._escape[1] != "u":
+                self._escape, esc = "", self._escape[1]
+                return _ESCAPES.get(esc, esc)
+            if len(self._escape) < 6:
+                return ""
+            try:
+                code = int(self._escape[2:], 16)
+            except ValueError:
+                self._state = "broken"
+                return ""
+            self._escape = ""
+            if 0xD800 <= code < 0xDC00:
+                self._surrogate = chr(code)
+                return ""
+            if 0xDC00 <= code < 0xE000 and self._surrogate:
+                high, self._surrogate = ord(self._surrogate), ""
+                return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+            return chr(code)
+        if ch == "\\":
+            self._escape = ch
+            return ""
+        if ch == '"':
+            return None
+        return ch
+
+    def _skip(self, ch: str) -> None:
+        """Step over a number, literal, array or object value."""
+        if self._in_string:
+            if self._escape:
+                self._escape = ""
+            elif ch == "\\":
+                self._escape = ch
+            elif ch == '"':
+                self._in_string = False
+        elif ch == '"':
+            self._in_string = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}" and self._depth:
+            self._depth -= 1
+        elif ch in ",}" and not self._depth:
+            self._state = "after"
+            self._step(ch, {})
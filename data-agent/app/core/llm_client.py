@@ -0,0 +1,269 @@
+"""Pooled HTTP client for Ollama with cached model selection.
+
+One ``requests`` session keeps connections to Ollama alive across calls,
+and the installed-model check behind every question is answered from a
+cache: a stale healthy answer is returned at once while a background
+thread refreshes it. Generate calls ask Ollama to keep the model loaded,
+so a quiet minute does not cost a cold model load on the next question.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+
+Health = Tuple[bool, str, str]
+
+
+class ClientBusy(RuntimeError):
+    """Raised when every client slot is taken and the caller cannot wait."""
+
+
+@dataclass
+class LLMTiming:
+    """Wall-clock seconds of one generate call.
+
+    ``queue`` is the wait for a free client slot, ``load`` and ``generate``
+    are Ollama's own model-load and evaluation times, and ``connect`` is
+    the rest of the round trip: connection setup and transfer.
+    """
+
+    queue: float = 0.0
+    connect: float = 0.0
+    load: float = 0.0
+    generate: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.queue + self.connect + self.load + self.generate
+
+
+def pick_model(names: Sequence[str], preferred: Sequence[str]) -> Health:
+    """Choose the first ``preferred`` model installed, else any installed one."""
+    for pref in preferred:
+        if pref in names:
+            return True, "OK", pref
+    if names:
+        return True, f"Using first available model: {names[0]}", names[0]
+    return False, "No models installed. Try: ollama pull mistral:7b-instruct", ""
+
+
+class OllamaClient:
+    """Thread-safe Ollama client shared by every request of the process.
+
+    At most ``concurrency`` generate calls are in flight; the others wait
+    for a slot and that wait is reported as queue time.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        preferred: Sequence[str] = (),
+        pool_size: int = 4,
+        concurrency: int = 2,
+        health_ttl: float = 30.0,
+        keep_alive: str = "30m",
+        timeout: float = 120.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.preferred = list(preferred)
+        self.health_ttl = health_ttl
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._health: Health | None = None
+        self._checked = 0.0
+        self._refreshing = False
+        self._calls = 0
+        self._totals = LLMTiming()
+
+    # --- health ---------------------------------------------------------
+
+    def refresh(self) -> Health:
+        """Ask Ollama for its installed models now and cache the answer."""
+        try:
+            r = self.session.get(f"{self.base_url}/tags", timeout=10)
+            r.raise_for_status()
+            names = [m.get("name") for m in r.json().get("models", [])]
+            health = pick_model(names, self.preferred)
+        except Exception as e:
+            health = (False, f"Ollama unreachable: {e}", "")
+        with self._lock:
+            self._health = health
+            self._checked = time.monotonic()
+            self._refreshing = False
+        return health
+
+    def health(self) -> Health:
+        """Return ``(ok, message, model)``, from the cache when possible.
+
+        A healthy answer older than ``health_ttl`` is still returned while a
+        background thread refreshes it; a failed one is re-checked inline,
+        so a server that just came up is picked up on the next call.
+        """
+        with self._lock:
+            health = self._health
+            stale = time.monotonic() - self._checked > self.health_ttl
+            background = health is not None and health[0] and stale
+            if background and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self.refresh, daemon=True).start()
+        if health is None or (stale and not health[0]):
+            return self.refresh()
+        return health
+
+    def invalidate(self) -> None:
+        """Forget the cached health, e.g. after the chosen model vanished."""
+        with self._lock:
+            self._health = None
+
+    # --- generation -----------------------------------------------------
+
+    def _payload(
+        self, model: str, prompt: str, options: Dict[str, Any] | None, stream: bool
+    ) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": options or {},
+        }
+
+    def generate(
+        self, model: str, prompt: str, options: Dict[str, Any] | None = None
+    ) -> Tuple[Dict[str, Any], LLMTiming]:
+        """Run a non-streaming ``/generate`` call and time its phases.
+
+        Raises:
+            requests.RequestException: if the call fails.
+        """
+        payload = self._payload(model, prompt, options, stream=False)
+        start = time.perf_counter()
+        with self._slots:
+            sent = time.perf_counter()
+            try:
+                r = self.session.post(
+                    f"{self.base_url}/generate", json=payload, timeout=self.timeout
+                )
+                r.raise_for_status()
+            except requests.HTTPError:
+                # A 404 means the cached model was removed; re-pick next time.
+                self.invalidate()
+                raise
+            done = time.perf_counter()
+        data = r.json()
+        return data, self._record(sent - start, done - sent, data)
+
+    def stream(
+        self,
+        model: str,
+        prompt: str,
+        options: Dict[str, Any] | None = None,
+        timings: List[LLMTiming] | None = None,
+        wait: bool = True,
+    ) -> Iterator[str]:
+        """Yield the completion of a streamed ``/generate`` call piece by piece.
+
+        The client slot is held until the generator is exhausted or closed,
+        and the call's timing is appended to ``timings`` when it ends.
+
+        Raises:
+            ClientBusy: if ``wait`` is false and no slot is free.
+            requests.RequestException: if the call fails.
+        """
+        payload = self._payload(model, prompt, options, stream=True)
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=wait):
+            raise ClientBusy("every LLM slot is in use")
+        try:
+            sent = time.perf_counter()
+            try:
+                r = self.session.post(
+                    f"{self.base_url}/generate",
+                    json=payload,
+                    timeout=self.timeout,
+                    stream=True,
+                )
+                r.raise_for_status()
+            except requests.HTTPError:
+                self.invalidate()
+                raise
+            final: Dict[str, Any] = {}
+            with r:
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        final = chunk
+                        break
+            done = time.perf_counter()
+        finally:
+            self._slots.release()
+        timing = self._record(sent - start, done - sent, final)
+        if timings is not None:
+            timings.append(timing)
+
+    def _record(self, queue: float, wall: float, data: Dict[str, Any]) -> LLMTiming:
+        # Ollama reports its own durations in nanoseconds.
+        load = data.get("load_duration", 0) / 1e9
+        server = data.get("total_duration", 0) / 1e9
+        timing = LLMTiming(
+            queue=queue,
+            connect=max(wall - server, 0.0),
+            load=load,
+            generate=max(server - load, 0.0),
+        )
+        with self._lock:
+            self._calls += 1
+            for field, value in asdict(timing).items():
+                setattr(self._totals, field, getattr(self._totals, field) + value)
+        return timing
+
+    def warm(self) -> None:
+        """Load the chosen model ahead of the first question, if Ollama is up."""
+        ok, _, model = self.refresh()
+        if ok:
+            try:
+                self.session.post(
+                    f"{self.base_url}/generate",
+                    json={"model": model, "keep_alive": self.keep_alive},
+                    timeout=self.timeout,
+                )
+            except requests.RequestException:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            health = self._health
+            calls = self._calls
+            totals = asdict(self._totals)
+        return {
+            "model": health[2] if health else None,
+            "healthy": health[0] if health else None,
+            "calls": calls,
+            "seconds": {k: round(v, 3) for k, v in totals.items()},
+        }
+
+
+def timing_summary(timings: List[LLMTiming]) -> Dict[str, float]:
+    """Add up the phases of several calls, e.g. the retries of one question."""
+    out = {k: 0.0 for k in ("queue", "connect", "load", "generate")}
+    for t in timings:
+        for k, v in asdict(t).items():
+            out[k] += v
+    out["total"] = sum(out.values())
+    return {k: round(v, 4) for k, v in out.items()}
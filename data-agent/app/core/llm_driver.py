@@ -3,12 +3,17 @@ from __future__ import annotations
 
 import json
 import os
-from functools import lru_cache
-from typing import Dict, List, Tuple
+import time
+from typing import Any, Dict, Iterator, List, Tuple
 
 import pandas as pd
 import requests  # type: ignore
 
+from . import answer_cache
+from .config import settings
+from .json_stream import JsonFieldStream
+from .llm_client import Health, LLMTiming, OllamaClient, timing_summary
+
 # ---------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------
@@ -23,6 +28,15 @@ PREFERRED_MODELS: List[str] = [
     "phi3:3.8b-mini-instruct",
 ]
 
+CLIENT = OllamaClient(
+    OLLAMA_URL,
+    preferred=PREFERRED_MODELS,
+    pool_size=settings.ollama_pool_size,
+    concurrency=settings.ollama_concurrency,
+    health_ttl=settings.llm_health_ttl,
+    keep_alive=settings.ollama_keep_alive,
+)
+
 SYSTEM_PROMPT = """You translate English questions into safe pandas and matplotlib code.
 Input: a question about a pandas DataFrame named df with a provided schema.
 Output: return only a JSON object with keys 'intent' and 'code'. No extra prose.
@@ -39,8 +53,8 @@ Rules:
 HISTORY_LEN = 3
 CONVERSATION: List[Tuple[str, str]] = []
 
-# Cache by question and DataFrame signature
-QUESTION_CACHE: Dict[Tuple[str, str], Tuple[str, str]] = {}
+# Answers are cached by question and DataFrame signature in the app database
+# (see answer_cache).
 
 FEW_SHOTS: List[Tuple[str, str]] = [
     (
@@ -86,6 +100,13 @@ def _df_signature(df: pd.DataFrame) -> str:
     return ";".join(parts)
 
 
+def _cache_signature(df: pd.DataFrame, cache_key: str | None) -> str:
+    sig = _df_signature(df)
+    if cache_key is not None:
+        sig = f"{cache_key}|{sig}"
+    return sig
+
+
 def _update_history(question: str, code: str) -> None:
     CONVERSATION.append((question, code))
     if len(CONVERSATION) > HISTORY_LEN:
@@ -121,46 +142,58 @@ def _build_prompt(
     )
 
 
-def _post_ollama(path: str, payload: dict, timeout: int = 120) -> dict:
-    r = requests.post(f"{OLLAMA_URL}{path}", json=payload, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+def _prompt_for(question: str, df: pd.DataFrame) -> str:
+    pii_env = os.environ.get("PII_COLUMNS", "")
+    redact_cols = [c.strip() for c in pii_env.split(",") if c.strip()]
+    history = CONVERSATION[-HISTORY_LEN:]
+    return _build_prompt(question, df, history=history, redact_cols=redact_cols)
+
+
+def _code_error(code: str) -> str:
+    """Return why the sandbox would refuse ``code``, or "" if it is allowed."""
+    from ..services.safe_exec import _analyze
+
+    try:
+        _analyze(code)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return ""
 
 
 # ---------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------
-def check_model_ready() -> tuple[bool, str, str]:
+def check_model_ready() -> Health:
     """
     Returns (ok, message, chosen_model).
     ok=False if Ollama not reachable or no model fits.
+    The answer is cached for ``LLM_HEALTH_TTL`` seconds.
     """
-    try:
-        models = _post_ollama("/tags", {})
-    except Exception as e:
-        return False, f"Ollama unreachable: {e}", ""
-
-    names = [m.get("name") for m in models.get("models", [])]
-
-    for pref in PREFERRED_MODELS:
-        if pref in names:
-            return True, "OK", pref
-
-    if names:
-        return True, f"Using first available model: {names[0]}", names[0]
+    return CLIENT.health()
 
-    return False, "No models installed. Try: ollama pull mistral:7b-instruct", ""
 
-
-def ask_llm(question: str, df: pd.DataFrame, retries: int = 1) -> tuple[str, str]:
+def ask_llm(
+    question: str,
+    df: pd.DataFrame,
+    retries: int = 1,
+    cache_key: str | None = None,
+    timings: List[LLMTiming] | None = None,
+) -> tuple[str, str]:
+    """Translate ``question`` into pandas code for ``df``.
+
+    ``cache_key`` identifies the dataset version (its content hash) so
+    cached answers never cross versions that share a dtype signature;
+    only code that passes the sandbox check is cached. The timing of every
+    generate call is appended to ``timings``.
+    """
     ok, msg, model = check_model_ready()
     if not ok:
         return "", f"# LLM unavailable: {msg}"
 
-    sig = _df_signature(df)
-    cache_key = (question, sig)
-    if cache_key in QUESTION_CACHE:
-        return QUESTION_CACHE[cache_key]
+    sig = _cache_signature(df, cache_key)
+    cached = answer_cache.lookup(question, sig)
+    if cached is not None:
+        return cached
 
     error_msg = ""
     intent = ""
@@ -169,29 +202,80 @@ def ask_llm(question: str, df: pd.DataFrame, retries: int = 1) -> tuple[str, str
         q = question
         if error_msg:
             q += f"\nPrevious attempt failed with: {error_msg}\nReturn fixed JSON only."
-        pii_env = os.environ.get("PII_COLUMNS", "")
-        redact_cols = [c.strip() for c in pii_env.split(",") if c.strip()]
-        history = CONVERSATION[-HISTORY_LEN:]
-        prompt = _build_prompt(q, df, history=history, redact_cols=redact_cols)
-        resp = _post_ollama(
-            "/generate",
-            {
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.1},
-            },
-        )
+        prompt = _prompt_for(q, df)
+        resp, timing = CLIENT.generate(model, prompt, {"temperature": 0.1})
+        if timings is not None:
+            timings.append(timing)
         raw = resp.get("response", "")
         intent, code = _extract_json(raw)
-        try:
-            from .safe_exec import _analyze  # type: ignore
-
-            _analyze(code)
+        error_msg = _code_error(code)
+        if not error_msg:
             break
-        except Exception as e:
-            error_msg = str(e)
 
-    QUESTION_CACHE[cache_key] = (intent, code)
+    # Code the sandbox refuses would otherwise be served again without retries.
+    if not error_msg:
+        answer_cache.store(question, sig, intent, code)
     _update_history(question, code)
     return intent, code
+
+
+def stream_llm(
+    question: str, df: pd.DataFrame, cache_key: str | None = None, wait: bool = True
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Stream the answer to ``question`` as ``(event, data)`` pairs.
+
+    ``intent`` and ``code`` events carry a ``delta`` of their field as the
+    model writes it. The last event is ``done`` with the full answer, the
+    sandbox check's ``error`` (None if the code is allowed) and the call's
+    latency, or ``error`` if the model could not be reached. Only answers
+    that pass the check are cached; there is no retry while streaming.
+
+    Raises:
+        ClientBusy: if ``wait`` is false and every LLM slot is taken.
+    """
+    ok, msg, model = check_model_ready()
+    if not ok:
+        yield "error", {"error": f"LLM unavailable: {msg}"}
+        return
+    sig = _cache_signature(df, cache_key)
+    cached = answer_cache.lookup(question, sig)
+    if cached is not None:
+        intent, code = cached
+        yield "intent", {"delta": intent}
+        yield "code", {"delta": code}
+        done: Dict[str, Any] = {
+            "intent": intent,
+            "code": code,
+            "error": None,
+            "latency": None,
+        }
+        yield "done", {**done, "cached": True}
+        return
+
+    parser = JsonFieldStream()
+    pieces: List[str] = []
+    timings: List[LLMTiming] = []
+    start = time.perf_counter()
+    first_token = None
+    try:
+        prompt = _prompt_for(question, df)
+        completion = CLIENT.stream(model, prompt, {"temperature": 0.1}, timings, wait)
+        for piece in completion:
+            pieces.append(piece)
+            for field, delta in parser.feed(piece):
+                if field in ("intent", "code"):
+                    if first_token is None:
+                        first_token = round(time.perf_counter() - start, 4)
+                    yield field, {"delta": delta}
+    except requests.RequestException as e:
+        yield "error", {"error": f"LLM request failed: {e}"}
+        return
+
+    intent, code = _extract_json("".join(pieces))
+    error = _code_error(code) or None
+    if error is None:
+        answer_cache.store(question, sig, intent, code)
+        _update_history(question, code)
+    latency = {**timing_summary(timings), "first_token": first_token}
+    done = {"intent": intent, "code": code, "error": error, "latency": latency}
+    yield "done", {**done, "cached": False}
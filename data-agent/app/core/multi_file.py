@@ -1,15 +1,18 @@
 import pandas as pd
 
+from .sketches import ColumnSketch, rank_join_keys
+
 
 def find_common_keys(df1: pd.DataFrame, df2: pd.DataFrame) -> list[str]:
-    """Return list of column names present in both dataframes with at least one overlapping value."""
-    common = []
-    for col in df1.columns.intersection(df2.columns):
-        if df1[col].dtype == df2[col].dtype:
-            overlap = set(df1[col].dropna().unique()) & set(df2[col].dropna().unique())
-            if overlap:
-                common.append(col)
-    return common
+    """Return column names present in both dataframes with overlapping values.
+
+    Overlap is estimated from per-column sketches instead of full sets of
+    unique values; columns are ranked best join key first.
+    """
+    shared = [str(c) for c in df1.columns.intersection(df2.columns)]
+    left = {c: ColumnSketch.from_series(df1[c]) for c in shared}
+    right = {c: ColumnSketch.from_series(df2[c]) for c in shared}
+    return [k["left"] for k in rank_join_keys(left, right)]
 
 
 def join_on_common_keys(
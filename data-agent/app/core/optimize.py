@@ -0,0 +1,65 @@
+"""Ingest-time dtype optimisation to shrink parsed datasets in memory."""
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .dataset_manager import frame_nbytes
+
+_INT32 = np.iinfo(np.int32)
+
+
+def _optimize_series(
+    s: pd.Series, category_max_ratio: float, arrow_strings: bool
+) -> pd.Series:
+    if pd.api.types.is_bool_dtype(s) or not len(s):
+        return s
+    if pd.api.types.is_integer_dtype(s) and isinstance(s.dtype, np.dtype):
+        # Not below int32: sandboxed and generated code does arithmetic on
+        # these columns, and int8/int16 would silently wrap around. Floats
+        # stay float64 for the same reason: float32 sums drift.
+        if s.dtype.itemsize <= 4 or s.min() < _INT32.min or s.max() > _INT32.max:
+            return s
+        return s.astype(np.int32)
+    if s.dtype == object:
+        if pd.api.types.infer_dtype(s, skipna=True) != "string":
+            return s
+        if s.nunique(dropna=True) <= category_max_ratio * len(s):
+            return s.astype("category")
+        if arrow_strings:
+            return s.astype("string[pyarrow]")
+    return s
+
+
+def optimize_dtypes(
+    df: pd.DataFrame,
+    category_max_ratio: float = 0.5,
+    arrow_strings: bool = False,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Return a memory-compact copy of ``df`` and a report of the savings.
+
+    Low-cardinality text (distinct/rows <= ``category_max_ratio``) becomes
+    ``category``, integers are downcast to int32 when they fit, and with
+    ``arrow_strings`` remaining text uses ``string[pyarrow]``. Floats are
+    kept at float64.
+    """
+    before = frame_nbytes(df)
+    out: Dict[Any, pd.Series] = {}
+    changed: Dict[str, Dict[str, str]] = {}
+    for col in df.columns:
+        s = df[col]
+        new = _optimize_series(s, category_max_ratio, arrow_strings)
+        if new.dtype != s.dtype:
+            changed[str(col)] = {"from": str(s.dtype), "to": str(new.dtype)}
+        out[col] = new
+    result = pd.DataFrame(out, index=df.index)
+    after = frame_nbytes(result)
+    report = {
+        "bytes_before": before,
+        "bytes_after": after,
+        "bytes_saved": before - after,
+        "columns": changed,
+    }
+    return result, report
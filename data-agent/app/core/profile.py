@@ -0,0 +1,167 @@
+"""Dataset profiles computed once at ingest and persisted by content hash."""
+from __future__ import annotations
+
+import hashlib
+import math
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pandas as pd
+
+from .analysis import basic_summary, numeric_column_stats
+from .columnar import iter_columnar
+from .config import settings
+from .sampling import Reservoir
+from .stats import DatasetStats
+from .storage import (
+    get_columnar_path,
+    get_content_hash,
+    get_dataset_path,
+    get_profile,
+    get_stats,
+    get_version_of,
+    save_profile,
+    save_stats,
+    set_content_hash,
+)
+
+TOP_CATEGORIES = 5
+NUMERIC_KEYS = ("mean", "std", "min", "q1", "median", "q3", "max")
+
+
+def _num(value: Any) -> float | None:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def build_profile(df: pd.DataFrame) -> Dict[str, Any]:
+    """Return summary, insights, quartiles and top categories for ``df``.
+
+    The result only holds JSON-compatible values so it can be stored as is.
+    """
+    summary = basic_summary(df)
+    missing_pct = (df.isna().mean() * 100).round(2)
+    stats = numeric_column_stats(df)
+    numeric_stats: Dict[str, Dict[str, Any]] = {}
+    for col, row in stats.iterrows():
+        numeric_stats[str(col)] = {
+            "count": int(row["count"]),
+            **{k: _num(row[k]) for k in NUMERIC_KEYS},
+        }
+    top_categories: Dict[str, Dict[str, int]] = {}
+    for col in df.columns:
+        if col in stats.index:
+            continue
+        top = df[col].value_counts().head(TOP_CATEGORIES)
+        top_categories[str(col)] = {str(k): int(v) for k, v in top.items()}
+    return {
+        "rows": int(summary["rows"]),
+        "columns": [str(c) for c in summary["columns"]],
+        "dtypes": {str(k): v for k, v in summary["dtypes"].items()},
+        "null_counts": {str(k): int(v) for k, v in summary["null_counts"].items()},
+        "missing_pct": {str(k): float(v) for k, v in missing_pct.items()},
+        "outlier_counts": {str(k): int(v) for k, v in stats["outliers"].items()},
+        "numeric_stats": numeric_stats,
+        "top_categories": top_categories,
+    }
+
+
+def profile_summary(profile: Dict[str, Any]) -> dict:
+    """Return the ``basic_summary`` view of a stored profile."""
+    keys = ("rows", "columns", "dtypes", "null_counts")
+    return {k: profile[k] for k in keys}
+
+
+def profile_insights(profile: Dict[str, Any]) -> dict:
+    """Return the ``basic_insights`` view of a stored profile."""
+    return {k: profile[k] for k in ("missing_pct", "outlier_counts")}
+
+
+def hash_file(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def needs_chunked_profile(raw_path: str | Path) -> bool:
+    """True for CSVs too large to profile comfortably in worker memory."""
+    path = Path(raw_path)
+    return (
+        path.suffix.lower() == ".csv"
+        and path.stat().st_size > settings.chunked_profile_bytes
+    )
+
+
+def build_file_stats(
+    raw_path: str | Path, reservoir: Reservoir | None = None
+) -> DatasetStats:
+    """Collect mergeable statistics of a raw CSV chunk by chunk.
+
+    A ``reservoir`` is fed the same chunks so a row sample comes out of the
+    same pass.
+    """
+    stats = DatasetStats()
+    for chunk in pd.read_csv(raw_path, chunksize=settings.profile_chunk_rows):
+        stats.update(chunk)
+        if reservoir is not None:
+            reservoir.update(chunk)
+    return stats
+
+
+def build_file_profile(
+    raw_path: str | Path, reservoir: Reservoir | None = None
+) -> Dict[str, Any]:
+    """Profile a raw CSV chunk by chunk, never holding the whole file."""
+    return build_file_stats(raw_path, reservoir).profile()
+
+
+def get_or_build_stats(
+    ds_id: str, loader: Callable[[str], pd.DataFrame]
+) -> DatasetStats:
+    """Return the mergeable statistics of a dataset, collecting them if missing.
+
+    Datasets profiled in memory at ingest have no stored state; their Arrow
+    copy is scanned once, one record batch at a time, and the state is
+    stored so later appends only merge in the new rows.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    data = get_stats(ds_id)
+    if data is not None:
+        return DatasetStats.from_dict(data)
+    path = get_columnar_path(ds_id)
+    if path is None or not path.exists() or get_version_of(ds_id) is not None:
+        stats = DatasetStats.from_chunks([loader(ds_id)])
+    else:
+        stats = DatasetStats.from_chunks(iter_columnar(path))
+    content_hash = get_content_hash(ds_id)
+    if content_hash is not None:
+        save_stats(content_hash, stats.to_dict())
+    return stats
+
+
+def get_or_build_profile(
+    ds_id: str, loader: Callable[[str], pd.DataFrame]
+) -> Dict[str, Any]:
+    """Return the stored profile, building it for datasets ingested without one.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    profile = get_profile(ds_id)
+    if profile is not None:
+        return profile
+    raw_path = get_dataset_path(ds_id)
+    content_hash = get_content_hash(ds_id)
+    if content_hash is None:
+        content_hash = hash_file(raw_path)
+        set_content_hash(ds_id, content_hash)
+    if get_columnar_path(ds_id) is None and needs_chunked_profile(raw_path):
+        profile = build_file_profile(raw_path)
+    else:
+        profile = build_profile(loader(ds_id))
+    save_profile(content_hash, profile)
+    return profile
@@ -0,0 +1,143 @@
+"""Byte-bounded LRU cache of rendered charts with an optional disk tier."""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+Entry = Tuple[bytes, Dict[str, Any]]
+
+
+class RenderCache:
+    """LRU cache of rendered bytes plus a small metadata dict, keyed by string.
+
+    Entries evicted from memory are written to ``spill_dir`` when one is
+    given, which is itself an LRU bounded by ``max_disk_bytes``. Keys must be
+    safe file names (e.g. hex digests).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        spill_dir: str | Path | None = None,
+        max_disk_bytes: int = 0,
+    ):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self._entries: OrderedDict[str, Entry] = OrderedDict()
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._load_index(self.spill_dir)
+
+    def _load_index(self, spill_dir: Path) -> None:
+        """Adopt spilled entries left by an earlier process, oldest first."""
+        files = sorted(spill_dir.glob("*.bin"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._disk[path.stem] = size
+            self._disk_bytes += size
+        self._trim_disk()
+
+    def get(self, key: str) -> Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            on_disk = key in self._disk
+        if on_disk:
+            entry = self._read_spill(key)
+            if entry is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self.put(key, *entry)
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes, meta: Dict[str, Any] | None = None) -> None:
+        meta = meta or {}
+        size = len(data)
+        spill = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (data, meta)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, (old_data, old_meta) = self._entries.popitem(last=False)
+                self._bytes -= len(old_data)
+                self.evictions += 1
+                spill.append((old_key, old_data, old_meta))
+        for old_key, old_data, old_meta in spill:
+            self._write_spill(old_key, old_data, old_meta)
+
+    def _spill_path(self, key: str) -> Path:
+        # Keys only reach the disk index when there is a spill directory.
+        if self.spill_dir is None:
+            raise RuntimeError("render cache has no spill directory")
+        return self.spill_dir / f"{key}.bin"
+
+    def _write_spill(self, key: str, data: bytes, meta: Dict[str, Any]) -> None:
+        if self.spill_dir is None or len(data) > self.max_disk_bytes:
+            return
+        header = json.dumps(meta).encode()
+        path = self._spill_path(key)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(len(header).to_bytes(4, "big") + header + data)
+        os.replace(tmp, path)
+        size = path.stat().st_size
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._trim_disk()
+
+    def _read_spill(self, key: str) -> Entry | None:
+        try:
+            raw = self._spill_path(key).read_bytes()
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        n = int.from_bytes(raw[:4], "big")
+        return raw[4 + n :], json.loads(raw[4 : 4 + n])
+
+    def _trim_disk(self) -> None:
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._spill_path(key).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
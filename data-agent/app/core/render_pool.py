@@ -0,0 +1,226 @@
+"""Chart rasterisation on a pool of pre-warmed worker processes.
+
+Agg holds the GIL while it draws, so render threads only overlap their
+data loading. Worker processes rasterise on separate cores instead. Each
+worker reads the columns it needs from the memory-mapped Arrow store
+itself, so only the spec goes in and only the PNG comes back.
+
+A batch of charts is aggregated once in the calling thread through a
+:class:`~.chart_plan.ChartPlan`, and only the small tables are shipped to
+the workers, which draw them concurrently.
+"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Sequence, Tuple, TypeVar
+
+import pandas as pd
+
+from .chart_data import chart_data
+from .chart_plan import ChartPlan, batch_columns, draw_table, plan_chart
+from .charts import chart_columns, render_chart
+from .columnar import load_dataset, load_sample
+
+T = TypeVar("T")
+
+
+def load_chart_frame(
+    ds_id: str, params: Dict[str, Any], sample: bool = False
+) -> Tuple[pd.DataFrame, bool]:
+    """Load the columns a chart uses, from the stored sample when asked for.
+
+    Also returns whether the sample was used; datasets small enough to
+    have none are read in full.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    return load_columns(ds_id, chart_columns(params), sample)
+
+
+def load_columns(
+    ds_id: str, columns: Sequence[str], sample: bool = False
+) -> Tuple[pd.DataFrame, bool]:
+    """:func:`load_chart_frame` for an explicit list of columns.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    columns = list(columns)
+    df = load_sample(ds_id, columns) if sample else None
+    if df is not None:
+        return df, True
+    return load_dataset(ds_id, columns=columns), False
+
+
+def render_dataset_chart(
+    ds_id: str, chart_type: str, params: Dict[str, Any], sample: bool = False
+) -> Tuple[bytes, bool]:
+    """Render a chart of a stored dataset; also says whether a sample was used.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    df, sampled = load_chart_frame(ds_id, params, sample)
+    return render_chart(chart_type, df, params), sampled
+
+
+def dataset_chart_data(
+    ds_id: str, chart_type: str, params: Dict[str, Any], sample: bool = False
+) -> Tuple[Dict[str, Any], bool]:
+    """The data-only counterpart of :func:`render_dataset_chart`.
+
+    Needs no rasterising, so it runs in the calling thread.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    df, sampled = load_chart_frame(ds_id, params, sample)
+    return chart_data(chart_type, df, params), sampled
+
+
+def _warm() -> None:
+    # Pays for font discovery and the Agg setup before the first real chart.
+    render_chart("line", pd.DataFrame({"x": [0, 1], "y": [0, 1]}), {"x": "x", "y": "y"})
+
+
+class RenderPool:
+    """Runs render calls on ``workers`` processes, or inline when ``workers`` is 0."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the API process runs threads.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_warm,
+                )
+            return self._pool
+
+    def warm(self) -> None:
+        """Start every worker now instead of on the first charts."""
+        if self.workers > 0:
+            pool = self._executor()
+            for fut in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                fut.result()
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        # A dead worker breaks the executor for good; the next call starts
+        # a fresh one. Another thread may already have replaced it.
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn: Callable[..., T], *args: Any) -> "Future[T]":
+        pool = self._executor()
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard(pool)
+        return self._executor().submit(fn, *args)
+
+    def submit(self, fn: Callable[..., T], *args: Any) -> "Future[T]":
+        """Start ``fn(*args)`` on a worker; inline pools return a done future.
+
+        A pool broken by a dead worker is replaced once before giving up.
+        """
+        if self.workers > 0:
+            return self._submit(fn, *args)
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as exc:
+            fut.set_exception(exc)
+        return fut
+
+    def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Call ``fn(*args)`` on a worker and wait for its result.
+
+        ``fn`` must be importable at module level; exceptions are re-raised.
+        If a worker dies, the pool is replaced and the call retried once.
+
+        Raises:
+            BrokenProcessPool: if the retry loses its worker too.
+        """
+        if self.workers <= 0:
+            return fn(*args)
+        pool = self._executor()
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._discard(pool)
+        return self._submit(fn, *args).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+BatchChart = Tuple[str, Dict[str, Any], str, bool]
+BatchResult = Tuple[Any, bool]
+
+
+def render_batch(
+    pool: RenderPool, ds_id: str, charts: Sequence[BatchChart]
+) -> Tuple[List[BatchResult | Exception], Dict[str, int]]:
+    """Render ``(type, params, format, sample)`` charts of one dataset together.
+
+    The columns of every chart are loaded once per ``sample`` flag and
+    aggregated through one shared plan; PNGs are then drawn concurrently on
+    ``pool``. Each result is ``(png bytes or Vega spec, sampled)``, or the
+    error that chart raised, so one bad spec does not fail the batch. Also
+    returns the plan's computed/reused counts.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    plans: Dict[bool, Tuple[ChartPlan, bool]] = {}
+    for flag in dict.fromkeys(c[3] for c in charts):
+        specs = [c[1] for c in charts if c[3] == flag]
+        df, sampled = load_columns(ds_id, batch_columns(specs), flag)
+        plans[flag] = ChartPlan(df), sampled
+
+    pending: List[Tuple[str, Any, bool]] = []
+    for chart_type, params, fmt, flag in charts:
+        plan, sampled = plans[flag]
+        try:
+            kind, value = plan_chart(plan, chart_type, params, fmt)
+        except Exception as exc:
+            pending.append(("error", exc, sampled))
+            continue
+        if kind == "table":
+            value = pool.submit(draw_table, chart_type, *value)
+        elif kind == "raw":
+            value = pool.submit(render_dataset_chart, ds_id, chart_type, params, flag)
+        pending.append((kind, value, sampled))
+
+    results: List[BatchResult | Exception] = []
+    for kind, value, sampled in pending:
+        if kind in ("error", "spec"):
+            results.append(value if kind == "error" else (value, sampled))
+            continue
+        try:
+            out = value.result()
+        except Exception as exc:
+            results.append(exc)
+            continue
+        results.append(out if kind == "raw" else (out, sampled))
+
+    stats = {"computed": 0, "reused": 0}
+    for plan, _ in plans.values():
+        for k, v in plan.stats().items():
+            stats[k] += v
+    return results, stats
@@ -0,0 +1,134 @@
+"""Representative row samples kept alongside each dataset.
+
+Both samplers draw a random key per row and keep the rows with the smallest
+keys, which is a uniform sample without replacement that can be built one
+chunk at a time. Sampled rows keep their original order so line charts
+still read left to right.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+class Reservoir:
+    """Streaming uniform sample of at most ``size`` rows (bottom-k random keys)."""
+
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._rows: pd.DataFrame | None = None
+        self._keys = np.empty(0)
+        self._order = np.empty(0, dtype=np.int64)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        keys = self._rng.random(len(chunk))
+        order = np.arange(self.seen, self.seen + len(chunk), dtype=np.int64)
+        self.seen += len(chunk)
+        chunk = chunk.reset_index(drop=True)
+        if self._rows is None:
+            rows, all_keys, all_order = chunk, keys, order
+        else:
+            rows = pd.concat([self._rows, chunk], ignore_index=True)
+            all_keys = np.concatenate([self._keys, keys])
+            all_order = np.concatenate([self._order, order])
+        if len(rows) > self.size:
+            keep = np.argpartition(all_keys, self.size - 1)[: self.size]
+            rows = rows.iloc[keep].reset_index(drop=True)
+            all_keys, all_order = all_keys[keep], all_order[keep]
+        self._rows, self._keys, self._order = rows, all_keys, all_order
+
+    def result(self) -> pd.DataFrame:
+        if self._rows is None:
+            return pd.DataFrame()
+        order = np.argsort(self._order, kind="stable")
+        return self._rows.iloc[order].reset_index(drop=True)
+
+
+def reservoir_sample(
+    chunks: Iterable[pd.DataFrame], size: int, seed: int = 0
+) -> pd.DataFrame:
+    reservoir = Reservoir(size, seed)
+    for chunk in chunks:
+        reservoir.update(chunk)
+    return reservoir.result()
+
+
+def _allocate(counts: np.ndarray, size: int) -> np.ndarray:
+    """Split ``size`` rows over levels of ``counts`` rows by largest remainder.
+
+    Every level gets at least one row while there are no more levels than
+    ``size``; the rows that costs come from the most over-allocated levels,
+    so the total never exceeds ``size``.
+    """
+    quota = counts * (size / counts.sum())
+    alloc = np.floor(quota).astype(np.int64)
+    short = size - int(alloc.sum())
+    if short > 0:
+        alloc[np.argsort(alloc - quota, kind="stable")[:short]] += 1
+    alloc = np.minimum(alloc, counts)
+    if len(counts) > size:
+        return alloc
+    excess = int((alloc == 0).sum())
+    alloc = np.maximum(alloc, 1)
+    if excess:
+        # One candidate per row a level could give up, most surplus first.
+        spare = alloc - 1
+        level = np.repeat(np.arange(len(alloc)), spare)
+        nth = np.arange(len(level)) - np.repeat(np.cumsum(spare) - spare, spare)
+        surplus = (alloc - quota)[level] - nth
+        give = level[np.argsort(-surplus, kind="stable")[:excess]]
+        alloc -= np.bincount(give, minlength=len(alloc))
+    return alloc
+
+
+def stratified_sample(
+    df: pd.DataFrame, size: int, by: str, seed: int = 0
+) -> pd.DataFrame:
+    """Proportional sample of at most ``size`` rows per level of ``by``.
+
+    Every level keeps at least one row unless there are more levels than
+    ``size``.
+    """
+    codes = df.groupby(by, dropna=False, observed=True, sort=False).ngroup().to_numpy()
+    counts = np.bincount(codes)
+    alloc = _allocate(counts, min(size, len(df)))
+    keys = np.random.default_rng(seed).random(len(df))
+    ranks = pd.Series(keys).groupby(codes).rank(method="first").to_numpy()
+    mask = ranks <= alloc[codes]
+    return df[mask].reset_index(drop=True)
+
+
+def append_sample(
+    sample: pd.DataFrame, total: int, delta: pd.DataFrame, size: int, seed: int = 0
+) -> pd.DataFrame:
+    """Extend a uniform sample of ``total`` rows with newly appended rows.
+
+    ``sample`` must hold ``min(size, total)`` rows drawn uniformly from the
+    old rows. How many rows stay from it follows the hypergeometric
+    distribution, so the result is a uniform sample of old and new rows
+    together without reading the old rows again. Stratification is not
+    preserved.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(size, total + len(delta))
+    n_old = int(rng.hypergeometric(total, len(delta), k)) if k else 0
+    old = np.sort(rng.choice(len(sample), n_old, replace=False))
+    new = np.sort(rng.choice(len(delta), k - n_old, replace=False))
+    return pd.concat(
+        [sample.iloc[old], delta.iloc[new]], ignore_index=True
+    )
+
+
+def build_sample(
+    df: pd.DataFrame, size: int, by: str | None = None, seed: int = 0
+) -> pd.DataFrame:
+    """Return a sample of ``df``, stratified on ``by`` when it is a column."""
+    if len(df) <= size:
+        return df
+    if by is not None and by in df.columns:
+        return stratified_sample(df, size, by, seed)
+    return reservoir_sample([df], size, seed)
@@ -0,0 +1,276 @@
+"""Per-column sketches for join-key discovery.
+
+Each column is summarised once by a HyperLogLog (distinct count) and a
+bottom-k MinHash (a uniform sample of its distinct hashed values). Both
+merge cheaply, so the overlap of any two columns is estimated from a few
+kilobytes instead of two full Python sets. Sketches are persisted by
+content hash, which makes repeated pairings almost free.
+"""
+from __future__ import annotations
+
+import base64
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .storage import get_content_hash, get_sketches, save_sketches
+
+HLL_PRECISION = 12
+MINHASH_SIZE = 1024
+
+
+def _encode(arr: np.ndarray) -> str:
+    return base64.b64encode(arr.tobytes()).decode()
+
+
+def _decode(data: str, dtype: Any) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).copy()
+
+
+def key_kind(series: pd.Series) -> str:
+    """Coarse type used to decide which columns may be compared at all."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    return "text"
+
+
+def _canonical(values: pd.Series | pd.Index) -> np.ndarray:
+    """Values in a form that hashes equally across int widths and integral floats."""
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(
+        values.dtype
+    ):
+        arr = np.asarray(values, dtype=float)
+        if np.all(np.mod(arr, 1) == 0):
+            return arr.astype(np.int64)
+        return arr
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return np.asarray(values.astype("datetime64[ns]")).view(np.int64)
+    return np.asarray(values.astype(str), dtype=object)
+
+
+def hash_column(series: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-null values of ``series``."""
+    series = series.dropna()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Hash each category once and index by the codes.
+        hashed = hash_column(pd.Series(series.cat.categories))
+        return hashed[series.cat.codes.to_numpy()]
+    if not len(series):
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_array(_canonical(series), categorize=True)
+
+
+class HyperLogLog:
+    """Distinct-count estimator with ``2**p`` one-byte registers."""
+
+    def __init__(self, p: int = HLL_PRECISION):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        bits = 64 - self.p
+        idx = (hashes >> np.uint64(bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # ``rest`` has at most 52 bits, so float64 represents it exactly and
+        # frexp's exponent is its bit length.
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        out = HyperLogLog(self.p)
+        out.registers = np.maximum(self.registers, other.registers)
+        return out
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return float(m * np.log(m / zeros))  # linear counting
+        return float(raw)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "registers": _encode(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        hll = cls(data["p"])
+        hll.registers = _decode(data["registers"], np.uint8)
+        return hll
+
+
+class MinHash:
+    """Bottom-k MinHash: the ``k`` smallest distinct hashes of a column."""
+
+    def __init__(self, k: int = MINHASH_SIZE):
+        self.k = k
+        self.values = np.empty(0, dtype=np.uint64)
+
+    def update(self, hashes: np.ndarray) -> None:
+        hashes = np.concatenate([self.values, hashes])
+        take = 4 * self.k
+        while take < len(hashes):
+            # Only the smallest hashes can survive; avoid sorting them all.
+            head = np.unique(np.partition(hashes, take)[:take])
+            if len(head) >= self.k:
+                self.values = head[: self.k]
+                return
+            take *= 4
+        self.values = np.unique(hashes)[: self.k]
+
+    @property
+    def exact(self) -> bool:
+        """True while the sketch still holds every distinct value."""
+        return len(self.values) < self.k
+
+    def jaccard(self, other: "MinHash") -> float:
+        """Estimate |A ∩ B| / |A ∪ B| from the bottom-k of the union."""
+        k = min(self.k, other.k)
+        union = np.union1d(self.values, other.values)[:k]
+        if not len(union):
+            return 0.0
+        both = np.isin(union, self.values) & np.isin(union, other.values)
+        return float(both.sum()) / len(union)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "values": _encode(self.values)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MinHash":
+        mh = cls(data["k"])
+        mh.values = _decode(data["values"], np.uint64)
+        return mh
+
+
+class ColumnSketch:
+    """Kind, non-null count, HyperLogLog and MinHash of one column."""
+
+    def __init__(self, kind: str = "text"):
+        self.kind = kind
+        self.count = 0
+        self.hll = HyperLogLog()
+        self.minhash = MinHash()
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "ColumnSketch":
+        sketch = cls(key_kind(series))
+        hashes = hash_column(series)
+        sketch.count = len(hashes)
+        sketch.hll.update(hashes)
+        sketch.minhash.update(hashes)
+        return sketch
+
+    @property
+    def distinct(self) -> float:
+        if self.minhash.exact:
+            return float(len(self.minhash.values))
+        return self.hll.estimate()
+
+    @property
+    def uniqueness(self) -> float:
+        """Estimated distinct / non-null values; 1.0 for a primary key."""
+        return min(1.0, self.distinct / self.count) if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "count": self.count,
+            "hll": self.hll.to_dict(),
+            "minhash": self.minhash.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnSketch":
+        sketch = cls(data["kind"])
+        sketch.count = data["count"]
+        sketch.hll = HyperLogLog.from_dict(data["hll"])
+        sketch.minhash = MinHash.from_dict(data["minhash"])
+        return sketch
+
+
+def dataset_sketches(df: pd.DataFrame) -> Dict[str, ColumnSketch]:
+    return {str(col): ColumnSketch.from_series(df[col]) for col in df.columns}
+
+
+def estimate_overlap(a: ColumnSketch, b: ColumnSketch) -> Dict[str, float]:
+    """Estimated intersection size and containment of each side in the other."""
+    if a.minhash.exact and b.minhash.exact:
+        inter = float(len(np.intersect1d(a.minhash.values, b.minhash.values)))
+    else:
+        union = a.hll.merge(b.hll).estimate()
+        inter = a.minhash.jaccard(b.minhash) * union
+    inter = min(inter, a.distinct, b.distinct)
+    return {
+        "intersection": inter,
+        "containment_left": inter / a.distinct if a.distinct else 0.0,
+        "containment_right": inter / b.distinct if b.distinct else 0.0,
+    }
+
+
+def rank_join_keys(
+    left: Dict[str, ColumnSketch],
+    right: Dict[str, ColumnSketch],
+    same_name: bool = True,
+) -> List[Dict[str, Any]]:
+    """Rank column pairs by how well they would work as a join key.
+
+    The score multiplies the best containment (share of one side's distinct
+    values found in the other) by the best uniqueness, so a primary key
+    matched by a foreign key scores close to 1. Pairs of different kinds
+    and pairs with no estimated overlap are left out.
+    """
+    candidates: List[Dict[str, Any]] = []
+    for lname, lsk in left.items():
+        names = [lname] if same_name else list(right)
+        for rname in names:
+            rsk = right.get(rname)
+            if rsk is None or rsk.kind != lsk.kind:
+                continue
+            overlap = estimate_overlap(lsk, rsk)
+            if overlap["intersection"] <= 0:
+                continue
+            containment = max(overlap["containment_left"], overlap["containment_right"])
+            uniqueness = max(lsk.uniqueness, rsk.uniqueness)
+            candidates.append(
+                {
+                    "left": lname,
+                    "right": rname,
+                    "containment_left": round(overlap["containment_left"], 4),
+                    "containment_right": round(overlap["containment_right"], 4),
+                    "uniqueness_left": round(lsk.uniqueness, 4),
+                    "uniqueness_right": round(rsk.uniqueness, 4),
+                    "score": round(containment * uniqueness, 4),
+                }
+            )
+    candidates.sort(key=lambda c: -c["score"])
+    return candidates
+
+
+def get_or_build_sketches(
+    ds_id: str, loader: Callable[[str], pd.DataFrame]
+) -> Dict[str, ColumnSketch]:
+    """Return the stored column sketches of a dataset, building them once.
+
+    Raises:
+        KeyError: if ``ds_id`` is not registered.
+    """
+    content_hash = get_content_hash(ds_id)
+    stored = get_sketches(content_hash) if content_hash is not None else None
+    if stored is not None:
+        return {k: ColumnSketch.from_dict(v) for k, v in stored.items()}
+    sketches = dataset_sketches(loader(ds_id))
+    if content_hash is not None:
+        save_sketches(content_hash, {k: v.to_dict() for k, v in sketches.items()})
+    return sketches
@@ -0,0 +1,344 @@
+"""Mergeable column statistics for chunked (out-of-core) profiling.
+
+Every statistic here can be updated one chunk at a time and merged with
+another instance, so a CSV larger than memory is profiled in one pass with
+``pd.read_csv(chunksize=...)`` and partial results can be combined later.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+TOP_CATEGORIES = 5
+# Candidate categories kept per column; a bounded "space-saving" counter.
+CATEGORY_CAPACITY = 200
+
+
+class QuantileSketch:
+    """A compact KLL-style quantile sketch.
+
+    Values enter level 0; whenever a level holds more than ``k`` items it is
+    sorted and every other item is promoted to the next level with twice
+    the weight. Memory stays around ``k * log2(n / k)`` values and the sketch
+    is exact until the first compaction.
+    """
+
+    def __init__(self, k: int = 1024, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for lvl, items in enumerate(other.levels):
+            if lvl == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[lvl] = np.concatenate([self.levels[lvl], items])
+        self.n += other.n
+        self._compress()
+
+    def _compress(self) -> None:
+        lvl = 0
+        while lvl < len(self.levels):
+            items = self.levels[lvl]
+            if len(items) > self.k:
+                items = np.sort(items)
+                odd = len(items) % 2
+                offset = int(self._rng.integers(2))
+                promoted = items[odd:][offset::2]
+                self.levels[lvl] = items[:odd]
+                if lvl + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[lvl + 1] = np.concatenate([self.levels[lvl + 1], promoted])
+            lvl += 1
+
+    @property
+    def exact(self) -> bool:
+        return all(not len(items) for items in self.levels[1:])
+
+    def _weighted(self) -> tuple[np.ndarray, np.ndarray]:
+        values = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [
+                np.full(len(items), 2**lvl, dtype=float)
+                for lvl, items in enumerate(self.levels)
+            ]
+        )
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def quantile(self, q: float) -> float:
+        if not self.n:
+            return float("nan")
+        if self.exact:
+            # Same linear interpolation as pandas while no data was discarded.
+            return float(np.quantile(self.levels[0], q))
+        values, weights = self._weighted()
+        cum = np.cumsum(weights)
+        idx = int(np.searchsorted(cum, q * cum[-1], side="left"))
+        return float(values[min(idx, len(values) - 1)])
+
+    def count_below(self, x: float) -> float:
+        values, weights = self._weighted()
+        return float(weights[values < x].sum())
+
+    def count_above(self, x: float) -> float:
+        values, weights = self._weighted()
+        return float(weights[values > x].sum())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "levels": [lv.tolist() for lv in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(k=data["k"])
+        sketch.n = data["n"]
+        sketch.levels = [np.asarray(lv, dtype=float) for lv in data["levels"]]
+        return sketch
+
+
+def _merge_dtype(a: str | None, b: str) -> str:
+    if a is None or a == b:
+        return b
+    try:
+        if all(np.issubdtype(np.dtype(t), np.number) for t in (a, b)):
+            return str(np.result_type(a, b))
+    except TypeError:
+        pass
+    return "object"
+
+
+class ColumnStats:
+    """Count, nulls, mean/variance, extremes, quartiles and top values of one column.
+
+    Mean and variance use the pairwise form of Welford's update (Chan et
+    al.), so chunk aggregates merge without loss of precision.
+    """
+
+    def __init__(self) -> None:
+        self.dtype: str | None = None
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.sketch = QuantileSketch()
+        self.categories: Dict[str, int] = {}
+
+    @property
+    def numeric(self) -> bool:
+        if self.dtype is None:
+            return False
+        try:
+            dtype = np.dtype(self.dtype)
+        except TypeError:
+            return False
+        return np.issubdtype(dtype, np.number) and dtype.kind != "b"
+
+    def _merge_moments(self, n: int, mean: float, m2: float) -> None:
+        if not n:
+            return
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def update(self, series: pd.Series) -> None:
+        self.dtype = _merge_dtype(self.dtype, str(series.dtype))
+        nulls = int(series.isna().sum())
+        self.nulls += nulls
+        if self.numeric and pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if len(values):
+                mean = float(values.mean())
+                self._merge_moments(
+                    len(values), mean, float(((values - mean) ** 2).sum())
+                )
+                self.min = min(self.min, float(values.min()))
+                self.max = max(self.max, float(values.max()))
+                self.sketch.update(values)
+            return
+        self.count += len(series) - nulls
+        counts = series.value_counts()
+        counts = counts[counts > 0]  # categoricals list unused categories too
+        self._add_categories({str(k): int(v) for k, v in counts.items()})
+
+    def _add_categories(self, counts: Dict[str, int]) -> None:
+        for key, val in counts.items():
+            self.categories[key] = self.categories.get(key, 0) + val
+        if len(self.categories) > CATEGORY_CAPACITY:
+            top = sorted(self.categories.items(), key=lambda kv: -kv[1])
+            self.categories = dict(top[:CATEGORY_CAPACITY])
+
+    def merge(self, other: "ColumnStats") -> None:
+        if other.dtype is not None:
+            self.dtype = _merge_dtype(self.dtype, other.dtype)
+        self.nulls += other.nulls
+        if other.numeric:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.sketch.merge(other.sketch)
+        else:
+            self.count += other.count
+        self._add_categories(other.categories)
+
+    @property
+    def std(self) -> float:
+        # Sample standard deviation, matching ``Series.std()``.
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else float("nan")
+
+    def outlier_count(self) -> int:
+        """Estimated number of values outside the 1.5 * IQR fences."""
+        if not self.sketch.n:
+            return 0
+        q1, q3 = self.sketch.quantile(0.25), self.sketch.quantile(0.75)
+        iqr = q3 - q1
+        below = self.sketch.count_below(q1 - 1.5 * iqr)
+        above = self.sketch.count_above(q3 + 1.5 * iqr)
+        return int(round(below + above))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "dtype": self.dtype,
+            "count": self.count,
+            "nulls": self.nulls,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min if np.isfinite(self.min) else None,
+            "max": self.max if np.isfinite(self.max) else None,
+            "sketch": self.sketch.to_dict(),
+            "categories": self.categories,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnStats":
+        stats = cls()
+        stats.dtype = data["dtype"]
+        stats.count = data["count"]
+        stats.nulls = data["nulls"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.min = float("inf") if data["min"] is None else data["min"]
+        stats.max = float("-inf") if data["max"] is None else data["max"]
+        stats.sketch = QuantileSketch.from_dict(data["sketch"])
+        stats.categories = dict(data["categories"])
+        return stats
+
+
+def _num(value: float) -> float | None:
+    return None if value is None or not np.isfinite(value) else float(value)
+
+
+class DatasetStats:
+    """Mergeable statistics for every column of a (possibly chunked) dataset."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.columns: Dict[str, ColumnStats] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        for col in df.columns:
+            self.columns.setdefault(str(col), ColumnStats()).update(df[col])
+
+    def merge(self, other: "DatasetStats") -> None:
+        self.rows += other.rows
+        for name, col in other.columns.items():
+            self.columns.setdefault(name, ColumnStats()).merge(col)
+
+    def summary(self) -> dict:
+        """Return the same shape as ``analysis.basic_summary``."""
+        return {
+            "rows": self.rows,
+            "columns": list(self.columns),
+            "dtypes": {k: c.dtype or "object" for k, c in self.columns.items()},
+            "null_counts": {k: c.nulls for k, c in self.columns.items()},
+        }
+
+    def insights(self) -> dict:
+        """Return the same shape as ``analysis.basic_insights``."""
+        missing = {
+            k: round(c.nulls / self.rows * 100, 2) if self.rows else float("nan")
+            for k, c in self.columns.items()
+        }
+        outliers = {k: c.outlier_count() for k, c in self.columns.items() if c.numeric}
+        return {"missing_pct": missing, "outlier_counts": outliers}
+
+    def profile(self) -> Dict[str, Any]:
+        """Return the same shape as ``profile.build_profile``."""
+        numeric_stats = {}
+        top_categories = {}
+        for name, col in self.columns.items():
+            if col.numeric:
+                q = col.sketch.quantile
+                numeric_stats[name] = {
+                    "count": col.count,
+                    "mean": _num(col.mean) if col.count else None,
+                    "std": _num(col.std),
+                    "min": _num(col.min),
+                    "q1": _num(q(0.25)),
+                    "median": _num(q(0.5)),
+                    "q3": _num(q(0.75)),
+                    "max": _num(col.max),
+                }
+            else:
+                top = sorted(col.categories.items(), key=lambda kv: -kv[1])
+                top_categories[name] = dict(top[:TOP_CATEGORIES])
+        return {
+            **self.summary(),
+            **self.insights(),
+            "numeric_stats": numeric_stats,
+            "top_categories": top_categories,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "columns": {k: c.to_dict() for k, c in self.columns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DatasetStats":
+        stats = cls()
+        stats.rows = data["rows"]
+        stats.columns = {
+            k: ColumnStats.from_dict(v) for k, v in data["columns"].items()
+        }
+        return stats
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame]) -> "DatasetStats":
+        stats = cls()
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+
+def profile_csv(path: str | Path, chunksize: int = 100_000) -> DatasetStats:
+    """Profile a CSV in one pass without holding more than one chunk in memory."""
+    return DatasetStats.from_chunks(pd.read_csv(path, chunksize=chunksize))
+
+
+def chunked_summary(path: str | Path, chunksize: int = 100_000) -> dict:
+    return profile_csv(path, chunksize).summary()
+
+
+def chunked_insights(path: str | Path, chunksize: int = 100_000) -> dict:
+    return profile_csv(path, chunksize).insights()
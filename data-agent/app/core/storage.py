@@ -1,31 +1,120 @@
 from __future__ import annotations
 
+import json
 import sqlite3
+import time
 from pathlib import Path
+from typing import Sequence
 
 from .config import settings
 
 DB_FILE = Path(settings.db_file)
 DB_FILE.parent.mkdir(exist_ok=True)
 
+# Columns added after the initial schema; created on startup when missing.
+_DATASET_COLUMNS = {
+    "columnar_path": "TEXT",
+    "content_hash": "TEXT",
+    "rows": "INTEGER",
+    "dtype_report": "TEXT",
+    "sheet": "TEXT",
+    "parent_id": "TEXT",
+    "sample_path": "TEXT",
+    "version": "INTEGER",
+    "version_of": "TEXT",
+    "transforms": "TEXT",
+    # JSON list of the Arrow files a version reads its unchanged columns
+    # from, fixed when it is created so later appends to the parent do not
+    # change it.
+    "layer_paths": "TEXT",
+}
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict) -> None:
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
 
 def init_db() -> None:
     with sqlite3.connect(DB_FILE) as conn:
         conn.execute(
             "CREATE TABLE IF NOT EXISTS datasets (id TEXT PRIMARY KEY, path TEXT NOT NULL)"
         )
+        _ensure_columns(conn, "datasets", _DATASET_COLUMNS)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles "
+            "(content_hash TEXT PRIMARY KEY, profile TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS column_sketches "
+            "(content_hash TEXT PRIMARY KEY, sketches TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS profile_stats "
+            "(content_hash TEXT PRIMARY KEY, stats TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS datasets_content_hash "
+            "ON datasets (content_hash)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers "
+            "(signature TEXT NOT NULL, question TEXT NOT NULL, intent TEXT, "
+            "code TEXT, created REAL NOT NULL, used REAL NOT NULL, "
+            "hits INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (signature, question))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS answers_used ON answers (used)")
 
 
-def add_dataset(path: str, ds_id: str | None = None) -> str:
+def add_dataset(
+    path: str,
+    ds_id: str | None = None,
+    columnar_path: str | None = None,
+    content_hash: str | None = None,
+    rows: int | None = None,
+    sheet: str | None = None,
+    parent_id: str | None = None,
+) -> str:
     import uuid
 
     if ds_id is None:
         ds_id = str(uuid.uuid4())
     with sqlite3.connect(DB_FILE) as conn:
-        conn.execute("INSERT INTO datasets (id, path) VALUES (?, ?)", (ds_id, path))
+        conn.execute(
+            "INSERT INTO datasets "
+            "(id, path, columnar_path, content_hash, rows, sheet, parent_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (ds_id, path, columnar_path, content_hash, rows, sheet, parent_id),
+        )
     return ds_id
 
 
+def find_dataset_by_hash(content_hash: str) -> dict | None:
+    """Return an already parsed dataset with identical raw content, if any."""
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute(
+            "SELECT id, path, columnar_path, rows, dtype_report, sheet, sample_path "
+            "FROM datasets "
+            "WHERE content_hash=? AND columnar_path IS NOT NULL",
+            (content_hash,),
+        )
+        rows = cur.fetchall()
+    for ds_id, path, columnar_path, n_rows, report, sheet, sample_path in rows:
+        if Path(columnar_path).exists():
+            return {
+                "id": ds_id,
+                "path": path,
+                "columnar_path": columnar_path,
+                "rows": n_rows,
+                "dtype_report": json.loads(report) if report else None,
+                "sheet": sheet,
+                "sample_path": sample_path,
+            }
+    return None
+
+
 def get_dataset_path(ds_id: str) -> Path:
     with sqlite3.connect(DB_FILE) as conn:
         cur = conn.execute("SELECT path FROM datasets WHERE id=?", (ds_id,))
@@ -33,3 +122,345 @@ def get_dataset_path(ds_id: str) -> Path:
     if row is None:
         raise KeyError(ds_id)
     return Path(row[0])
+
+
+def get_dataset_sheet(ds_id: str) -> str | None:
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute("SELECT sheet FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+    if row is None:
+        raise KeyError(ds_id)
+    return row[0]
+
+
+def add_version(
+    parent_id: str,
+    columnar_path: str,
+    content_hash: str,
+    transforms: list,
+    sample_path: str | None = None,
+    layer_paths: Sequence[str] = (),
+) -> str:
+    """Register a new version of ``parent_id`` and return its id.
+
+    The version's Arrow file only holds the columns it changed; the rest
+    are read from ``layer_paths``, the parent's files at this moment.
+    """
+    import uuid
+
+    ds_id = str(uuid.uuid4())
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "INSERT INTO datasets (id, path, columnar_path, content_hash, rows, "
+            "dtype_report, sheet, sample_path, version, version_of, transforms, "
+            "layer_paths) "
+            "SELECT ?, path, ?, ?, rows, dtype_report, sheet, ?, "
+            "COALESCE(version, 0) + 1, id, ?, ? FROM datasets WHERE id=?",
+            (
+                ds_id,
+                columnar_path,
+                content_hash,
+                sample_path,
+                json.dumps(transforms),
+                json.dumps(list(layer_paths)),
+                parent_id,
+            ),
+        )
+    return ds_id
+
+
+def find_version(parent_id: str, content_hash: str) -> str | None:
+    """Return an existing version of ``parent_id`` with identical content."""
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute(
+            "SELECT id FROM datasets WHERE version_of=? AND content_hash=?",
+            (parent_id, content_hash),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+def get_version_of(ds_id: str) -> str | None:
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute("SELECT version_of FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+    if row is None:
+        raise KeyError(ds_id)
+    return row[0]
+
+
+def get_lineage(ds_id: str) -> list[dict]:
+    """Return the versions leading to ``ds_id``, oldest first."""
+    lineage: list[dict] = []
+    current: str | None = ds_id
+    with sqlite3.connect(DB_FILE) as conn:
+        while current is not None:
+            cur = conn.execute(
+                "SELECT COALESCE(version, 0), version_of, transforms "
+                "FROM datasets WHERE id=?",
+                (current,),
+            )
+            row = cur.fetchone()
+            if row is None:
+                raise KeyError(current)
+            version, parent, transforms = row
+            lineage.append(
+                {
+                    "dataset_id": current,
+                    "version": version,
+                    "transforms": json.loads(transforms) if transforms else [],
+                }
+            )
+            current = parent
+    return lineage[::-1]
+
+
+def get_sheet_datasets(ds_id: str) -> list[dict]:
+    """Return every sheet dataset of the workbook ``ds_id`` belongs to, in order."""
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute(
+            "SELECT COALESCE(parent_id, id) FROM datasets WHERE id=?", (ds_id,)
+        )
+        row = cur.fetchone()
+        if row is None:
+            raise KeyError(ds_id)
+        cur = conn.execute(
+            "SELECT id, sheet, columnar_path, content_hash FROM datasets "
+            "WHERE (id=? OR parent_id=?) AND sheet IS NOT NULL ORDER BY rowid",
+            (row[0], row[0]),
+        )
+        rows = cur.fetchall()
+    return [
+        {"id": i, "sheet": sheet, "columnar_path": col, "content_hash": h}
+        for i, sheet, col, h in rows
+    ]
+
+
+def set_columnar_path(ds_id: str, path: str | None) -> None:
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute("UPDATE datasets SET columnar_path=? WHERE id=?", (path, ds_id))
+
+
+def set_sample_path(ds_id: str, path: str | None) -> None:
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute("UPDATE datasets SET sample_path=? WHERE id=?", (path, ds_id))
+
+
+def get_sample_path(ds_id: str) -> Path | None:
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute("SELECT sample_path FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+    if row is None:
+        raise KeyError(ds_id)
+    return Path(row[0]) if row[0] else None
+
+
+def get_columnar_path(ds_id: str) -> Path | None:
+    """Return the Arrow copy of a dataset, or ``None`` if it was never converted."""
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute("SELECT columnar_path FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+    if row is None:
+        raise KeyError(ds_id)
+    return Path(row[0]) if row[0] else None
+
+
+def set_dtype_report(ds_id: str, report: dict | None) -> None:
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "UPDATE datasets SET dtype_report=? WHERE id=?",
+            (json.dumps(report) if report is not None else None, ds_id),
+        )
+
+
+def get_dtype_report(ds_id: str) -> dict | None:
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute("SELECT dtype_report FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+    if row is None:
+        raise KeyError(ds_id)
+    return json.loads(row[0]) if row[0] else None
+
+
+def get_layer_paths(ds_id: str) -> list[Path] | None:
+    """Files a version reads its unchanged columns from; empty for full copies.
+
+    ``None`` for rows written before layers were recorded.
+    """
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute("SELECT layer_paths FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+    if row is None:
+        raise KeyError(ds_id)
+    return None if row[0] is None else [Path(p) for p in json.loads(row[0])]
+
+
+def file_in_use(path: str | Path) -> bool:
+    """True if any dataset still reads ``path`` as its Arrow copy, sample or layer."""
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute(
+            "SELECT 1 FROM datasets WHERE columnar_path=? OR sample_path=? "
+            "OR EXISTS (SELECT 1 FROM json_each(datasets.layer_paths) WHERE value=?) "
+            "LIMIT 1",
+            (str(path), str(path), str(path)),
+        )
+        return cur.fetchone() is not None
+
+
+def record_append(
+    ds_id: str,
+    columnar_path: str,
+    content_hash: str,
+    rows: int,
+    sample_path: str | None,
+) -> None:
+    """Point a dataset at its appended Arrow file and new content in one step.
+
+    The appended file holds every column, so a version stops reading layers.
+    """
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "UPDATE datasets SET columnar_path=?, content_hash=?, rows=?, "
+            "sample_path=?, layer_paths='[]' WHERE id=?",
+            (columnar_path, content_hash, rows, sample_path, ds_id),
+        )
+
+
+def get_content_hash(ds_id: str) -> str | None:
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute("SELECT content_hash FROM datasets WHERE id=?", (ds_id,))
+        row = cur.fetchone()
+    if row is None:
+        raise KeyError(ds_id)
+    return row[0]
+
+
+def set_content_hash(ds_id: str, content_hash: str) -> None:
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "UPDATE datasets SET content_hash=? WHERE id=?", (content_hash, ds_id)
+        )
+
+
+def save_profile(content_hash: str, profile: dict) -> None:
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO profiles (content_hash, profile) VALUES (?, ?)",
+            (content_hash, json.dumps(profile)),
+        )
+
+
+def get_profile(ds_id: str) -> dict | None:
+    """Return the stored profile of a dataset's content, if one was computed."""
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute(
+            "SELECT p.profile FROM datasets d "
+            "JOIN profiles p ON p.content_hash = d.content_hash WHERE d.id=?",
+            (ds_id,),
+        )
+        row = cur.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_stats(content_hash: str, stats: dict) -> None:
+    """Store the mergeable ``DatasetStats`` state behind a profile."""
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO profile_stats (content_hash, stats) VALUES (?, ?)",
+            (content_hash, json.dumps(stats)),
+        )
+
+
+def get_stats(ds_id: str) -> dict | None:
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute(
+            "SELECT s.stats FROM datasets d "
+            "JOIN profile_stats s ON s.content_hash = d.content_hash WHERE d.id=?",
+            (ds_id,),
+        )
+        row = cur.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_sketches(content_hash: str, sketches: dict) -> None:
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO column_sketches (content_hash, sketches) "
+            "VALUES (?, ?)",
+            (content_hash, json.dumps(sketches)),
+        )
+
+
+def get_sketches(content_hash: str) -> dict | None:
+    with sqlite3.connect(DB_FILE) as conn:
+        cur = conn.execute(
+            "SELECT sketches FROM column_sketches WHERE content_hash=?",
+            (content_hash,),
+        )
+        row = cur.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+_TOUCH_ANSWER = (
+    "UPDATE answers SET used=?, hits=hits+1 WHERE signature=? AND question=?"
+)
+
+
+def get_answer(signature: str, question: str, since: float) -> tuple | None:
+    """Return a stored ``(intent, code)`` created after ``since``; marks it used."""
+    with sqlite3.connect(DB_FILE) as conn:
+        row = conn.execute(
+            "SELECT intent, code FROM answers "
+            "WHERE signature=? AND question=? AND created>=?",
+            (signature, question, since),
+        ).fetchone()
+        if row is not None:
+            conn.execute(_TOUCH_ANSWER, (time.time(), signature, question))
+    return row
+
+
+def touch_answer(signature: str, question: str) -> None:
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(_TOUCH_ANSWER, (time.time(), signature, question))
+
+
+def list_answers(signature: str, since: float, limit: int) -> list[tuple]:
+    """The ``limit`` most recently used ``(question, intent, code)`` of a dataset."""
+    with sqlite3.connect(DB_FILE) as conn:
+        return conn.execute(
+            "SELECT question, intent, code FROM answers "
+            "WHERE signature=? AND created>=? ORDER BY used DESC LIMIT ?",
+            (signature, since, limit),
+        ).fetchall()
+
+
+def save_answer(signature: str, question: str, intent: str, code: str) -> None:
+    now = time.time()
+    with sqlite3.connect(DB_FILE) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO answers "
+            "(signature, question, intent, code, created, used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (signature, question, intent, code, now, now),
+        )
+
+
+def evict_answers(max_entries: int, before: float) -> int:
+    """Drop answers older than ``before`` and all but ``max_entries`` of the rest.
+
+    The most recently used answers are kept. Returns how many were removed.
+    """
+    with sqlite3.connect(DB_FILE) as conn:
+        removed = conn.execute("DELETE FROM answers WHERE created<?", (before,))
+        count = removed.rowcount
+        removed = conn.execute(
+            "DELETE FROM answers WHERE rowid IN "
+            "(SELECT rowid FROM answers ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (max_entries,),
+        )
+        return count + removed.rowcount
+
+
+def count_answers() -> int:
+    with sqlite3.connect(DB_FILE) as conn:
+        return conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
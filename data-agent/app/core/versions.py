@@ -0,0 +1,136 @@
+"""Immutable dataset versions produced by column transforms.
+
+A transform never touches the frame or files of the dataset it starts
+from. It registers a new dataset id whose Arrow file holds only the
+columns it changed; every other column is shared with the parent, both in
+memory (shallow frame copies) and on disk (read from the parent's file).
+Because each version has its own id and content hash, caches keyed on
+either can never serve data from another version.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from .analysis import apply_coercions
+from .columnar import (
+    dataset_layers,
+    load_sample,
+    sample_path_for,
+    write_columnar,
+    write_version,
+)
+from .profile import build_profile
+from .stats import DatasetStats
+from .storage import (
+    add_version,
+    find_version,
+    get_content_hash,
+    get_dataset_path,
+    get_dataset_sheet,
+    get_profile,
+    get_stats,
+    save_profile,
+    save_stats,
+)
+
+# Profile entries holding one value per column.
+_PER_COLUMN_KEYS = (
+    "dtypes",
+    "null_counts",
+    "missing_pct",
+    "outlier_counts",
+    "numeric_stats",
+    "top_categories",
+)
+
+
+def version_hash(parent_hash: str, transforms: List[Dict[str, Any]]) -> str:
+    payload = json.dumps(transforms, sort_keys=True)
+    return hashlib.sha256(f"{parent_hash}:{payload}".encode()).hexdigest()
+
+
+def replace_profile_columns(
+    profile: Dict[str, Any], partial: Dict[str, Any], columns: List[str]
+) -> Dict[str, Any]:
+    """Return ``profile`` with the columns profiled in ``partial`` replaced."""
+    changed = set(partial["columns"])
+    out: Dict[str, Any] = {"rows": profile["rows"], "columns": columns}
+    for key in _PER_COLUMN_KEYS:
+        merged = {k: v for k, v in profile[key].items() if k not in changed}
+        merged.update(partial[key])
+        out[key] = {c: merged[c] for c in columns if c in merged}
+    return out
+
+
+def _replace_stats_columns(
+    data: Dict[str, Any], df: pd.DataFrame, changed: List[str]
+) -> DatasetStats:
+    stats = DatasetStats.from_dict(data)
+    fresh = DatasetStats.from_chunks([df[changed]])
+    stats.columns = {
+        str(c): fresh.columns.get(str(c)) or stats.columns[str(c)] for c in df.columns
+    }
+    return stats
+
+
+def create_version(
+    ds_id: str,
+    coercions: List[Dict[str, Any]],
+    loader: Callable[[str], pd.DataFrame],
+) -> Tuple[str, pd.DataFrame | None, List[str]]:
+    """Apply ``coercions`` to ``ds_id`` and register the result as a new version.
+
+    Returns the version id, its frame and the changed columns. Repeating a
+    transform returns the existing version and ``None`` for the frame.
+
+    Raises:
+        KeyError: if ``ds_id`` or a coerced column does not exist.
+        ValueError: if a coercion kind is unknown.
+    """
+    parent_hash = get_content_hash(ds_id) or ds_id
+    content_hash = version_hash(parent_hash, coercions)
+    existing = find_version(ds_id, content_hash)
+    if existing is not None:
+        return existing, None, list(dict.fromkeys(c["column"] for c in coercions))
+
+    parent = loader(ds_id)
+    df, changed = apply_coercions(parent, coercions)
+    tag = content_hash[:16]
+    path = write_version(ds_id, df, changed, tag)
+
+    sample_path = None
+    sample = load_sample(ds_id)
+    if sample is not None:
+        sample, _ = apply_coercions(sample, coercions)
+        sample_path = sample_path_for(
+            get_dataset_path(ds_id), get_dataset_sheet(ds_id), tag
+        )
+        write_columnar(sample, sample_path)
+
+    # Only the changed columns are profiled again.
+    columns = [str(c) for c in df.columns]
+    parent_profile = get_profile(ds_id)
+    if parent_profile is not None:
+        partial = build_profile(df[changed])
+        profile = replace_profile_columns(parent_profile, partial, columns)
+    else:
+        profile = build_profile(df)
+    save_profile(content_hash, profile)
+    parent_stats = get_stats(ds_id)
+    if parent_stats is not None:
+        stats = _replace_stats_columns(parent_stats, df, changed)
+        save_stats(content_hash, stats.to_dict())
+
+    version_id = add_version(
+        ds_id,
+        str(path),
+        content_hash,
+        coercions,
+        str(sample_path) if sample_path is not None else None,
+        [str(p) for p in dataset_layers(ds_id)],
+    )
+    return version_id, df, changed
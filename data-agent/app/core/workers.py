@@ -0,0 +1,104 @@
+"""Bounded worker lanes that keep blocking endpoint work off the event loop."""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class LaneFull(RuntimeError):
+    """Raised when a lane already has ``max_queue`` jobs waiting."""
+
+
+class WorkerLane:
+    """A named thread pool with its own concurrency limit and queue metrics.
+
+    Each endpoint gets its own lane so a burst of slow charts cannot take
+    the threads that LLM or sandbox requests need, and vice versa.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"{name}-worker"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.peak_queued = 0
+        self.wait_seconds = 0.0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn`` on this lane and await its result.
+
+        Raises:
+            LaneFull: if the queue is at ``max_queue``.
+        """
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise LaneFull(self.name)
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        job = {"dequeued": False}
+        call = functools.partial(
+            self._call, job, time.perf_counter(), fn, args, kwargs
+        )
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+        finally:
+            # A request cancelled while its job waits cancels the job too, and
+            # then _call never runs to take it off the queue.
+            self._dequeue(job)
+
+    def _dequeue(self, job: Dict[str, bool]) -> None:
+        with self._lock:
+            if not job["dequeued"]:
+                job["dequeued"] = True
+                self.queued -= 1
+
+    def _call(
+        self, job: Dict[str, bool], submitted: float, fn: Callable[..., T], args, kwargs
+    ) -> T:
+        self._dequeue(job)
+        with self._lock:
+            self.running += 1
+            self.wait_seconds += time.perf_counter() - submitted
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.running
+            avg_wait = self.wait_seconds / started if started else 0.0
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "peak_queued": self.peak_queued,
+                "avg_wait_ms": round(1000 * avg_wait, 3),
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
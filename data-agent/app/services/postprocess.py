@@ -5,19 +5,25 @@ from io import BytesIO
 from typing import Any, Dict, List, Tuple
 
 import pandas as pd
-import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 
+from app.core.figures import figure_png
+
 
 def figure_to_png(fig: Figure) -> BytesIO:
     """
-    Convert a matplotlib Figure to a PNG buffer, close the figure to free memory.
+    Convert a matplotlib Figure to a PNG buffer.
+
+    Figures made through pyplot (e.g. by generated code) are registered in
+    its global state and are closed here to free memory; others need nothing.
     """
-    buf = BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight")
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+    try:
+        return figure_png(fig)
+    finally:
+        if fig.canvas.manager is not None:
+            import matplotlib.pyplot as plt
+
+            plt.close(fig)
 
 
 def extract_outputs(locals_out: Dict[str, Any]) -> Tuple[
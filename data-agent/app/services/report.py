@@ -18,8 +18,16 @@ def create_pdf_report(
     df: pd.DataFrame,
     title: str = "Data Report",
     logo_path: Optional[str] = None,
+    summary: Optional[dict] = None,
+    insights: Optional[dict] = None,
+    sample_rows: Optional[int] = None,
 ) -> BytesIO:
-    """Return a PDF report containing summary, insights and a sample chart."""
+    """Return a PDF report containing summary, insights and a sample chart.
+
+    Precomputed ``summary``/``insights`` (e.g. from the stored dataset
+    profile) are used as is instead of being recomputed from ``df``.
+    ``sample_rows`` marks ``df`` as a row sample and is noted under the chart.
+    """
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=letter)
     width, height = letter
@@ -42,7 +50,8 @@ def create_pdf_report(
     c.setFont("Helvetica", 12)
     c.drawString(40, y, "Summary:")
     y -= 20
-    summary = basic_summary(df)
+    if summary is None:
+        summary = basic_summary(df)
     for k, v in summary.items():
         c.drawString(60, y, f"{k}: {v}")
         y -= 15
@@ -50,7 +59,8 @@ def create_pdf_report(
     y -= 10
     c.drawString(40, y, "Insights:")
     y -= 20
-    insights = basic_insights(df)
+    if insights is None:
+        insights = basic_insights(df)
     for k, v in insights.items():
         c.drawString(60, y, f"{k}: {v}")
         y -= 15
@@ -71,6 +81,10 @@ def create_pdf_report(
             height=ih * scale,
         )
         y -= ih * scale + 20
+        if sample_rows is not None:
+            c.setFont("Helvetica-Oblique", 9)
+            c.drawString(40, y, f"Chart based on a sample of {sample_rows} rows.")
+            y -= 15
 
     c.showPage()
     c.save()
@@ -81,6 +95,9 @@ def create_pdf_report(
 def create_pptx_report(
     df: pd.DataFrame,
     title: str = "Data Report",
+    summary: Optional[dict] = None,
+    insights: Optional[dict] = None,
+    sample_rows: Optional[int] = None,
 ) -> BytesIO:
     """Return a PPTX report containing summary, insights and a sample chart."""
     prs = Presentation()
@@ -91,14 +108,16 @@ def create_pptx_report(
     bullet = prs.slides.add_slide(prs.slide_layouts[1])
     bullet.shapes.title.text = "Summary"
     tf = bullet.shapes.placeholders[1].text_frame
-    summary = basic_summary(df)
+    if summary is None:
+        summary = basic_summary(df)
     for k, v in summary.items():
         p = tf.add_paragraph()
         p.text = f"{k}: {v}"
 
     p = tf.add_paragraph()
     p.text = "Insights:"
-    insights = basic_insights(df)
+    if insights is None:
+        insights = basic_insights(df)
     for k, v in insights.items():
         item = tf.add_paragraph()
         item.text = f"{k}: {v}"
@@ -109,6 +128,11 @@ def create_pptx_report(
         chart = prs.slides.add_slide(prs.slide_layouts[5])
         chart.shapes.title.text = f"{num_cols[0]} Distribution"
         chart.shapes.add_picture(png, Inches(1), Inches(2), width=Inches(8))
+        if sample_rows is not None:
+            note = chart.shapes.add_textbox(
+                Inches(1), Inches(6.8), Inches(8), Inches(0.4)
+            )
+            note.text_frame.text = f"Based on a sample of {sample_rows} rows."
 
     buf = BytesIO()
     prs.save(buf)
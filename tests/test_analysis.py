@@ -1,3 +1,5 @@
+import numpy as np
+import pytest
 import pandas as pd
 from app.core.analysis import basic_summary, coerce_column, detect_outliers, basic_insights
 
@@ -27,3 +29,65 @@ def test_basic_insights():
     ins = basic_insights(df)
     assert round(ins["missing_pct"]["a"], 2) == 25.0
     assert ins["outlier_counts"]["a"] == 1
+
+
+def test_numeric_column_stats_matches_per_column_loop():
+    import numpy as np
+    from app.core.analysis import numeric_column_stats
+
+    rng = np.random.default_rng(1)
+    data = rng.standard_normal((200, 5))
+    data[rng.random((200, 5)) < 0.1] = np.nan
+    data[::37, 2] = 50.0
+    df = pd.DataFrame(data, columns=list("abcde"))
+    df["label"] = "x"
+    for method, threshold in (("iqr", 3.0), ("zscore", 2.0)):
+        stats = numeric_column_stats(df, method=method, threshold=threshold)
+        assert list(stats.index) == list("abcde")
+        for col in "abcde":
+            s = df[col].dropna()
+            expected = detect_outliers(s, method=method, threshold=threshold).sum()
+            assert stats.loc[col, "outliers"] == expected
+            assert stats.loc[col, "q1"] == pytest.approx(s.quantile(0.25))
+            assert stats.loc[col, "median"] == pytest.approx(s.median())
+            assert stats.loc[col, "std"] == pytest.approx(s.std())
+            assert stats.loc[col, "max"] == s.max()
+
+
+def test_numeric_column_stats_empty_frame():
+    from app.core.analysis import numeric_column_stats
+
+    stats = numeric_column_stats(pd.DataFrame({"a": [1.0, None]}).iloc[:0])
+    assert stats.loc["a", "count"] == 0
+    assert stats.loc["a", "outliers"] == 0
+    assert pd.isna(stats.loc["a", "median"])
+
+
+def test_missing_density_bins_rows():
+    from app.core.analysis import missing_density
+
+    df = pd.DataFrame({"a": [1, None, 3, None, 5], "b": ["x", "y", "z", None, None]})
+    out = missing_density(df, bins=2)
+    assert out["row_starts"] == [0, 2]
+    assert out["density"][0] == [0.5, 0.0]
+    assert out["density"][1] == pytest.approx([1 / 3, 2 / 3], abs=1e-4)
+    assert len(missing_density(df, bins=50)["density"]) == 5
+
+
+def test_coerce_column_leaves_input_untouched():
+    df = pd.DataFrame({"a": ["1", "x"], "b": [1.5, 2.5]})
+    out = coerce_column(df, "a", "float")
+    assert df["a"].tolist() == ["1", "x"]
+    assert out["a"].isna().tolist() == [False, True]
+    assert np.shares_memory(out["b"].to_numpy(), df["b"].to_numpy())
+
+
+def test_parse_datetimes_infers_format_and_falls_back():
+    from app.core.analysis import parse_datetimes
+
+    s = pd.Series(["2024-01-05", "2024-01-06", None, "2024-01-05", "Jan 7 2024", "x"])
+    out = parse_datetimes(s)
+    assert out.dt.day.tolist()[:2] == [5, 6]
+    assert out.iloc[3] == out.iloc[0]
+    assert out.iloc[4] == pd.Timestamp("2024-01-07")
+    assert out.isna().tolist() == [False, False, True, False, False, True]
@@ -0,0 +1,61 @@
+import time
+import uuid
+
+import pytest
+
+from app.core import answer_cache, storage
+from app.core.answer_cache import normalize_question, similarity_scores
+from app.core.config import settings
+
+
+@pytest.fixture()
+def sig():
+    storage.init_db()
+    return f"ds-{uuid.uuid4()}|a:int64"
+
+
+def test_normalize_question_ignores_case_and_punctuation():
+    assert normalize_question("Total  Sales by Region?") == "total sales by region"
+    assert normalize_question("total sales by region") == "total sales by region"
+    assert normalize_question("rows where x > 1.5") != normalize_question(
+        "rows where x > 15"
+    )
+
+
+def test_similarity_prefers_the_rephrased_question():
+    scores = similarity_scores(
+        "total sales per region",
+        ["total sales by region", "histogram of unit price"],
+    )
+    assert scores[0] > 0.5 > scores[1]
+    assert similarity_scores("abc", ["abc"])[0] == pytest.approx(1.0)
+
+
+def test_answers_persist_by_normalised_question(sig):
+    assert answer_cache.lookup("Total sales by region", sig) is None
+    answer_cache.store("Total sales by region", sig, "sum", "r = 1")
+    assert answer_cache.lookup("total sales by REGION?", sig) == ("sum", "r = 1")
+    assert answer_cache.lookup("total sales by region", sig + "x") is None
+
+
+def test_similarity_lookup_respects_threshold_and_numbers(sig, monkeypatch):
+    answer_cache.store("top 5 regions by total sales", sig, "top", "r = 5")
+    assert answer_cache.lookup("top 5 regions by sales total", sig) is None
+    monkeypatch.setattr(settings, "answer_similarity", 0.6)
+    assert answer_cache.lookup("top 5 regions by sales total", sig) == ("top", "r = 5")
+    assert answer_cache.lookup("top 10 regions by total sales", sig) is None
+    assert answer_cache.lookup("histogram of unit price", sig) is None
+
+
+def test_old_and_surplus_answers_are_evicted(sig, monkeypatch):
+    answer_cache.store("old question", sig, "", "a = 1")
+    monkeypatch.setattr(settings, "answer_cache_max_age", 0.0)
+    time.sleep(0.01)
+    assert answer_cache.lookup("old question", sig) is None
+    monkeypatch.setattr(settings, "answer_cache_max_age", 3600.0)
+    storage.evict_answers(0, time.time())
+    for i in range(3):
+        answer_cache.store(f"question {i}", sig, "", f"a = {i}")
+    assert storage.evict_answers(2, 0.0) == 1
+    assert answer_cache.lookup("question 0", sig) is None
+    assert answer_cache.lookup("question 2", sig) == ("", "a = 2")
@@ -16,6 +16,510 @@ def test_upload_and_summary(monkeypatch, tmp_path):
     assert data["columns"] == ["a", "b"]
 
 
+def test_duplicate_upload_reuses_parsed_dataset():
+    from pathlib import Path
+
+    from app.core.config import settings
+    from app.core.storage import get_dataset_path
+
+    csv = b"a,b\n5,6\n7,8\n9,10\n"
+    first = client.post("/upload", files={"file": ("d1.csv", csv, "text/csv")}).json()
+    n_files = len(list(Path(settings.data_dir).iterdir()))
+    second = client.post("/upload", files={"file": ("d2.csv", csv, "text/csv")}).json()
+    assert second["dataset_id"] != first["dataset_id"]
+    assert second["rows"] == 3
+    assert len(list(Path(settings.data_dir).iterdir())) == n_files
+    first_path = get_dataset_path(first["dataset_id"])
+    assert get_dataset_path(second["dataset_id"]) == first_path
+    assert client.get(f"/summary/{second['dataset_id']}").json()["rows"] == 3
+
+
+def test_summary_served_from_stored_profile():
+    from app.api import DATASETS
+
+    csv = b"a,b\n1,x\n2,y\n3,\n"
+    ds_id = client.post("/upload", files={"file": ("p.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    DATASETS.invalidate(ds_id)
+    misses = DATASETS.stats()["misses"]
+    assert client.get(f"/summary/{ds_id}").json()["null_counts"] == {"a": 0, "b": 1}
+    assert client.get(f"/insights/{ds_id}").status_code == 200
+    assert DATASETS.stats()["misses"] == misses
+
+
+def test_large_csv_is_profiled_out_of_core(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "chunked_profile_bytes", 0)
+    monkeypatch.setattr(settings, "profile_chunk_rows", 2)
+    csv = b"a,b\n1,q\n2,r\n3,\n40,q\n"
+    ds_id = client.post("/upload", files={"file": ("big.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    data = client.get(f"/summary/{ds_id}").json()
+    assert data["rows"] == 4
+    assert data["null_counts"] == {"a": 0, "b": 1}
+
+
+def test_append_to_out_of_core_csv_streams_old_rows(monkeypatch):
+    from app.core import columnar
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "chunked_profile_bytes", 0)
+    csv = b"a,b\n1,q\n2,r\n3,s\n"
+    ds_id = client.post("/upload", files={"file": ("big.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+
+    def parse_whole(*args, **kwargs):
+        raise AssertionError("the stored CSV was parsed in memory")
+
+    monkeypatch.setattr(columnar, "load_any", parse_whole)
+    delta = b"a,b\n4,t\n5,u\n"
+    resp = client.post(
+        f"/append/{ds_id}", files={"file": ("d.csv", delta, "text/csv")}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["rows"] == 5
+    assert columnar.load_dataset(ds_id)["a"].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_chart_and_nl2code_can_use_sample(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "sample_rows", 5)
+    rows = "".join(f"{i},{'ab'[i % 2]}\n" for i in range(40))
+    csv = ("x,g\n" + rows).encode()
+    resp = client.post(
+        "/upload?sample_by=g", files={"file": ("s.csv", csv, "text/csv")}
+    )
+    ds_id = resp.json()["dataset_id"]
+    resp = client.post(
+        f"/chart/{ds_id}",
+        json={"type": "hist", "params": {"cols": ["x"]}, "sample": True},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["x-sampled"] == "true"
+    spec = {"type": "hist", "params": {"cols": ["x"]}}
+    resp = client.post(f"/chart/{ds_id}", json=spec)
+    assert resp.headers["x-sampled"] == "false"
+    resp = client.get(f"/report/{ds_id}?format=pdf&sample=true")
+    assert resp.headers["x-sampled"] == "true"
+
+
+def test_nl2code_stream_sends_intent_before_code(monkeypatch):
+    import json
+    import uuid
+
+    from app.core import llm_driver
+    from app.core.llm_client import ClientBusy
+
+    answer = json.dumps({"intent": "peek", "code": "result_df = df.head()"})
+    pieces = [answer[i : i + 7] for i in range(0, len(answer), 7)]
+
+    def fake_stream(model, prompt, options=None, timings=None, wait=True):
+        yield from pieces
+
+    monkeypatch.setattr(llm_driver, "check_model_ready", lambda: (True, "OK", "m"))
+    monkeypatch.setattr(llm_driver.CLIENT, "stream", fake_stream)
+    csv = b"a,b\n1,2\n3,4\n"
+    ds_id = client.post("/upload", files={"file": ("q.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    # The answer cache persists across runs; a fresh question starts cold.
+    question = {"question": f"first rows streamed {uuid.uuid4()}"}
+    resp = client.post(f"/nl2code/{ds_id}/stream", json=question)
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: ") :], json.loads(block.split("data: ")[1]))
+        for block in resp.text.strip().split("\n\n")
+    ]
+    names = [name for name, _ in events]
+    assert names.index("intent") < names.index("code") < names.index("done")
+    code = "".join(d["delta"] for n, d in events if n == "code")
+    assert code == "result_df = df.head()"
+    done = events[-1][1]
+    assert done["intent"] == "peek" and done["error"] is None
+    assert done["cached"] is False and done["sampled"] is False
+
+    again = client.post(f"/nl2code/{ds_id}/stream", json=question)
+    assert '"cached": true' in again.text
+    assert client.post("/nl2code/nope/stream", json=question).status_code == 404
+
+    def busy_stream(model, prompt, options=None, timings=None, wait=True):
+        assert wait is False
+        raise ClientBusy("every LLM slot is in use")
+        yield
+
+    monkeypatch.setattr(llm_driver.CLIENT, "stream", busy_stream)
+    busy = {"question": f"another question {uuid.uuid4()}"}
+    assert client.post(f"/nl2code/{ds_id}/stream", json=busy).status_code == 503
+
+
+def test_chart_render_cache_and_etag(monkeypatch):
+    import pytest
+
+    import app.api as api
+
+    csv = b"x,y\n1,2\n2,4\n3,9\n"
+    ds_id = client.post("/upload", files={"file": ("e.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    spec = {"type": "line", "params": {"x": "x", "y": "y"}}
+    first = client.post(f"/chart/{ds_id}", json=spec)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    def no_render(*args):
+        raise AssertionError("chart re-rendered")
+
+    monkeypatch.setattr(api, "_chart", no_render)
+    reordered = {"type": "line", "params": {"y": "y", "x": "x", "log_y": None}}
+    again = client.post(f"/chart/{ds_id}", json=reordered)
+    assert again.content == first.content
+    assert again.headers["etag"] == etag
+    cond = client.post(f"/chart/{ds_id}", json=spec, headers={"If-None-Match": etag})
+    assert cond.status_code == 304
+    assert not cond.content
+
+    other = {"type": "line", "params": {"x": "y", "y": "x"}}
+    with pytest.raises(AssertionError):
+        client.post(f"/chart/{ds_id}", json=other, headers={"If-None-Match": etag})
+
+
+def test_chart_vega_format_returns_data_and_spec():
+    csv = b"g,v\na,1\nb,2\na,3\n"
+    ds_id = client.post("/upload", files={"file": ("v.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    spec = {"type": "bar", "params": {"x": "g", "y": "v"}, "format": "vega"}
+    resp = client.post(f"/chart/{ds_id}", json=spec)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    body = resp.json()
+    assert body["sampled"] is False
+    assert body["spec"]["mark"] == "bar"
+    values = {r["g"]: r["value"] for r in body["spec"]["data"]["values"]}
+    assert values == {"a": 4, "b": 2}
+    png = client.post(f"/chart/{ds_id}", json={**spec, "format": "png"})
+    assert png.headers["content-type"] == "image/png"
+    assert png.headers["etag"] != resp.headers["etag"]
+    bad = client.post(f"/chart/{ds_id}", json={**spec, "format": "svg"})
+    assert bad.status_code == 400
+
+
+def test_chart_batch_returns_zip_with_manifest():
+    import io
+    import json
+    import zipfile
+
+    csv = b"g,v,t\na,1,1\nb,2,2\na,3,3\n"
+    ds_id = client.post("/upload", files={"file": ("b.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    charts = [
+        {"type": "bar", "params": {"x": "g", "y": "v"}},
+        {"type": "bar", "params": {"x": "g", "y": "v", "agg": "sum"}, "format": "vega"},
+        {"type": "line", "params": {"x": "t", "y": "v"}},
+        {"type": "hist", "params": {"cols": ["nope"]}},
+        {"type": "pie"},
+        {"type": "bar", "params": {"x": "g", "y": "v", "agg": "nope"}},
+    ]
+    resp = client.post(f"/charts/{ds_id}", json={"charts": charts})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(resp.content))
+    manifest = json.loads(zf.read("manifest.json"))
+    items = manifest["charts"]
+    files = ["0.png", "1.json", "2.png", None, None, None]
+    assert [i.get("file") for i in items] == files
+    assert manifest["plan"] == {"computed": 1, "reused": 1}
+    assert zf.read("0.png").startswith(b"\x89PNG")
+    spec = json.loads(zf.read("1.json"))["spec"]
+    assert {r["g"]: r["value"] for r in spec["data"]["values"]} == {"a": 4, "b": 2}
+    assert items[3]["error"].startswith("KeyError")
+    assert items[4]["error"] == "unknown chart type"
+    assert items[5]["error"].startswith("AttributeError")
+
+    again = client.post(f"/charts/{ds_id}", json={"charts": charts[:1]})
+    zf = zipfile.ZipFile(io.BytesIO(again.content))
+    assert json.loads(zf.read("manifest.json"))["charts"][0]["cached"] is True
+    assert client.post("/charts/nope", json={"charts": charts}).status_code == 404
+    assert client.post(f"/charts/{ds_id}", json={"charts": []}).status_code == 400
+
+
+def test_missing_density_route_is_cached():
+    from app.api import DATASETS
+
+    rows = "".join(f"{i},{'' if i % 4 else 'x'}\n" for i in range(100))
+    csv = ("n,s\n" + rows).encode()
+    ds_id = client.post("/upload", files={"file": ("m.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    data = client.get(f"/missing/{ds_id}?format=json&bins=10").json()
+    assert data["columns"] == ["n", "s"]
+    assert len(data["density"]) == 10
+    assert data["density"][0] == [0.0, 0.7]
+    DATASETS.invalidate(ds_id)
+    assert client.get(f"/missing/{ds_id}?format=json&bins=10").json() == data
+    assert ds_id not in DATASETS
+    resp = client.get(f"/missing/{ds_id}")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/png"
+    assert client.get("/missing/nope?format=json").status_code == 404
+
+
+def test_append_extends_dataset_and_merges_stats(monkeypatch):
+    from app.core import stats as stats_module
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "sample_rows", 5)
+    csv = b"id,v,g\n1,1.5,a\n2,2.5,b\n3,,a\n"
+    files = {"file": ("base.csv", csv, "text/csv")}
+    ds_id = client.post("/upload", files=files).json()["dataset_id"]
+    client.get(f"/summary/{ds_id}")
+    delta = b"g,id,v\n" + b"".join(b"c,%d,%d\n" % (i, i) for i in range(4, 10))
+    resp = client.post(
+        f"/append/{ds_id}", files={"file": ("delta.csv", delta, "text/csv")}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["rows"] == 9
+
+    # The old rows are never rescanned: their statistics are merged from state.
+    def no_rescan(*args, **kwargs):
+        raise AssertionError("old rows rescanned")
+
+    monkeypatch.setattr(stats_module.DatasetStats, "from_chunks", no_rescan)
+    delta = b"id,v,g\n10,100,a\n"
+    resp = client.post(
+        f"/append/{ds_id}", files={"file": ("delta.csv", delta, "text/csv")}
+    )
+    assert resp.json()["rows"] == 10
+    summary = client.get(f"/summary/{ds_id}").json()
+    assert summary["rows"] == 10
+    assert summary["null_counts"]["v"] == 1
+    chart = client.post(
+        f"/chart/{ds_id}",
+        json={"type": "hist", "params": {"cols": ["v"]}, "sample": True},
+    )
+    assert chart.headers["x-sampled"] == "true"
+
+    bad = b"id,w\n1,2\n"
+    resp = client.post(f"/append/{ds_id}", files={"file": ("bad.csv", bad, "text/csv")})
+    assert resp.status_code == 400
+    assert "columns differ" in resp.json()["error"]
+    assert client.get(f"/summary/{ds_id}").json()["rows"] == 10
+    assert client.post(
+        "/append/nope", files={"file": ("d.csv", delta, "text/csv")}
+    ).status_code == 404
+
+
+def test_transform_creates_copy_on_write_version():
+    from app.core.columnar import columnar_schema
+    from app.core.storage import get_columnar_path
+
+    csv = b"id,when,amount\n1,2024-01-01,3\n2,2024-01-02,x\n3,2024-01-01,5\n"
+    ds_id = client.post("/upload", files={"file": ("v.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    body = {
+        "coercions": [
+            {"column": "when", "kind": "datetime"},
+            {"column": "amount", "kind": "float"},
+        ]
+    }
+    resp = client.post(f"/transform/{ds_id}", json=body)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["parent_id"] == ds_id
+    assert data["version"] == 1
+    assert data["changed"] == ["when", "amount"]
+    version_id = data["dataset_id"]
+
+    assert columnar_schema(get_columnar_path(version_id)).names == ["when", "amount"]
+    dtypes = client.get(f"/summary/{version_id}").json()["dtypes"]
+    assert dtypes["when"].startswith("datetime64")
+    assert dtypes["amount"] == "float64"
+    assert client.get(f"/summary/{version_id}").json()["columns"] == [
+        "id",
+        "when",
+        "amount",
+    ]
+    assert client.get(f"/insights/{version_id}").json()["missing_pct"]["amount"] > 0
+    assert client.get(f"/summary/{ds_id}").json()["dtypes"]["when"] != dtypes["when"]
+
+    from app.api import DATASETS
+    from app.core.columnar import load_dataset
+
+    DATASETS.invalidate(version_id)
+    df = load_dataset(version_id)
+    assert list(df.columns) == ["id", "when", "amount"]
+    assert df["id"].tolist() == [1, 2, 3]
+
+    again = client.post(f"/transform/{ds_id}", json=body).json()
+    assert again["dataset_id"] == version_id
+    lineage = client.get(f"/versions/{version_id}").json()["versions"]
+    assert [v["version"] for v in lineage] == [0, 1]
+    assert lineage[1]["transforms"][0] == {"column": "when", "kind": "datetime"}
+
+    bad = {"coercions": [{"column": "nope", "kind": "int"}]}
+    assert client.post(f"/transform/{ds_id}", json=bad).status_code == 400
+    bad = {"coercions": [{"column": "id", "kind": "bytes"}]}
+    assert client.post(f"/transform/{ds_id}", json=bad).status_code == 400
+
+
+def test_version_keeps_its_rows_after_parent_append():
+    from app.api import DATASETS
+    from app.core.columnar import dataset_table, load_dataset
+
+    csv = b"a,b\n1,10\n2,20\n3,30\n"
+    ds_id = client.post("/upload", files={"file": ("pa.csv", csv, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    body = {"coercions": [{"column": "b", "kind": "float"}]}
+    version_id = client.post(f"/transform/{ds_id}", json=body).json()["dataset_id"]
+    delta = b"a,b\n4,40\n5,50\n"
+    resp = client.post(
+        f"/append/{ds_id}", files={"file": ("d.csv", delta, "text/csv")}
+    )
+    assert resp.json()["rows"] == 5
+
+    DATASETS.invalidate(version_id)
+    df = load_dataset(version_id)
+    assert df["a"].tolist() == [1, 2, 3]
+    assert df["b"].tolist() == [10.0, 20.0, 30.0]
+    assert dataset_table(version_id).num_rows == 3
+    assert client.get(f"/summary/{version_id}").json()["rows"] == 3
+    assert len(load_dataset(ds_id)) == 5
+
+
+def test_join_keys_ranked_from_persisted_sketches(monkeypatch):
+    from app.api import DATASETS
+
+    left = b"cust,name\n" + b"".join(b"%d,n%d\n" % (i, i) for i in range(50))
+    right = b"cust,total\n" + b"".join(b"%d,%d\n" % (i % 10, i) for i in range(30))
+    lid = client.post("/upload", files={"file": ("l.csv", left, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    rid = client.post("/upload", files={"file": ("r.csv", right, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    first = client.get(f"/join_keys/{lid}/{rid}").json()["candidates"]
+    assert first[0]["left"] == "cust"
+    assert first[0]["containment_right"] == 1.0
+
+    def no_load(ds_id):
+        raise AssertionError("sketches rebuilt")
+
+    monkeypatch.setattr(DATASETS, "get", no_load)
+    assert client.get(f"/join_keys/{lid}/{rid}").json()["candidates"] == first
+    assert client.get(f"/join_keys/{lid}/nope").status_code == 404
+
+
+def test_join_creates_dataset(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "join_memory_budget", 128)
+    left = b"cust,name\n" + b"".join(b"%d,n%d\n" % (i, i) for i in range(40))
+    right = b"cust_id,total\n" + b"".join(b"%d,%d\n" % (i % 10, i) for i in range(30))
+    lid = client.post("/upload", files={"file": ("jl.csv", left, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    rid = client.post("/upload", files={"file": ("jr.csv", right, "text/csv")}).json()[
+        "dataset_id"
+    ]
+    resp = client.post("/join", json={"left_id": lid, "right_id": rid})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert (data["left_on"], data["right_on"]) == (["cust"], ["cust_id"])
+    assert data["rows"] == 30
+    assert data["partitions"] > 1
+    summary = client.get(f"/summary/{data['dataset_id']}").json()
+    assert summary["rows"] == 30
+    assert summary["columns"] == ["cust", "name", "cust_id", "total"]
+
+    again = client.post("/join", json={"left_id": lid, "right_id": rid}).json()
+    assert again["dataset_id"] == data["dataset_id"]
+    outer = {"left_id": lid, "right_id": rid, "how": "outer"}
+    outer.update(left_on=["cust"], right_on=["cust_id"])
+    assert client.post("/join", json=outer).json()["rows"] == 60
+    bad = {"left_id": lid, "right_id": rid, "on": ["nope"]}
+    assert client.post("/join", json=bad).status_code == 400
+    missing = {"left_id": lid, "right_id": "x"}
+    assert client.post("/join", json=missing).status_code == 404
+
+
+def test_compare_aligns_datasets_and_builds_missing_profiles():
+    from pathlib import Path
+
+    import pytest
+
+    from app.core.config import settings
+    from app.core.storage import add_dataset, get_profile
+
+    jan = b"sales,region\n1,a\n3,b\n,a\n"
+    feb = b"sales,units\n10,1\n20,2\n"
+    files = {"file": ("jan.csv", jan, "text/csv")}
+    jan_id = client.post("/upload", files=files).json()["dataset_id"]
+    files = {"file": ("feb.csv", feb, "text/csv")}
+    feb_id = client.post("/upload", files=files).json()["dataset_id"]
+    # Registered without a profile, so one has to be built in a worker.
+    raw = Path(settings.data_dir) / "mar.csv"
+    raw.write_text("sales\n5\n7\n9\n")
+    mar_id = add_dataset(str(raw.resolve()))
+
+    resp = client.post("/compare", json={"dataset_ids": [jan_id, feb_id, mar_id]})
+    assert resp.status_code == 200
+    table = resp.json()["table"]
+    assert list(table) == ["sales", "region", "units"]
+    assert table["sales"]["mean"] == [2.0, 15.0, 7.0]
+    assert table["sales"]["null_rate"] == [pytest.approx(1 / 3), 0.0, 0.0]
+    assert table["region"]["count"] == [3, None, None]
+    assert table["units"]["median"] == [None, 1.5, None]
+    assert get_profile(mar_id)["rows"] == 3
+
+    only = {"dataset_ids": [jan_id, feb_id], "columns": ["units"]}
+    assert list(client.post("/compare", json=only).json()["table"]) == ["units"]
+    assert client.post("/compare", json={"dataset_ids": [jan_id]}).status_code == 400
+    missing = {"dataset_ids": [jan_id, "nope"]}
+    assert client.post("/compare", json=missing).status_code == 404
+
+
+def test_upload_too_large(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "max_file_size", 4)
+    big = {"file": ("big.csv", b"a,b\n1,2\n", "text/csv")}
+    resp = client.post("/upload", files=big)
+    assert resp.status_code == 400
+
+
+def test_workbook_sheets_are_separate_datasets(tmp_path):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.active.title = "orders"
+    wb.active.append(["id", "qty"])
+    wb.active.append([1, 5])
+    ws = wb.create_sheet("regions")
+    ws.append(["region"])
+    ws.append(["north"])
+    ws.append(["south"])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+
+    resp = client.post("/upload", files={"file": ("book.xlsx", path.read_bytes())})
+    data = resp.json()
+    assert data["rows"] == 1
+    assert set(data["sheets"]) == {"orders", "regions"}
+    listing = client.get(f"/sheets/{data['dataset_id']}").json()["sheets"]
+    assert [s["loaded"] for s in listing] == [True, False]
+    regions = client.get(f"/summary/{data['sheets']['regions']}").json()
+    assert regions["rows"] == 2
+    assert regions["columns"] == ["region"]
+
+
 def test_run_code_route(monkeypatch, tmp_path):
     monkeypatch.setenv("DATA_DIR", str(tmp_path))
     csv = b"a,b\n1,2\n3,4\n"
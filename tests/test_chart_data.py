@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.chart_data import (
+    FLIER_LIMIT,
+    VEGA_LITE_SCHEMA,
+    box_table,
+    chart_data,
+    hist_table,
+)
+
+
+def _frame(n=1_000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "x": np.arange(n),
+            "y": rng.normal(size=n),
+            "z": rng.normal(1, 2, size=n),
+            "g": rng.choice(["a", "b", "c"], size=n),
+        }
+    )
+
+
+def test_hist_table_matches_numpy_over_shared_edges():
+    df = _frame()
+    edges, counts = hist_table(df, ["y", "z"], bins=20)
+    lo, hi = min(df.y.min(), df.z.min()), max(df.y.max(), df.z.max())
+    assert edges[0] == lo and edges[-1] == hi
+    np.testing.assert_array_equal(counts["z"], np.histogram(df.z, edges)[0])
+    assert counts["y"].sum() == len(df)
+
+
+def test_box_table_five_numbers_and_capped_fliers():
+    df = pd.DataFrame({"v": np.r_[np.arange(100.0), np.arange(1_000.0, 1_300.0)]})
+    (box,) = box_table(df, ["v"])
+    assert box["med"] == df.v.median()
+    assert box["q1"] == df.v.quantile(0.25)
+    assert len(box["fliers"]) <= FLIER_LIMIT
+    grouped = box_table(_frame(), ["y", "z"], by="g")
+    assert {(b["column"], b["group"]) for b in grouped} == {
+        (c, g) for c in "yz" for g in "abc"
+    }
+
+
+def test_bar_and_facet_specs_carry_aggregates():
+    df = _frame()
+    spec = chart_data("bar", df, {"x": "g", "y": "y", "agg": "mean"})
+    assert spec["$schema"] == VEGA_LITE_SCHEMA
+    got = {r["g"]: r["value"] for r in spec["data"]["values"]}
+    assert got == pytest.approx(df.groupby("g").y.mean().to_dict())
+
+    hue = chart_data("bar", df.assign(h=df.x % 2), {"x": "g", "y": None, "hue": "h"})
+    assert sum(r["value"] for r in hue["data"]["values"]) == len(df)
+    assert "xOffset" in hue["encoding"]
+
+    facet = chart_data(
+        "facet_bar",
+        df.assign(k=df.x % 3),
+        {"x": "k", "y": "z", "facet_by": "g", "order": "value"},
+    )
+    assert facet["facet"]["sort"] == ["a", "b", "c"]
+    json.dumps(facet)
+
+
+def test_line_and_scatter_are_decimated():
+    df = _frame(50_000)
+    line = chart_data("line", df, {"x": "x", "y": "y", "max_points": 500})
+    assert len(line["data"]["values"]) == 500
+    dense = chart_data("scatter", df, {"x": "y", "y": "z", "max_points": 1_000})
+    assert dense["mark"] == "rect"
+    assert sum(r["count"] for r in dense["data"]["values"]) == len(df)
+    small = chart_data("scatter", df.head(10), {"x": "y", "y": "z", "hue": "g"})
+    assert small["mark"] == "point" and len(small["data"]["values"]) == 10
+
+
+def test_density_skips_infinite_values():
+    df = _frame(5_000)
+    df.loc[0, "y"] = np.inf
+    df.loc[1, "z"] = -np.inf
+    dense = chart_data("scatter", df, {"x": "y", "y": "z", "max_points": 1_000})
+    assert sum(r["count"] for r in dense["data"]["values"]) == len(df) - 2
+    json.dumps(dense)
+
+
+def test_every_chart_type_serialises():
+    df = _frame()
+    for chart_type, params in {
+        "hist": {"cols": ["y", "z"], "log_y": True},
+        "box": {"cols": ["y"], "by": "g"},
+        "facet_line": {"x": "x", "y": "y", "facet_by": "g"},
+        "facet_hist": {"col": "y", "facet_by": "g", "limit": 2},
+    }.items():
+        spec = json.loads(json.dumps(chart_data(chart_type, df, params)))
+        assert spec["data"]["values"]
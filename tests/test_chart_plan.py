@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.chart_data import bar_data, facet_hist_data
+from app.core.chart_plan import ChartPlan, bind_params, draw_table, plan_chart
+from app.core.charts import render_chart
+
+
+def _frame():
+    rng = np.random.default_rng(1)
+    return pd.DataFrame(
+        {
+            "x": np.arange(300),
+            "y": rng.normal(size=300),
+            "g": ["a", "b", "c"] * 100,
+            "k": ["p", "q"] * 150,
+        }
+    )
+
+
+def test_defaults_are_bound_so_equal_specs_share_a_table():
+    plan = ChartPlan(_frame())
+    first = plan_chart(plan, "bar", {"x": "g", "y": "y"}, "png")
+    again = plan_chart(plan, "bar", {"x": "g", "y": "y", "agg": "sum"}, "vega")
+    assert plan.stats() == {"computed": 1, "reused": 1}
+    assert first[0] == "table" and again[0] == "spec"
+    assert again[1] == bar_data(_frame(), "g", "y")
+
+
+def test_facets_share_one_partition():
+    df = _frame()
+    plan = ChartPlan(df)
+    plan_chart(plan, "facet_bar", {"x": "k", "y": None, "facet_by": "g"}, "png")
+    plan_chart(plan, "facet_bar", {"x": "k", "y": "y", "facet_by": "g"}, "png")
+    kind, spec = plan_chart(plan, "facet_hist", {"col": "y", "facet_by": "g"}, "vega")
+    # one partition of "g", two facet tables, one histogram per level
+    assert plan.computed == 1 + 2 + 3
+    assert plan.reused == 2
+    assert spec == facet_hist_data(df, "y", "g")
+
+
+def test_drawn_tables_match_the_direct_renderer():
+    df = _frame()
+    plan = ChartPlan(df)
+    params = {"cols": ["y"], "bins": 20}
+    kind, (table, args) = plan_chart(plan, "hist", params, "png")
+    assert kind == "table"
+    assert draw_table("hist", table, args).startswith(b"\x89PNG")
+    assert plan_chart(plan, "line", {"x": "x", "y": "y"}, "png") == ("raw", None)
+    assert len(render_chart("hist", df, params)) > 0
+
+
+def test_bad_params_are_rejected():
+    with pytest.raises(TypeError):
+        bind_params("bar", {"x": "g", "colour": "red"})
+    with pytest.raises(KeyError):
+        bind_params("pie", {})
@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import pytest
+
+from app.core.columnar import (
+    SchemaMismatch,
+    append_columnar,
+    columnar_path_for,
+    load_dataset,
+    read_columnar,
+    write_columnar,
+)
+from app.core.optimize import optimize_dtypes
+from app.core.storage import add_dataset, get_columnar_path, init_db
+
+
+def test_columnar_roundtrip(tmp_path):
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", None]})
+    path = write_columnar(df, tmp_path / "t.csv.arrow")
+    out = read_columnar(path)
+    pd.testing.assert_frame_equal(out, df)
+    assert list(read_columnar(path, ["b"]).columns) == ["b"]
+
+
+def test_concurrent_writes_of_one_file_do_not_collide(tmp_path):
+    df = pd.DataFrame({"a": range(50_000)})
+    path = tmp_path / "t.csv.arrow"
+    with ThreadPoolExecutor(8) as pool:
+        paths = list(pool.map(lambda _: write_columnar(df, path), range(16)))
+    assert paths == [path] * 16
+    assert read_columnar(path)["a"].tolist() == list(range(50_000))
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+
+def test_sheet_paths_do_not_collide(tmp_path):
+    raw = tmp_path / "book.xlsx"
+    paths = {columnar_path_for(raw, sheet) for sheet in ("a b", "a_b", "a/b", "a")}
+    assert len(paths) == 4
+    assert columnar_path_for(raw, "a b") == columnar_path_for(raw, "a b")
+    assert columnar_path_for(raw, "a b").name.startswith("book.xlsx.a_b-")
+
+
+def test_load_dataset_converts_on_first_load(tmp_path):
+    init_db()
+    raw = tmp_path / "legacy.csv"
+    raw.write_text("a,b\n1,2\n3,4\n")
+    ds_id = add_dataset(str(raw))
+    df = load_dataset(ds_id)
+    assert len(df) == 2
+    assert get_columnar_path(ds_id) == columnar_path_for(raw)
+    assert list(load_dataset(ds_id, columns=["b", "missing"]).columns) == ["b"]
+
+
+def test_append_columnar_widens_and_keeps_stored_file(tmp_path):
+    init_db()
+    raw = tmp_path / "base.csv"
+    raw.write_text("n,g\n1,a\n2,b\n")
+    ds_id = add_dataset(str(raw))
+    df, _ = optimize_dtypes(load_dataset(ds_id), category_max_ratio=1.0)
+    write_columnar(df, columnar_path_for(raw))
+    assert str(df["n"].dtype) == "int32"
+
+    delta = pd.DataFrame({"g": ["c", "a"], "n": [2**40, 3]})
+    path, appended = append_columnar(ds_id, delta, "v2")
+    assert path == columnar_path_for(raw, tag="v2")
+    assert columnar_path_for(raw).exists()
+    out = read_columnar(path)
+    assert out["n"].tolist() == [1, 2, 2**40, 3]
+    assert str(out["n"].dtype) == "int64"
+    assert out["g"].astype(str).tolist() == ["a", "b", "c", "a"]
+    assert appended["n"].tolist() == [2**40, 3]
+
+    with pytest.raises(SchemaMismatch):
+        append_columnar(ds_id, pd.DataFrame({"n": [1]}), "v3")
+    with pytest.raises(SchemaMismatch):
+        append_columnar(ds_id, pd.DataFrame({"n": ["x"], "g": ["a"]}), "v3")
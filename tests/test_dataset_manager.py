@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from app.core import dataset_manager
+from app.core.dataset_manager import DatasetManager, frame_nbytes
+
+
+def test_lru_eviction_respects_budget():
+    frames = {k: pd.DataFrame({"a": range(100)}) for k in "abc"}
+    size = frame_nbytes(frames["a"])
+    mgr = DatasetManager(frames.__getitem__, max_bytes=2 * size)
+    mgr.get("a")
+    mgr.get("b")
+    mgr.get("a")
+    mgr.get("c")
+    assert "b" not in mgr
+    assert "a" in mgr and "c" in mgr
+    stats = mgr.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1
+    assert stats["bytes"] <= 2 * size
+
+
+def test_concurrent_loads_are_merged():
+    calls = []
+
+    def loader(ds_id):
+        calls.append(ds_id)
+        time.sleep(0.1)
+        return pd.DataFrame({"a": [1]})
+
+    mgr = DatasetManager(loader, max_bytes=10**6)
+    threads = [threading.Thread(target=mgr.get, args=("x",)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == ["x"]
+    assert mgr.stats()["coalesced"] == 4
+
+
+def test_failed_put_does_not_block_later_loads(monkeypatch):
+    calls = []
+
+    def loader(ds_id):
+        calls.append(ds_id)
+        return pd.DataFrame({"a": [1]})
+
+    def broken(df):
+        raise MemoryError("sizing failed")
+
+    mgr = DatasetManager(loader, max_bytes=10**6)
+    monkeypatch.setattr(dataset_manager, "frame_nbytes", broken)
+    with pytest.raises(MemoryError):
+        mgr.get("x")
+    monkeypatch.setattr(dataset_manager, "frame_nbytes", frame_nbytes)
+    # Run in a daemon thread: before the fix this get waited forever.
+    worker = threading.Thread(target=mgr.get, args=("x",), daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert calls == ["x", "x"]
+    assert "x" in mgr
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.charts import line_plot, scatter_plot
+from app.core.decimate import decimate_line, lttb, minmax
+
+
+def test_lttb_keeps_endpoints_and_spike():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500)
+    y[4_321] = 50.0
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == 9_999
+    assert np.all(np.diff(keep) > 0)
+    assert 4_321 in keep
+
+
+def test_minmax_keeps_bucket_extremes():
+    y = np.random.default_rng(0).normal(size=10_001)
+    keep = minmax(y, 100)
+    assert len(keep) <= 102
+    assert y.argmax() in keep and y.argmin() in keep
+    assert keep[0] == 0 and keep[-1] == 10_000
+
+
+def test_decimate_line_short_frames_untouched():
+    df = pd.DataFrame({"x": [1, 2, 3], "y": [3.0, None, 1.0]})
+    assert decimate_line(df, "x", "y", 10) is df
+    long = pd.DataFrame({"x": pd.date_range("2020", periods=5_000, freq="h")})
+    long["y"] = np.arange(5_000) % 17
+    out = decimate_line(long, "x", "y", 500, "minmax")
+    assert len(out) <= 502
+    with pytest.raises(ValueError):
+        decimate_line(long, "x", "y", 500, "bogus")
+
+
+def test_large_charts_render_summaries():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"x": rng.normal(size=200_000), "y": rng.normal(size=200_000)})
+    df["g"] = np.where(df["x"] > 0, "a", "b")
+    assert scatter_plot(df, "x", "y").getvalue().startswith(b"\x89PNG")
+    assert scatter_plot(df, "x", "y", hue="g", max_points=1_000).getvalue()
+    assert line_plot(df.sort_values("x"), "x", "y", decimate="minmax").getvalue()
+
+
+def test_hexbin_on_log_axes_skips_non_positive_values():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"x": rng.lognormal(size=30_000), "y": rng.normal(size=30_000)})
+    df.loc[:10, "x"] = [0.0, -1.0, np.inf] * 3 + [1.0, 2.0]
+    assert scatter_plot(df, "x", "y", log_x=True).getvalue().startswith(b"\x89PNG")
+    assert scatter_plot(df, "y", "x", log_y=True).getvalue().startswith(b"\x89PNG")
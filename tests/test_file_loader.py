@@ -12,3 +12,31 @@ def test_no_cache(monkeypatch, tmp_path):
     df = fl.load_any(buf)
     assert isinstance(df, pd.DataFrame)
     assert not any(tmp_path.iterdir())
+
+
+def _workbook(path):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "first"
+    ws.append(["a", "b"])
+    for i in range(5):
+        ws.append([i, f"x{i}"])
+    other = wb.create_sheet("second")
+    other.append(["c"])
+    other.append([1.5])
+    wb.save(path)
+
+
+def test_streaming_excel_reader(tmp_path):
+    from app.core.excel import iter_sheet_chunks, list_sheets, read_sheet
+
+    path = tmp_path / "w.xlsx"
+    _workbook(path)
+    assert list_sheets(path) == ["first", "second"]
+    assert [len(c) for c in iter_sheet_chunks(path, "first", chunksize=2)] == [2, 2, 1]
+    df = read_sheet(path, chunksize=2)
+    assert list(df.columns) == ["a", "b"]
+    assert str(df["a"].dtype) == "int64"
+    assert read_sheet(path, "second")["c"].tolist() == [1.5]
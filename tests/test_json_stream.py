@@ -0,0 +1,34 @@
+import json
+
+from app.core.json_stream import JsonFieldStream
+
+
+def _feed_all(text, step):
+    reader = JsonFieldStream()
+    fragments = []
+    for i in range(0, len(text), step):
+        fragments += reader.feed(text[i : i + step])
+    return reader, fragments
+
+
+def test_string_fields_decode_across_any_split():
+    doc = {"n": [1, {"a": "}"}], "intent": 'sum "é" 😀', "x": 1.5, "code": "a = 1\n"}
+    text = "Sure:\n```json\n" + json.dumps(doc) + "\n```"
+    for step in (1, 2, 5, len(text)):
+        reader, fragments = _feed_all(text, step)
+        assert reader.done
+        assert reader.values == {"intent": 'sum "é" 😀', "code": "a = 1\n"}
+        assert "".join(f for k, f in fragments if k == "intent") == 'sum "é" 😀'
+
+
+def test_intent_is_emitted_before_the_object_ends():
+    reader = JsonFieldStream()
+    assert reader.feed('{"intent": "plot sa') == [("intent", "plot sa")]
+    assert reader.feed('les", "code": "df.') == [("intent", "les"), ("code", "df.")]
+    assert not reader.done
+
+
+def test_malformed_input_stops_quietly():
+    reader, _ = _feed_all('{"intent": "a" oops "code": "b"}', 3)
+    assert reader.values == {"intent": "a"}
+    assert not reader.done
@@ -0,0 +1,146 @@
+import json
+import threading
+
+import pytest
+import requests
+
+from app.core.llm_client import ClientBusy, OllamaClient, pick_model, timing_summary
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, models=("llama3:8b-instruct",), up=True):
+        self.models = list(models)
+        self.up = up
+        self.gets = 0
+        self.posts = []
+        self.refreshed = threading.Event()
+
+    def get(self, url, timeout=None):
+        self.gets += 1
+        self.refreshed.set()
+        if not self.up:
+            raise requests.ConnectionError("refused")
+        return FakeResponse({"models": [{"name": m} for m in self.models]})
+
+    def post(self, url, json=None, timeout=None, stream=False):
+        self.posts.append((url, json))
+        if stream:
+            return FakeStream(["{\"in", "tent\": \"x\"}"])
+        return FakeResponse(
+            {"response": "{}", "load_duration": 2e8, "total_duration": 5e8}
+        )
+
+
+class FakeStream(FakeResponse):
+    def __init__(self, pieces):
+        lines = [json.dumps({"response": p, "done": False}) for p in pieces]
+        lines.append(json.dumps({"done": True, "total_duration": 1e8}))
+        super().__init__(None)
+        self.lines = [line.encode() for line in lines]
+        self.closed = False
+
+    def iter_lines(self):
+        yield from self.lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+def _client(session, **kw):
+    client = OllamaClient("http://ollama/api", ["mistral:7b-instruct"], **kw)
+    client.session = session
+    return client
+
+
+def test_pick_model_prefers_listed_models():
+    assert pick_model(["a", "mistral:7b-instruct"], ["mistral:7b-instruct"])[2] == (
+        "mistral:7b-instruct"
+    )
+    assert pick_model(["a"], ["mistral:7b-instruct"]) == (
+        True,
+        "Using first available model: a",
+        "a",
+    )
+    assert pick_model([], ["x"])[0] is False
+
+
+def test_health_is_cached_and_refreshed_in_background():
+    session = FakeSession()
+    client = _client(session, health_ttl=60)
+    assert client.health()[2] == "llama3:8b-instruct"
+    client.health()
+    assert session.gets == 1
+
+    client.health_ttl = 0
+    session.refreshed.clear()
+    session.models = ["mistral:7b-instruct"]
+    # The stale answer is served at once while a thread re-checks.
+    assert client.health()[2] == "llama3:8b-instruct"
+    assert session.refreshed.wait(5)
+    for _ in range(100):
+        if client.stats()["model"] == "mistral:7b-instruct":
+            break
+        threading.Event().wait(0.01)
+    assert client.stats()["model"] == "mistral:7b-instruct"
+
+
+def test_failed_health_is_rechecked():
+    session = FakeSession(up=False)
+    client = _client(session, health_ttl=0)
+    ok, msg, _ = client.health()
+    assert not ok and msg.startswith("Ollama unreachable")
+    session.up = True
+    assert client.health()[0] is True
+    assert session.gets == 2
+
+
+def test_generate_keeps_model_loaded_and_splits_latency():
+    session = FakeSession()
+    client = _client(session, keep_alive="1h")
+    data, timing = client.generate("m", "hi", {"temperature": 0.1})
+    url, payload = session.posts[0]
+    assert url == "http://ollama/api/generate"
+    assert payload["keep_alive"] == "1h"
+    assert payload["stream"] is False
+    assert timing.load == 0.2
+    assert abs(timing.generate - 0.3) < 1e-9
+    assert timing.queue >= 0 and timing.connect >= 0
+    summary = timing_summary([timing, timing])
+    assert summary["load"] == 0.4
+    assert client.stats()["calls"] == 1
+
+
+def test_stream_yields_pieces_and_records_timing():
+    session = FakeSession()
+    client = _client(session)
+    timings = []
+    pieces = list(client.stream("m", "hi", timings=timings))
+    assert "".join(pieces) == '{"intent": "x"}'
+    assert session.posts[0][1]["stream"] is True
+    assert timings[0].generate == 0.1
+    # the slot is released once the stream is drained
+    assert client._slots.acquire(blocking=False)
+
+
+def test_stream_without_waiting_fails_fast_when_slots_are_taken():
+    client = _client(FakeSession(), concurrency=1)
+    held = client.stream("m", "hi")
+    next(held)
+    with pytest.raises(ClientBusy):
+        next(client.stream("m", "hi", wait=False))
+    held.close()
+    assert "".join(client.stream("m", "hi", wait=False)) == '{"intent": "x"}'
@@ -1,4 +1,9 @@
+import json
+import uuid
+
 import pandas as pd
+from app.core import answer_cache, llm_driver, storage
+from app.core.llm_client import LLMTiming
 from app.core.llm_driver import _schema_desc, _extract_json
 
 
@@ -23,3 +28,23 @@ def test_extract_json():
     intent, code = _extract_json('{"intent": "do", "code": "print(1)"}')
     assert intent == "do"
     assert code == "print(1)"
+
+
+def test_ask_llm_caches_only_allowed_code(monkeypatch):
+    storage.init_db()
+    answers = iter(["import os", "import sys", "result = 1"])
+
+    def fake_generate(model, prompt, options=None):
+        code = next(answers)
+        return {"response": json.dumps({"intent": "i", "code": code})}, LLMTiming()
+
+    monkeypatch.setattr(llm_driver, "check_model_ready", lambda: (True, "OK", "m"))
+    monkeypatch.setattr(llm_driver.CLIENT, "generate", fake_generate)
+    df = pd.DataFrame({"a": [1]})
+    question = f"refused question {uuid.uuid4()}"
+    sig = llm_driver._cache_signature(df, None)
+
+    assert llm_driver.ask_llm(question, df, retries=1) == ("i", "import sys")
+    assert answer_cache.lookup(question, sig) is None
+    assert llm_driver.ask_llm(question, df, retries=0) == ("i", "result = 1")
+    assert answer_cache.lookup(question, sig) == ("i", "result = 1")
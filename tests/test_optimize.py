@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from app.core.optimize import optimize_dtypes
+
+
+def test_optimize_dtypes_shrinks_frame():
+    df = pd.DataFrame(
+        {
+            "region": ["north", "south"] * 50,
+            "qty": list(range(100)),
+            "price": [1.5, 2.25] * 50,
+            "ratio": [0.1, 0.2] * 50,
+            "name": [f"n{i}" for i in range(100)],
+        }
+    )
+    out, report = optimize_dtypes(df)
+    assert str(out["region"].dtype) == "category"
+    assert str(out["qty"].dtype) == "int32"
+    assert str(out["price"].dtype) == "float64"
+    assert str(out["ratio"].dtype) == "float64"
+    assert out["name"].dtype == object
+    assert report["bytes_saved"] > 0
+    assert report["columns"]["qty"] == {"from": "int64", "to": "int32"}
+    pd.testing.assert_frame_equal(out.astype(df.dtypes.to_dict()), df)
+
+
+def test_optimize_dtypes_keeps_integer_headroom():
+    df = pd.DataFrame({"small": [1, 2], "big": [0, 2**40]})
+    out, _ = optimize_dtypes(df)
+    assert str(out["small"].dtype) == "int32"
+    assert (out["small"] * 100_000).tolist() == [100_000, 200_000]
+    assert str(out["big"].dtype) == "int64"
+
+
+def test_optimize_dtypes_keeps_float_aggregates_exact():
+    values = np.arange(2_000_000, dtype=float) % 90_000
+    values[::7] = np.nan
+    df = pd.DataFrame({"amount": values})
+    out, report = optimize_dtypes(df)
+    assert "amount" not in report["columns"]
+    assert out["amount"].cumsum().iloc[-1] == df["amount"].cumsum().iloc[-1]
+    assert (out["amount"] * 1.1).sum() == (df["amount"] * 1.1).sum()
+
+
+def test_optimize_dtypes_arrow_strings():
+    df = pd.DataFrame({"name": [f"n{i}" for i in range(10)]})
+    out, _ = optimize_dtypes(df, arrow_strings=True)
+    assert str(out["name"].dtype) == "string"
@@ -0,0 +1,18 @@
+import json
+
+import pandas as pd
+
+from app.core.analysis import basic_insights, basic_summary
+from app.core.profile import build_profile, profile_insights, profile_summary
+
+
+def test_build_profile_matches_basic_views():
+    df = pd.DataFrame(
+        {"a": [1, None, 3, 100], "b": [2.0, 2.0, None, 2.0], "c": ["x", "y", "x", None]}
+    )
+    profile = json.loads(json.dumps(build_profile(df)))
+    assert profile_summary(profile) == basic_summary(df)
+    assert profile_insights(profile) == basic_insights(df)
+    assert profile["numeric_stats"]["a"]["q1"] == 2.0
+    assert profile["numeric_stats"]["a"]["count"] == 3
+    assert profile["top_categories"]["c"] == {"x": 2, "y": 1}
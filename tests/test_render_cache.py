@@ -0,0 +1,35 @@
+from app.core.render_cache import RenderCache
+
+
+def test_lru_evicts_by_bytes():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", b"12345", {"n": 1})
+    cache.put("b", b"12345")
+    assert cache.get("a") == (b"12345", {"n": 1})
+    cache.put("c", b"123")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None
+    assert cache.stats()["bytes"] == 8
+
+
+def test_evicted_entries_spill_to_disk(tmp_path):
+    cache = RenderCache(max_bytes=6, spill_dir=tmp_path, max_disk_bytes=1 << 20)
+    cache.put("a", b"aaaa", {"sampled": True})
+    cache.put("b", b"bbbb")
+    assert [p.name for p in tmp_path.iterdir()] == ["a.bin"]
+    assert cache.get("a") == (b"aaaa", {"sampled": True})
+    assert cache.stats()["disk_hits"] == 1
+
+    reopened = RenderCache(max_bytes=6, spill_dir=tmp_path, max_disk_bytes=1 << 20)
+    assert reopened.get("a") == (b"aaaa", {"sampled": True})
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = RenderCache(max_bytes=4, spill_dir=tmp_path, max_disk_bytes=40)
+    for key in "abcdef":
+        cache.put(key, key.encode() * 4)
+    # Each spilled entry takes 4 bytes of header, 2 of metadata and 4 of data.
+    assert sorted(p.stem for p in tmp_path.iterdir()) == ["b", "c", "d", "e"]
+    assert cache.get("a") is None
@@ -0,0 +1,60 @@
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.charts import render_chart
+from app.core.render_pool import RenderPool
+
+SPECS = [
+    ("line", {"x": "x", "y": "y"}),
+    ("scatter", {"x": "x", "y": "y", "hue": "g"}),
+    ("bar", {"x": "g", "y": "y"}),
+    ("hist", {"cols": ["y"]}),
+    ("box", {"cols": ["y"], "by": "g"}),
+    ("facet_hist", {"col": "y", "facet_by": "g"}),
+]
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {"x": np.arange(500), "y": rng.normal(size=500), "g": ["a", "b"] * 250}
+    )
+
+
+def test_charts_render_from_threads_without_pyplot_figures():
+    df = _frame()
+    with ThreadPoolExecutor(4) as pool:
+        pngs = list(pool.map(lambda s: render_chart(s[0], df, s[1]), SPECS * 2))
+    assert all(p.startswith(b"\x89PNG") for p in pngs)
+    with pytest.raises(KeyError):
+        render_chart("line", df, {"x": "x", "y": "missing"})
+    assert plt.get_fignums() == []
+
+
+def test_render_pool_uses_worker_processes():
+    assert RenderPool(0).run(os.getpid) == os.getpid()
+    pool = RenderPool(1)
+    try:
+        pool.warm()
+        assert pool.run(os.getpid) != os.getpid()
+        png = pool.run(render_chart, "hist", _frame(), {"cols": ["y"]})
+        assert png.startswith(b"\x89PNG")
+    finally:
+        pool.shutdown()
+
+
+def test_render_pool_replaces_a_pool_with_a_dead_worker():
+    pool = RenderPool(1)
+    try:
+        pid = pool.run(os.getpid)
+        os.kill(pid, signal.SIGKILL)
+        assert pool.run(os.getpid) not in (pid, os.getpid())
+        assert pool.submit(os.getpid).result() != pid
+    finally:
+        pool.shutdown()
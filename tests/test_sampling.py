@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from app.core.sampling import (
+    append_sample,
+    build_sample,
+    reservoir_sample,
+    stratified_sample,
+)
+
+
+def test_reservoir_sample_over_chunks_keeps_order():
+    df = pd.DataFrame({"i": np.arange(1000)})
+    sample = reservoir_sample(np.array_split(df, 7), size=50, seed=1)
+    assert len(sample) == 50
+    assert sample["i"].is_monotonic_increasing
+    assert sample["i"].nunique() == 50
+
+
+def test_stratified_sample_keeps_rare_levels():
+    df = pd.DataFrame({"g": ["common"] * 990 + ["rare"] * 10, "v": range(1000)})
+    sample = stratified_sample(df, 100, "g")
+    counts = sample["g"].value_counts()
+    assert counts["common"] == 99
+    assert counts["rare"] == 1
+
+
+def test_stratified_sample_stays_within_size_with_many_levels():
+    df = pd.DataFrame({"g": np.arange(5000) // 2, "v": range(5000)})
+    sample = stratified_sample(df, 100, "g")
+    assert len(sample) == 100
+    assert sample["g"].nunique() == 100
+
+    df = pd.DataFrame({"g": ["big"] * 900 + [f"r{i}" for i in range(100)]})
+    sample = stratified_sample(df, 150, "g")
+    counts = sample["g"].value_counts()
+    assert len(sample) == 150
+    assert len(counts) == 101
+    assert counts["big"] == 50
+
+
+def test_build_sample_small_frame_is_untouched():
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    assert build_sample(df, 10) is df
+
+
+def test_append_sample_mixes_old_and_new_rows_in_proportion():
+    old = pd.DataFrame({"i": np.arange(900)})
+    sample = reservoir_sample([old], size=100, seed=2)
+    delta = pd.DataFrame({"i": np.arange(900, 1800)})
+    out = append_sample(sample, len(old), delta, size=100, seed=3)
+    assert len(out) == 100
+    assert out["i"].is_monotonic_increasing
+    assert out["i"].nunique() == 100
+    assert 30 < (out["i"] >= 900).sum() < 70
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.sketches import (
+    ColumnSketch,
+    HyperLogLog,
+    MinHash,
+    estimate_overlap,
+    hash_column,
+    rank_join_keys,
+)
+
+
+def test_hyperloglog_estimate_within_a_few_percent():
+    hll = HyperLogLog()
+    hll.update(hash_column(pd.Series(np.arange(200_000))))
+    assert hll.estimate() == pytest.approx(200_000, rel=0.05)
+    small = HyperLogLog()
+    small.update(hash_column(pd.Series([1, 2, 3, 3])))
+    assert small.estimate() == pytest.approx(3, abs=0.1)
+
+
+def test_minhash_keeps_smallest_distinct_hashes():
+    hashes = hash_column(pd.Series(np.arange(10_000)))
+    mh = MinHash(k=64)
+    mh.update(np.concatenate([hashes, hashes[:100]]))
+    assert mh.values.tolist() == np.unique(hashes)[:64].tolist()
+    assert not mh.exact
+
+
+def test_overlap_estimate_on_large_columns():
+    rng = np.random.default_rng(0)
+    values = rng.integers(50_000, 150_000, 100_000)
+    ids = ColumnSketch.from_series(pd.Series(np.arange(100_000)))
+    refs = ColumnSketch.from_series(pd.Series(values))
+    overlap = estimate_overlap(ids, refs)
+    inter = len(np.intersect1d(np.arange(100_000), values))
+    assert overlap["containment_left"] == pytest.approx(inter / 100_000, rel=0.15)
+    assert overlap["containment_right"] == pytest.approx(
+        inter / len(np.unique(values)), rel=0.15
+    )
+    assert ids.uniqueness == pytest.approx(1.0, abs=0.05)
+
+
+def test_hashes_match_across_int_widths_and_integral_floats():
+    a = hash_column(pd.Series([1, -2], dtype="int8"))
+    b = hash_column(pd.Series([1.0, -2.0, None]))
+    assert a.tolist() == b.tolist()
+    cat = hash_column(pd.Series(["x", "y", "x"], dtype="category"))
+    assert cat.tolist() == hash_column(pd.Series(["x", "y", "x"])).tolist()
+
+
+def test_rank_join_keys_prefers_unique_contained_column():
+    left = pd.DataFrame({"id": range(100), "flag": [0, 1] * 50})
+    right = pd.DataFrame({"id": [5, 6, 7, 7], "flag": [0, 1, 0, 1], "x": "a"})
+    lsk = {c: ColumnSketch.from_series(left[c]) for c in left}
+    rsk = {c: ColumnSketch.from_series(right[c]) for c in right}
+    ranked = rank_join_keys(lsk, rsk)
+    assert [r["left"] for r in ranked] == ["id", "flag"]
+    assert ranked[0]["containment_right"] == 1.0
+    cross = rank_join_keys(lsk, rsk, same_name=False)
+    assert all(r["right"] != "x" for r in cross)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.analysis import basic_insights, basic_summary
+from app.core.stats import (
+    DatasetStats,
+    QuantileSketch,
+    chunked_insights,
+    chunked_summary,
+)
+
+
+def test_chunked_profile_matches_in_memory(tmp_path):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(
+        {
+            "a": rng.normal(size=500),
+            "b": rng.integers(0, 10, size=500),
+            "c": rng.choice(["x", "y", None], size=500),
+        }
+    )
+    df.loc[[3, 10, 400], "a"] = [np.nan, 50.0, -40.0]
+    path = tmp_path / "big.csv"
+    df.to_csv(path, index=False)
+    expected = pd.read_csv(path)
+    assert chunked_summary(path, chunksize=64) == basic_summary(expected)
+    assert chunked_insights(path, chunksize=64) == basic_insights(expected)
+
+
+def test_dataset_stats_merge_and_roundtrip():
+    left = DatasetStats.from_chunks([pd.DataFrame({"v": [1.0, 2.0, 3.0]})])
+    right = DatasetStats.from_chunks([pd.DataFrame({"v": [4.0, 5.0]})])
+    left = DatasetStats.from_dict(left.to_dict())
+    left.merge(right)
+    stats = left.profile()["numeric_stats"]["v"]
+    assert stats["count"] == 5
+    assert stats["mean"] == pytest.approx(3.0)
+    assert stats["std"] == pytest.approx(pd.Series([1, 2, 3, 4, 5]).std())
+
+
+def test_quantile_sketch_is_approximately_right():
+    values = np.random.default_rng(0).uniform(size=200_000)
+    sketch = QuantileSketch(k=256)
+    for chunk in np.array_split(values, 20):
+        sketch.update(chunk)
+    assert not sketch.exact
+    assert sum(len(lv) for lv in sketch.levels) < 5000
+    assert sketch.quantile(0.25) == pytest.approx(0.25, abs=0.02)
+    assert sketch.quantile(0.75) == pytest.approx(0.75, abs=0.02)
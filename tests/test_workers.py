@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.workers import LaneFull, WorkerLane
+
+
+def test_lane_limits_concurrency_and_counts_queue():
+    lane = WorkerLane("t", max_workers=1, max_queue=4)
+    release = threading.Event()
+
+    async def main():
+        jobs = [asyncio.ensure_future(lane.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        stats = lane.stats()
+        release.set()
+        await asyncio.gather(*jobs)
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["running"] == 1
+    assert stats["queued"] == 2
+    assert lane.stats()["completed"] == 3
+    assert lane.stats()["peak_queued"] >= 2
+
+
+def test_lane_rejects_when_queue_full():
+    lane = WorkerLane("t", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(lane.run(release.wait))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(lane.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LaneFull):
+            await lane.run(release.wait)
+        release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(main())
+    assert lane.stats()["rejected"] == 1
+
+
+def test_cancelled_queued_job_leaves_the_queue():
+    lane = WorkerLane("t", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(lane.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(lane.run(release.wait))
+        await asyncio.sleep(0.01)
+        queued = lane.stats()["queued"]
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        after_cancel = lane.stats()["queued"]
+        release.set()
+        await first
+        return queued, after_cancel
+
+    assert asyncio.run(main()) == (1, 0)
+    # The queue slot is free again rather than lost to the cancelled job.
+    assert asyncio.run(lane.run(lambda: 1)) == 1
+    assert lane.stats()["queued"] == 0